@@ -1,8 +1,22 @@
 import superlinked.framework as sl
 from loguru import logger
 
-from superlinked_app import index, query
+from superlinked_app import (
+    batch_search,
+    bulk_ingest,
+    constants,
+    embedding_backend,
+    embedding_cache,
+    incremental_load,
+    index,
+    metrics,
+    query,
+    result_cache,
+    snapshot,
+    vector_index,
+)
 from superlinked_app.config import settings
+from superlinked_app.sources import ChunkedDataLoaderSource
 
 # Define the real-time data loader (takes items one by one through HTTP requests).
 product_source: sl.RestSource = sl.RestSource(index.product)
@@ -13,15 +27,49 @@ settings.validate_processed_dataset_exists()
 product_data_loader_parser = sl.DataFrameParser(
     schema=index.product, mapping={index.product.id: "asin"}
 )
-product_data_loader_config = sl.DataLoaderConfig(
-    str(settings.PROCESSED_DATASET_PATH),
-    sl.DataFormat.JSON,
-    pandas_read_kwargs={"lines": True, "chunksize": 100},
-)
-product_loader_source: sl.DataLoaderSource = sl.DataLoaderSource(
+if settings.PROCESSED_DATASET_PATH.suffix == ".parquet":
+    # Arrow-backed columns keep the categories as lists instead of NumPy arrays.
+    product_data_loader_config = sl.DataLoaderConfig(
+        str(settings.PROCESSED_DATASET_PATH),
+        sl.DataFormat.PARQUET,
+        pandas_read_kwargs={"dtype_backend": "pyarrow"},
+    )
+else:
+    product_data_loader_config = sl.DataLoaderConfig(
+        str(settings.PROCESSED_DATASET_PATH),
+        sl.DataFormat.JSON,
+        pandas_read_kwargs={"lines": True, "chunksize": settings.INGESTION_CHUNK_SIZE},
+    )
+if settings.PRECOMPUTED_EMBEDDINGS_PATH is not None:
+    if index.text_embedding_cache is None:
+        raise ValueError(
+            "PRECOMPUTED_EMBEDDINGS_PATH requires EMBEDDING_CACHE_ENABLED=True."
+        )
+    embedding_cache.load_precomputed_embeddings(
+        index.text_embedding_cache,
+        settings.PRECOMPUTED_EMBEDDINGS_PATH,
+        embedding_backend.get_model_id(constants.TEXT_EMBEDDING_MODEL_ID),
+    )
+if settings.INCREMENTAL_LOAD_ENABLED:
+    if index.text_embedding_cache is None:
+        # The changed products with unchanged texts get their vectors from the cache.
+        raise ValueError(
+            "INCREMENTAL_LOAD_ENABLED requires EMBEDDING_CACHE_ENABLED=True."
+        )
+    product_load_fingerprints = incremental_load.RowFingerprints(
+        settings.INCREMENTAL_LOAD_FINGERPRINTS_PATH
+    )
+else:
+    product_load_fingerprints = None
+product_loader_source: sl.DataLoaderSource = ChunkedDataLoaderSource(
     index.product,
     data_loader_config=product_data_loader_config,
     parser=product_data_loader_parser,
+    chunk_size=settings.INGESTION_CHUNK_SIZE,
+    shared_embedding_model=constants.TEXT_EMBEDDING_MODEL_ID,
+    shared_embedding_columns=["title", "description"],
+    fingerprints=product_load_fingerprints,
+    id_column="asin",
 )
 
 if settings.USE_MONGO_VECTOR_DB:
@@ -34,19 +82,101 @@ if settings.USE_MONGO_VECTOR_DB:
         settings.MONGO_API_PUBLIC_KEY.get_secret_value(),
         settings.MONGO_API_PRIVATE_KEY.get_secret_value(),
     )
+    if product_load_fingerprints is not None:
+        # MongoDB persists the rows itself, so the fingerprints follow its database.
+        product_load_fingerprints.bind(
+            f"mongodb:{settings.MONGO_CLUSTER_URL}/{settings.MONGO_DATABASE_NAME}"
+        )
+elif (
+    settings.IN_MEMORY_VECTOR_INDEX == "ivf"
+    or settings.IN_MEMORY_FILTER_INDEX_ENABLED
+    or settings.IN_MEMORY_VECTOR_PRECISION != "float32"
+    or settings.IN_MEMORY_SNAPSHOT_ENABLED
+    # Binds the fingerprints to the rows it restores.
+    or settings.INCREMENTAL_LOAD_ENABLED
+):
+    logger.info("Using IndexedInMemoryVectorDatabase as your vector database.")
+    vector_database = vector_index.IndexedInMemoryVectorDatabase(
+        settings.IN_MEMORY_VECTOR_INDEX,
+        settings.IN_MEMORY_FILTER_INDEX_ENABLED,
+        settings.IVF_NUM_LISTS,
+        settings.IVF_NUM_PROBES,
+        settings.IVF_MIN_ROWS,
+        settings.IN_MEMORY_VECTOR_PRECISION,
+        settings.IN_MEMORY_RESCORE_FACTOR,
+        settings.IN_MEMORY_SNAPSHOT_PATH
+        if settings.IN_MEMORY_SNAPSHOT_ENABLED
+        else None,
+        product_load_fingerprints,
+    )
+    if settings.IN_MEMORY_SNAPSHOT_ENABLED:
+        snapshot.install()
 else:
     logger.info("Using InMemoryVectorDatabase as your vector database.")
     vector_database = vector_database = sl.InMemoryVectorDatabase()
 
+rest_queries = {
+    "filter_query": query.filter_query,
+    "semantic_query": query.semantic_query,
+    "similar_items_query": query.similar_items_query,
+}
+if settings.RESULT_CACHE_ENABLED:
+    query_result_cache = result_cache.ResultCache(settings.RESULT_CACHE_MAX_ROWS)
+    result_cache.install(query_result_cache, rest_queries)
+    result_cache.invalidate_on_put(
+        query_result_cache, [product_source, product_loader_source]
+    )
+else:
+    query_result_cache = None
+if settings.INGEST_BATCHING_ENABLED:
+    # Writes through the result cache invalidation, so it's installed after it.
+    ingest_batcher = bulk_ingest.IngestBatcher(
+        product_source.put,
+        settings.INGEST_BATCH_MAX_SIZE,
+        settings.INGEST_BATCH_MAX_LATENCY_MS,
+        settings.INGEST_QUEUE_MAX_SIZE,
+        shared_embedding_model=constants.TEXT_EMBEDDING_MODEL_ID,
+        shared_embedding_fields=["title", "description"],
+    )
+    bulk_ingest.install(ingest_batcher, product_source)
+else:
+    ingest_batcher = None
+if settings.BATCH_SEARCH_ENABLED:
+    batch_searcher = batch_search.BatchSearcher(
+        settings.BATCH_SEARCH_MAX_SIZE, settings.BATCH_SEARCH_NUM_THREADS
+    )
+    batch_search.install(batch_searcher, rest_queries)
+else:
+    batch_searcher = None
+
+if settings.TRACING_ENABLED and not settings.METRICS_ENABLED:
+    raise ValueError("TRACING_ENABLED requires METRICS_ENABLED=True.")
+if settings.METRICS_ENABLED:
+    # Wraps the stages as run by the caches, so it's installed after them.
+    search_metrics = metrics.SearchMetrics(settings.TRACING_ENABLED)
+    caches = {
+        "natural_query": query.natural_query_cache,
+        "natural_query_fast_path": query.natural_query_fast_path,
+        "text_embedding": index.text_embedding_cache,
+        **{
+            f"{name}_query_embedding": cache
+            for name, cache in index.query_embedding_caches.items()
+        },
+        "result": query_result_cache,
+    }
+    for name, cache in caches.items():
+        if cache is not None:
+            search_metrics.add_cache(name, cache.stats)
+    metrics.install(search_metrics)
+else:
+    search_metrics = None
+
 executor = sl.RestExecutor(
     sources=[product_source, product_loader_source],
     indices=[index.product_index],
     queries=[
-        sl.RestQuery(sl.RestDescriptor("filter_query"), query.filter_query),
-        sl.RestQuery(sl.RestDescriptor("semantic_query"), query.semantic_query),
-        sl.RestQuery(
-            sl.RestDescriptor("similar_items_query"), query.similar_items_query
-        ),
+        sl.RestQuery(sl.RestDescriptor(name), query_descriptor)
+        for name, query_descriptor in rest_queries.items()
     ],
     vector_database=vector_database,
 )
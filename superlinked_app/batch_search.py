@@ -0,0 +1,228 @@
+import contextvars
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, TypeVar
+
+from fastapi import FastAPI
+from loguru import logger
+from pydantic import BaseModel
+from superlinked import framework as sl
+from superlinked.framework.dsl.app.rest.rest_app import RestApp
+from superlinked.framework.dsl.query.query_clause import SimilarFilterClause
+from superlinked.framework.dsl.query.query_descriptor import QueryDescriptor
+from superlinked.framework.dsl.query.query_mixin import QueryMixin
+from superlinked.framework.dsl.query.query_param_value_setter import (
+    QueryParamValueSetter,
+)
+from superlinked.framework.dsl.query.result import Result
+from superlinked.server.middleware import lifespan_event
+
+from superlinked_app import embedding_backend
+from superlinked_app.result_cache import get_resolved_params
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class BatchQueryRequest(BaseModel):
+    queries: list[dict[str, Any]]
+
+
+class BatchSearcher:
+    """Run many parameter sets of the same query at once.
+
+    Every query of a batch goes through the same steps as a single query, except that
+    the natural queries are resolved concurrently, the texts of all the `.similar()`
+    clauses of the batch are embedded in a single forward pass per model, and the
+    vector searches run concurrently, each in a copy of the context of the batch, e.g.,
+    with the query name labelling its metrics.
+
+    Args:
+        max_batch_size: Maximum number of queries of a batch.
+        num_threads: Number of queries resolved and searched concurrently.
+    """
+
+    def __init__(self, max_batch_size: int, num_threads: int) -> None:
+        self.max_batch_size = max_batch_size
+        self.num_threads = num_threads
+        self.num_batches = 0
+        self.num_queries = 0
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            num_threads, thread_name_prefix="batch-search"
+        )
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.num_batches,
+            "queries": self.num_queries,
+            "mean_batch_size": (
+                self.num_queries / self.num_batches if self.num_batches else 0.0
+            ),
+        }
+
+    def search(
+        self,
+        app: QueryMixin,
+        query_descriptor: QueryDescriptor,
+        params_list: Sequence[dict[str, Any]],
+        query_name: str | None = None,
+    ) -> list[Result]:
+        """Return the results of the query for every parameter set, in order.
+
+        Args:
+            app: The app running the query, e.g., the REST app of the server.
+            query_descriptor: The query.
+            params_list: The parameters of every query, as sent to its REST endpoint.
+            query_name: Name of the query, e.g., to label its metrics.
+        """
+
+        if len(params_list) > self.max_batch_size:
+            raise ValueError(
+                f"A batch can have at most {self.max_batch_size} queries, got {len(params_list)}."
+            )
+
+        # Resolving the natural queries waits for OpenAI, so they run concurrently.
+        resolved_query_descriptors = self._map(
+            lambda params: QueryParamValueSetter.set_values(query_descriptor, params),
+            params_list,
+        )
+        # The resolved parameters don't include the natural query, so running them
+        # doesn't call OpenAI again. The clauses Superlinked appends are left out.
+        param_names = query_descriptor.calculate_value_by_param_name().keys()
+        resolved_params_list = [
+            {
+                name: value
+                for name, value in get_resolved_params(
+                    resolved_query_descriptor
+                ).items()
+                if name in param_names
+            }
+            for resolved_query_descriptor in resolved_query_descriptors
+        ]
+
+        texts_by_model: defaultdict[str, list[str]] = defaultdict(list)
+        for resolved_query_descriptor in resolved_query_descriptors:
+            for clause in resolved_query_descriptor.get_clauses_by_type(
+                SimilarFilterClause
+            ):
+                text = clause.get_value()
+                if (
+                    isinstance(clause.space, sl.TextSimilaritySpace)
+                    and isinstance(text, str)
+                    and clause.get_weight()
+                ):
+                    model_name = (
+                        clause.space.transformation_config.embedding_config.model_name
+                    )
+                    texts_by_model[model_name].append(text)
+
+        with ExitStack() as stack:
+            for model_name, texts in texts_by_model.items():
+                stack.enter_context(
+                    embedding_backend.shared_forward_pass(model_name, texts)
+                )
+            results = self._map(
+                lambda params: app.query(query_descriptor, **params),
+                resolved_params_list,
+            )
+
+        with self._lock:
+            self.num_batches += 1
+            self.num_queries += len(params_list)
+        logger.debug(
+            f"Batch search: {len(params_list)} queries, "
+            f"{sum(map(len, texts_by_model.values()))} texts embedded up front."
+        )
+
+        return results
+
+    def _map(self, function: Callable[[T], R], items: Sequence[T]) -> list[R]:
+        # A context can't be entered by several threads at once, so each gets a copy.
+        contexts = [contextvars.copy_context() for _ in items]
+
+        return list(
+            self._executor.map(
+                lambda context, item: context.run(function, item), contexts, items
+            )
+        )
+
+
+def to_response(result: Result) -> dict[str, Any]:
+    """Format a result as the response of the single query endpoints."""
+
+    return {
+        "schema": result.schema._schema_name,
+        "results": [
+            {
+                "entity": {
+                    "id": entry.entity.header.object_id,
+                    "score": entry.entity.score,
+                    "origin": (
+                        {
+                            "id": entry.entity.header.object_id,
+                            "schema": entry.entity.header.schema_id,
+                        }
+                        if entry.entity.header.origin_id
+                        else {}
+                    ),
+                },
+                "obj": entry.stored_object,
+            }
+            for entry in result.entries
+        ],
+    }
+
+
+def install(searcher: BatchSearcher, queries: dict[str, QueryDescriptor]) -> None:
+    """Serve a batch endpoint next to the endpoint of each of the given queries.
+
+    `POST <query endpoint>/batch` takes `{"queries": [<params>, ...]}`, the same
+    parameters as the query endpoint for every query, and returns `{"results": [...]}`,
+    the responses of the query endpoint in the same order. The Superlinked server
+    registers the endpoints of the REST executors once the app module is imported,
+    so this wraps that step.
+
+    Args:
+        searcher: The batch searcher running the queries.
+        queries: The REST queries by name.
+    """
+
+    register_routes = lifespan_event._register_routes
+
+    def register_routes_with_batch(app: FastAPI, rest_app: RestApp) -> None:
+        register_routes(app, rest_app)
+        for path in rest_app.handler.query_paths:
+            query_name = path.rsplit("/", 1)[-1]
+            query_descriptor = queries.get(query_name)
+            if query_descriptor is None:
+                continue
+            app.add_api_route(
+                path=f"{path}/batch",
+                endpoint=_create_endpoint(
+                    searcher, rest_app, query_descriptor, query_name
+                ),
+                methods=["POST"],
+            )
+            logger.info(f"Registered the batch query endpoint '{path}/batch'.")
+
+    lifespan_event._register_routes = register_routes_with_batch
+
+
+def _create_endpoint(
+    searcher: BatchSearcher,
+    rest_app: RestApp,
+    query_descriptor: QueryDescriptor,
+    query_name: str,
+) -> Callable[[BatchQueryRequest], dict[str, Any]]:
+    # A sync endpoint, so FastAPI runs it in its thread pool.
+    def batch_query(batch: BatchQueryRequest) -> dict[str, Any]:
+        results = searcher.search(rest_app, query_descriptor, batch.queries, query_name)
+
+        return {"results": [to_response(result) for result in results]}
+
+    return batch_query
@@ -0,0 +1,269 @@
+import json
+import queue
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from typing import Any
+
+from fastapi import FastAPI, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from loguru import logger
+from superlinked import framework as sl
+from superlinked.framework.common.exception import ParseException
+from superlinked.framework.common.parser.data_parser import DataParser
+from superlinked.framework.dsl.app.rest.rest_app import RestApp
+from superlinked.server.middleware import lifespan_event
+
+from superlinked_app import embedding_backend, embedding_cache
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+class IngestBatcher:
+    """Coalesce the items put into a source into micro-batches, written in background.
+
+    The items are queued, and a background thread puts them into the source in batches
+    of up to `max_batch_size` items, waiting at most `max_latency_ms` after the first
+    item of a batch for the next ones. Concurrent single item requests are so embedded
+    and written together, without waiting for each other. With a shared embedding model,
+    the texts of the `shared_embedding_fields` of a batch are embedded in a single
+    forward pass, as in `ChunkedDataLoaderSource`.
+
+    Args:
+        put: Puts a list of items into the source.
+        max_batch_size: Maximum number of items put at once.
+        max_latency_ms: Maximum time an item waits for the next ones of its batch.
+        max_queue_size: Number of queued items above which putting more blocks.
+        shared_embedding_model: Model embedding the texts of all the shared fields.
+        shared_embedding_fields: Fields of the items embedded by the shared model.
+    """
+
+    def __init__(
+        self,
+        put: Callable[[list[Any]], None],
+        max_batch_size: int,
+        max_latency_ms: float,
+        max_queue_size: int,
+        shared_embedding_model: str | None = None,
+        shared_embedding_fields: Sequence[str] = (),
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+        self.shared_embedding_model = shared_embedding_model
+        self.shared_embedding_fields = list(shared_embedding_fields)
+        self.num_batches = 0
+        self.num_items = 0
+        self.num_failed_items = 0
+
+        self._put = put
+        self._queue: queue.Queue[Any] = queue.Queue(max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="ingest-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.num_batches,
+            "items": self.num_items,
+            "failed_items": self.num_failed_items,
+            "queued_items": self._queue.qsize(),
+            "mean_batch_size": (
+                self.num_items / self.num_batches if self.num_batches else 0.0
+            ),
+        }
+
+    def put(self, items: Sequence[Any]) -> None:
+        """Queue the items, blocking while the queue is full."""
+
+        for item in items:
+            self._queue.put(item)
+
+    def join(self) -> None:
+        """Wait until all the queued items are written."""
+
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency_ms / 1000
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(
+                        self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    )
+                except queue.Empty:
+                    break
+            try:
+                self._put_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _put_batch(self, batch: list[Any]) -> None:
+        try:
+            self._put_with_shared_embedding(batch)
+        except Exception:
+            # Retried item by item, so an invalid item doesn't drop its whole batch.
+            logger.exception(
+                f"Failed to ingest a batch of {len(batch)} items, "
+                "retrying them one by one."
+            )
+            for item in batch:
+                try:
+                    self._put_with_shared_embedding([item])
+                except Exception:
+                    self.num_failed_items += 1
+                    logger.exception(f"Failed to ingest the item: {item}")
+        self.num_batches += 1
+        self.num_items += len(batch)
+
+    def _put_with_shared_embedding(self, items: list[Any]) -> None:
+        if self.shared_embedding_model is None:
+            self._put(items)
+            return
+
+        texts = [
+            item[field]
+            for item in items
+            for field in self.shared_embedding_fields
+            if isinstance(item, dict) and isinstance(item.get(field), str)
+        ]
+        with (
+            embedding_cache.ingestion(),
+            embedding_backend.shared_forward_pass(self.shared_embedding_model, texts),
+        ):
+            self._put(items)
+
+
+async def read_ndjson_lines(request: Request) -> AsyncIterator[list[bytes]]:
+    """Yield the non-empty lines of a newline delimited JSON body as its chunks arrive."""
+
+    buffer = b""
+    async for chunk in request.stream():
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        yield [line for line in lines if line.strip()]
+    yield [buffer] if buffer.strip() else []
+
+
+def validate_items(parser: DataParser, items: Sequence[Any]) -> None:
+    """Parse the items as the source would, raising the error of the first invalid one.
+
+    The items are only written later by the batcher, so they are validated before being
+    queued, for the ingest requests to fail on them. The values missing from new items
+    are only noticed when written, as they may already be stored.
+    """
+
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError(f"Expected a JSON object, got: {item!r}")
+        parser.unmarshal(item)
+
+
+def parse_ndjson_items(
+    parser: DataParser, lines: Sequence[bytes]
+) -> tuple[list[Any], ValueError | ParseException | None]:
+    """Parse and validate the lines up to the first invalid one.
+
+    Returns:
+        The items of the lines before the first invalid one, and its error, if any.
+    """
+
+    items = []
+    for line in lines:
+        try:
+            item = json.loads(line)
+            validate_items(parser, [item])
+        except (ValueError, ParseException) as e:
+            return items, e
+        items.append(item)
+
+    return items, None
+
+
+def install(batcher: IngestBatcher, source: sl.RestSource) -> None:
+    """Write the items of the source in micro-batches, and serve a bulk ingest endpoint.
+
+    The items put into the source, e.g., by its ingest endpoint, are validated by its
+    parser and queued into the batcher, which writes them. `POST <ingest endpoint>/bulk`
+    takes a JSON array of items, or newline delimited JSON items with the
+    `application/x-ndjson` content type, read as they arrive, and returns
+    `{"accepted": <number of items>}` once they are queued. An invalid JSON line or item
+    returns a 400 with the number of items queued before it as `accepted`: none for an
+    array, the items of the previous lines for newline delimited JSON. The queued items
+    are written before the server persists its vector database on shutdown.
+
+    Args:
+        batcher: The batcher writing the items, created with the `put` of the source.
+        source: The REST source.
+    """
+
+    def put_validated(items: Sequence[Any]) -> None:
+        validate_items(source.parser, items)
+        batcher.put(items)
+
+    source.put = put_validated
+    register_routes = lifespan_event._register_routes
+    teardown_application = lifespan_event.teardown_application
+
+    def register_routes_with_bulk(app: FastAPI, rest_app: RestApp) -> None:
+        register_routes(app, rest_app)
+        for path in rest_app.handler.ingest_paths:
+            if path.rsplit("/", 1)[-1] != source.path:
+                continue
+            app.add_api_route(
+                path=f"{path}/bulk",
+                endpoint=_create_endpoint(batcher, source),
+                methods=["POST"],
+                status_code=status.HTTP_202_ACCEPTED,
+            )
+            logger.info(f"Registered the bulk ingest endpoint '{path}/bulk'.")
+
+    def teardown_application_after_ingestion(app: FastAPI) -> None:
+        batcher.join()
+        teardown_application(app)
+
+    lifespan_event._register_routes = register_routes_with_bulk
+    lifespan_event.teardown_application = teardown_application_after_ingestion
+
+
+def _create_endpoint(
+    batcher: IngestBatcher, source: sl.RestSource
+) -> Callable[[Request], Awaitable[Response]]:
+    async def bulk_ingest(request: Request) -> Response:
+        num_items = 0
+        try:
+            if request.headers.get("content-type", "").startswith(NDJSON_CONTENT_TYPE):
+                async for lines in read_ndjson_lines(request):
+                    items, error = parse_ndjson_items(source.parser, lines)
+                    # Blocks while the queue of the batcher is full.
+                    await run_in_threadpool(batcher.put, items)
+                    num_items += len(items)
+                    if error is not None:
+                        raise error
+            else:
+                items = await request.json()
+                if not isinstance(items, list):
+                    raise ValueError("Expected a JSON array of items.")
+                validate_items(source.parser, items)
+                await run_in_threadpool(batcher.put, items)
+                num_items = len(items)
+        except (ValueError, ParseException) as e:
+            # Same content as the bad requests of the server, with the accepted items.
+            return JSONResponse(
+                {
+                    "exception": type(e).__name__,
+                    "detail": str(e),
+                    "accepted": num_items,
+                },
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return JSONResponse(
+            {"accepted": num_items}, status_code=status.HTTP_202_ACCEPTED
+        )
+
+    return bulk_ingest
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from loguru import logger
 from pydantic import SecretStr, model_validator
@@ -16,9 +17,73 @@ class Settings(BaseSettings):
 
     # Superlinked
     PROCESSED_DATASET_PATH: Path = (
-        Path("data") / "processed_300_sample.jsonl"
-    )  # or change it for a bigger dataset to: processed_850_sample.jsonl
+        Path("data") / "processed_300_sample.parquet"
+    )  # or change it for a bigger dataset to: processed_850_sample.parquet (.jsonl files are also supported)
     GPU_EMBEDDING_THRESHOLD: int = 32
+    # Use 'int8' to run the embedding model quantized on CPU, faster and slightly less accurate.
+    EMBEDDING_BACKEND: Literal["fp32", "int8"] = "fp32"
+    # Number of products read and ingested at once by the data loader.
+    INGESTION_CHUNK_SIZE: int = 100
+    # Number of texts passed through the embedding model at once.
+    EMBEDDING_BATCH_SIZE: int = 32
+    # Number of CPU threads used by the embedding model. If 'None', it uses all the cores.
+    EMBEDDING_NUM_THREADS: int | None = None
+    # Persists the text embeddings of the ingested products across server restarts.
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: Path = Path("data") / "embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1_000_000
+    # Output of 'tools/precompute_embeddings.py', e.g.: data/processed_300_sample_embeddings.parquet
+    PRECOMPUTED_EMBEDDINGS_PATH: Path | None = None
+    # Loads only the products new or changed since the previous data loader runs, fingerprinted by ASIN. The fingerprints are cleared when the vector database is restored empty or from another snapshot.
+    INCREMENTAL_LOAD_ENABLED: bool = False
+    INCREMENTAL_LOAD_FINGERPRINTS_PATH: Path = (
+        Path("data") / "load_fingerprints.sqlite3"
+    )
+    # Caches the query vectors of the text similarity spaces in memory.
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_MAX_SIZE: int = 10_000
+    # If set, e.g., to data/query_embedding_cache, the query vectors are also shared by the server processes through memory-mapped files.
+    QUERY_EMBEDDING_CACHE_SHARED_DIR: Path | None = None
+    QUERY_EMBEDDING_CACHE_SHARED_CAPACITY: int = 20_000
+    # Caches the results of the queries until new data is ingested.
+    RESULT_CACHE_ENABLED: bool = True
+    # Maximum number of result items held by the result cache, over all its results.
+    RESULT_CACHE_MAX_ROWS: int = 100_000
+    # Serves a batch endpoint next to every query endpoint, e.g., /api/v1/search/semantic_query/batch.
+    BATCH_SEARCH_ENABLED: bool = True
+    # Maximum number of queries of a batch request.
+    BATCH_SEARCH_MAX_SIZE: int = 1000
+    # Number of queries of a batch resolved and searched concurrently.
+    BATCH_SEARCH_NUM_THREADS: int = 8
+    # Coalesces the products ingested through the REST endpoints into micro-batches, embedded and written in the background, and serves the bulk ingest endpoint. The ingest requests then return once their products are validated and queued, before they are written.
+    INGEST_BATCHING_ENABLED: bool = False
+    # Maximum number of products embedded and written at once.
+    INGEST_BATCH_MAX_SIZE: int = 256
+    # Maximum time a product waits for the next ones of its micro-batch.
+    INGEST_BATCH_MAX_LATENCY_MS: int = 50
+    # Number of queued products above which the ingest requests wait.
+    INGEST_QUEUE_MAX_SIZE: int = 100_000
+    # Index of the in-memory vector database: 'flat' scores all the products, 'ivf' only the clusters of products closest to the query.
+    IN_MEMORY_VECTOR_INDEX: Literal["flat", "ivf"] = "flat"
+    # Number of clusters of the IVF index. If 'None', 4 * sqrt(number of products).
+    IVF_NUM_LISTS: int | None = None
+    # Number of clusters scanned per query, higher means better recall and slower queries.
+    IVF_NUM_PROBES: int = 8
+    # Below this number of products, the IVF index searches them exactly.
+    IVF_MIN_ROWS: int = 10_000
+    # Selects the products passing the filters of a query through bitmap indices, instead of checking every product.
+    IN_MEMORY_FILTER_INDEX_ENABLED: bool = True
+    # Type of the product vectors kept in memory: 'float16' halves their memory, 'int8' (scaled per dimension) quarters it.
+    IN_MEMORY_VECTOR_PRECISION: Literal["float32", "float16", "int8"] = "float32"
+    # With a reduced precision, number of candidates per result rescored with their float32 vectors, kept on disk. '0' disables it.
+    IN_MEMORY_RESCORE_FACTOR: int = 4
+    # Snapshots the in-memory vector database after every data load and on shutdown, and memory-maps it at startup, instead of the JSON persistence of the server.
+    IN_MEMORY_SNAPSHOT_ENABLED: bool = True
+    IN_MEMORY_SNAPSHOT_PATH: Path = Path("in_memory_vdb") / "snapshot"
+    # Serves Prometheus metrics of the search path at /metrics: latency per stage, embedding batch sizes, candidates per search and cache hit ratios.
+    METRICS_ENABLED: bool = False
+    # Also records the stages of every query as OpenTelemetry spans, exported by the tracer provider the server runs with.
+    TRACING_ENABLED: bool = False
 
     # MongoDB
     USE_MONGO_VECTOR_DB: bool = False  # If 'False', we will use an InMemory vector database that requires no credentials.
@@ -32,6 +97,16 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_MODEL_ID: str = "gpt-4o"
     OPENAI_API_KEY: SecretStr
+    # Caches the parameters extracted from natural queries by OpenAI.
+    NLQ_CACHE_ENABLED: bool = True
+    NLQ_CACHE_MAX_SIZE: int = 10_000
+    NLQ_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    # If set, e.g., to data/nlq_cache.sqlite3, the cache also survives server restarts.
+    NLQ_CACHE_PATH: Path | None = None
+    # Extracts the parameters of common natural queries with rules instead of OpenAI. Off by default, as OpenAI understands the queries the rules get wrong.
+    NLQ_FAST_PATH_ENABLED: bool = False
+    # Share of the meaningful words of a query the rules must understand to skip OpenAI.
+    NLQ_FAST_PATH_MIN_CONFIDENCE: float = 1.0
 
     @model_validator(mode="after")
     def validate_mongo_config(self) -> "Settings":
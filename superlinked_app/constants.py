@@ -1,3 +1,5 @@
+TEXT_EMBEDDING_MODEL_ID = "Alibaba-NLP/gte-large-en-v1.5"
+
 TYPES = ["product", "book"]
 
 CATEGORIES = [
@@ -1,14 +1,50 @@
-import random
+from collections.abc import Callable
 from typing import Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Typed layout of the processed dataset, following the fields of `index.ProductSchema`.
+PROCESSED_DATASET_SCHEMA = pa.schema(
+    [
+        ("asin", pa.string()),
+        ("type", pa.string()),
+        ("category", pa.list_(pa.string())),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("review_rating", pa.float64()),
+        ("review_count", pa.int64()),
+        ("price", pa.float64()),
+    ]
+)
+
+
+def sample_num_categories(asins: pd.Series) -> np.ndarray:
+    """Sample the number of categories to keep: 1 for ~90% of the products, 2 otherwise.
+
+    The sample is driven by a hash of the ASIN instead of a random generator, so it does
+    not depend on the row order and the dataset can be processed in chunks or in parallel.
+
+    Args:
+        asins: Series of Amazon Standard Identification Numbers
+
+    Returns:
+        Array with the number of categories to keep for each product
+    """
+
+    hashes = pd.util.hash_array(asins.astype(str).to_numpy(dtype=object))
+
+    return np.where(hashes / 2**64 < 0.9, 1, 2)
 
 
-def parse_category(category: str) -> list[str]:
+def parse_category(category: str, keep_num_categories: int) -> list[str]:
     """Parse the category string and return the first category.
 
     Args:
         category: String containing the category list (e.g., "['Books', 'Fiction', 'Literature']")
+        keep_num_categories: Number of categories to keep (see `sample_num_categories`)
 
     Returns:
         String containing the first category, or None if parsing fails
@@ -19,7 +55,6 @@ def parse_category(category: str) -> list[str]:
         return []
 
     try:
-        keep_num_categories = 1 if random.random() < 0.9 else 2
         return [c.strip() for c in category][:keep_num_categories]
     except (ValueError, IndexError):
         return []
@@ -84,6 +119,167 @@ def parse_price(price: str) -> Optional[float]:
         return None
 
 
+# ASCII strings accepted by float(), except for the digit grouping underscores.
+FLOAT_PATTERN = r"(?i)^[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?|inf|infinity|nan)$"
+
+
+def to_arrow_strings(values: pd.Series) -> pa.StringArray:
+    """Convert a column to an Arrow string array, keeping the missing values as nulls."""
+
+    return pa.array(values.astype(str), type=pa.string(), mask=values.isna().to_numpy())
+
+
+def parse_float_strings(strings: pa.StringArray) -> pa.DoubleArray:
+    """Parse the strings as float() would, setting the ones it would reject to null."""
+
+    is_float = pc.match_substring_regex(strings, FLOAT_PATTERN)
+
+    return pc.cast(pc.if_else(is_float, strings, None), pa.float64())
+
+
+def parse_rejected_row_wise(
+    parsed: pa.Array, values: pd.Series, row_wise_parser: Callable
+) -> pa.Array:
+    """Parse the values rejected (set to null) by a vectorized parser with its row-wise one.
+
+    The regexes of the vectorized parsers only match ASCII whitespace and digits, while
+    `str.split()`, `float()` and `int()` also accept the Unicode ones (e.g., "4.5\xa0out
+    of 5 stars") and digit grouping underscores. Such values are rare, so they are
+    left to the row-wise parser instead of being matched by the regexes.
+    """
+
+    is_rejected = pc.and_(pc.is_null(parsed), pa.array(values.notna().to_numpy()))
+    if not pc.any(is_rejected).as_py():
+        return parsed
+    rejected_values = values[is_rejected.to_numpy(zero_copy_only=False)]
+
+    return pc.replace_with_mask(
+        parsed,
+        is_rejected,
+        pa.array(rejected_values.map(row_wise_parser).tolist(), type=parsed.type),
+    )
+
+
+def parse_categories(categories: pd.Series, asins: pd.Series) -> pd.Series:
+    """Vectorized version of `parse_category` over a column of category lists.
+
+    Args:
+        categories: Series of category lists (e.g., ["Books", "Fiction", "Literature"])
+        asins: Series of ASINs used to sample the number of kept categories
+
+    Returns:
+        Series of lists containing the first 1 or 2 stripped categories, or an empty list
+        if the value is missing or contains missing categories
+    """
+
+    lists = pa.array(
+        categories.astype(object), type=pa.list_(pa.string()), from_pandas=True
+    )
+    elements = pc.list_flatten(lists)
+    parents = pc.list_parent_indices(lists).to_numpy()
+    element_positions = (
+        np.arange(len(elements)) - lists.offsets.to_numpy()[:-1][parents]
+    )
+
+    has_missing_element = (
+        np.bincount(
+            parents[pc.is_null(elements).to_numpy(zero_copy_only=False)],
+            minlength=len(lists),
+        )
+        > 0
+    )
+    is_parsed = ~(
+        pc.is_null(lists).to_numpy(zero_copy_only=False) | has_missing_element
+    )
+
+    keep_num_categories = sample_num_categories(asins)
+    is_kept = is_parsed[parents] & (element_positions < keep_num_categories[parents])
+    kept_offsets = np.concatenate(
+        [[0], np.cumsum(np.bincount(parents[is_kept], minlength=len(lists)))]
+    )
+    parsed = pa.ListArray.from_arrays(
+        pa.array(kept_offsets, type=pa.int32()),
+        pc.utf8_trim_whitespace(elements.filter(pa.array(is_kept))),
+    )
+
+    return pd.Series(parsed.to_pylist(), index=categories.index, dtype=object)
+
+
+def parse_review_ratings(stars: pd.Series) -> pd.Series:
+    """Vectorized version of `parse_review_rating`.
+
+    Args:
+        stars: Series of star ratings (e.g., "4.2 out of 5 stars", "4,2 de 5 estrellas")
+
+    Returns:
+        Series of floats between 0 and 5, or -1.0 where parsing fails
+    """
+
+    stars_strs = pc.replace_substring(
+        to_arrow_strings(stars), ",", "."
+    )  # Handle European number format
+    first_tokens = pc.struct_field(
+        pc.extract_regex(stars_strs, r"^\s*(?P<token>\S+)"), [0]
+    )
+    review_ratings = parse_rejected_row_wise(
+        parse_float_strings(first_tokens), stars, parse_review_rating
+    )
+    review_ratings = pc.fill_null(review_ratings, -1.0)
+
+    return pd.Series(review_ratings.to_numpy(), index=stars.index)
+
+
+def parse_review_counts(ratings: pd.Series) -> pd.Series:
+    """Vectorized version of `parse_review_count`.
+
+    Args:
+        ratings: Series of numbers of ratings (e.g., "1,116 ratings", "90 valoraciones")
+
+    Returns:
+        Series of ints representing the number of ratings, or 0 where parsing fails
+    """
+
+    first_tokens = pc.struct_field(
+        pc.extract_regex(to_arrow_strings(ratings), r"^\s*(?P<token>\S+)"), [0]
+    )
+    # Stripped of ",." like the first token of `parse_review_count`, and parsed only
+    # if it is accepted by int().
+    first_integers = pc.extract_regex(
+        pc.replace_substring(first_tokens, ",.", ""),
+        r"^(?P<sign>[+-]?)(?P<digits>\d+)$",
+    )
+    review_counts = pc.cast(pc.struct_field(first_integers, [1]), pa.int64())
+    is_negative = pc.equal(pc.struct_field(first_integers, [0]), "-")
+    review_counts = pc.if_else(is_negative, pc.negate(review_counts), review_counts)
+    review_counts = parse_rejected_row_wise(review_counts, ratings, parse_review_count)
+    review_counts = pc.fill_null(review_counts, 0)
+
+    return pd.Series(review_counts.to_numpy(), index=ratings.index)
+
+
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """Vectorized version of `parse_price`.
+
+    Args:
+        prices: Series of prices (e.g., "$9.99", "25,63€")
+
+    Returns:
+        Series of floats capped at 1000, or NaN where parsing fails or the price is missing
+    """
+
+    # Remove currency symbols and convert to float
+    price_strs = to_arrow_strings(prices)
+    for currency_symbol in ["$", "€"]:
+        price_strs = pc.replace_substring(price_strs, currency_symbol, "")
+    price_strs = pc.utf8_trim_whitespace(pc.replace_substring(price_strs, ",", "."))
+    parsed_prices = parse_float_strings(price_strs)
+    # Capped like min(), which keeps NaN unlike `pc.min_element_wise`.
+    parsed_prices = pc.if_else(pc.greater(parsed_prices, 1000.0), 1000.0, parsed_prices)
+    parsed_prices = parse_rejected_row_wise(parsed_prices, prices, parse_price)
+
+    return pd.Series(parsed_prices.to_numpy(zero_copy_only=False), index=prices.index)
+
+
 def process_amazon_dataset(df: pd.DataFrame) -> pd.DataFrame:
     """Process raw product data into a standardized format.
 
@@ -111,8 +307,6 @@ def process_amazon_dataset(df: pd.DataFrame) -> pd.DataFrame:
             - price (float): Price value
     """
 
-    random.seed(6)
-
     # Create a copy to avoid modifying the original DataFrame
     df_processed = df.copy()
     df_processed = df_processed[df_processed["locale"] == "us"]
@@ -131,10 +325,12 @@ def process_amazon_dataset(df: pd.DataFrame) -> pd.DataFrame:
     df_processed = df_processed[columns_to_keep]
 
     # Apply transformations
-    df_processed["category"] = df_processed["category"].apply(parse_category)
-    df_processed["review_rating"] = df_processed["stars"].apply(parse_review_rating)
-    df_processed["review_count"] = df_processed["ratings"].apply(parse_review_count)
-    df_processed["price"] = df_processed["price"].apply(parse_price)
+    df_processed["category"] = parse_categories(
+        df_processed["category"], df_processed["asin"]
+    )
+    df_processed["review_rating"] = parse_review_ratings(df_processed["stars"])
+    df_processed["review_count"] = parse_review_counts(df_processed["ratings"])
+    df_processed["price"] = parse_prices(df_processed["price"])
 
     # Drop original stars and ratings columns since we've extracted the values
     df_processed = df_processed.drop(columns=["stars", "ratings"])
@@ -154,3 +350,11 @@ def process_amazon_dataset(df: pd.DataFrame) -> pd.DataFrame:
     )
 
     return df_processed
+
+
+def to_arrow_table(df_processed: pd.DataFrame) -> pa.Table:
+    """Convert a DataFrame returned by `process_amazon_dataset` to a typed Arrow table."""
+
+    return pa.Table.from_pandas(
+        df_processed, schema=PROCESSED_DATASET_SCHEMA, preserve_index=False
+    )
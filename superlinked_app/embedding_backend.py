@@ -0,0 +1,137 @@
+import contextvars
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Literal
+
+import numpy as np
+import torch
+from loguru import logger
+from sentence_transformers import SentenceTransformer
+from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+    SentenceTransformerManager,
+)
+from superlinked.framework.common.space.embedding.sentence_transformer_model_cache import (
+    SentenceTransformerModelCache,
+)
+from superlinked.framework.common.util.gpu_embedding_util import CPU_DEVICE_TYPE
+
+EmbeddingBackend = Literal["fp32", "int8"]
+
+_backend: EmbeddingBackend = "fp32"
+# Vectors computed by `shared_forward_pass()` for the current context, keyed by model
+# name and text. Each context sees only its own vectors, so the ingestion and search
+# threads don't drop the vectors of each other when their contexts overlap.
+_precomputed_vectors: contextvars.ContextVar[
+    Mapping[tuple[str, str], list[float] | np.ndarray]
+] = contextvars.ContextVar("precomputed_vectors", default=MappingProxyType({}))
+
+
+def get_model_id(model_name: str) -> str:
+    """Identify the vectors of a model computed by the configured backend.
+
+    The int8 model computes slightly different vectors than the fp32 one, so they
+    must not be mixed, e.g., in the embedding cache.
+    """
+
+    return model_name if _backend == "fp32" else f"{model_name}@{_backend}"
+
+
+@lru_cache(maxsize=10)
+def quantize_model(model: SentenceTransformer) -> SentenceTransformer:
+    """Return a copy of the model with the weights of its linear layers quantized to int8.
+
+    The activations are quantized on the fly, which speeds up the CPU inference of
+    transformer models about 2x with a small loss of accuracy.
+    """
+
+    logger.info("Quantizing the embedding model to int8.")
+
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+@contextmanager
+def shared_forward_pass(model_name: str, texts: list[str]) -> Iterator[None]:
+    """Embed the texts of all the spaces using the same model in a single forward pass.
+
+    Superlinked embeds the inputs of every space separately, e.g., the titles and
+    then the descriptions of an ingested chunk. Within this context, the spaces read
+    the vectors computed up front for all their texts instead, including in the
+    threads started in a copy of the context. As
+    `SentenceTransformer.encode()` sorts its inputs by length, packing the short
+    titles with the long descriptions also reduces the padding of every batch.
+
+    Args:
+        model_name: Name of the model shared by the spaces.
+        texts: Texts of all the spaces using the model.
+    """
+
+    unique_texts = list(dict.fromkeys(texts))
+    if not unique_texts:
+        yield
+        return
+
+    # Goes through the embedding cache when it's installed.
+    vectors = SentenceTransformerManager(model_name)._embed(unique_texts)
+    keys = [(model_name, text) for text in unique_texts]
+    # Keeps the vectors of the enclosing contexts, e.g., of the other models.
+    token = _precomputed_vectors.set(
+        {**_precomputed_vectors.get(), **dict(zip(keys, vectors))}
+    )
+    try:
+        yield
+    finally:
+        _precomputed_vectors.reset(token)
+
+
+def configure(
+    backend: EmbeddingBackend, batch_size: int, num_threads: int | None
+) -> None:
+    """Tune how the SentenceTransformers based spaces run their model.
+
+    Superlinked calls `SentenceTransformer.encode()` with its default batch size and
+    doesn't expose it, so this replaces the embedding method of the model manager
+    shared by all the `TextSimilaritySpace` instances.
+
+    Args:
+        backend: Either "fp32" to run the original model, or "int8" to run it with
+            dynamically quantized linear layers. The int8 model always runs on CPU.
+        batch_size: Number of texts passed through the model at once.
+        num_threads: Number of intra-op threads used by torch. If None, torch picks it.
+    """
+
+    global _backend
+    _backend = backend
+
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+
+    def embed(
+        self: SentenceTransformerManager, inputs: list
+    ) -> list[list[float]] | list[np.ndarray]:
+        precomputed_vectors = _precomputed_vectors.get()
+        if precomputed_vectors and all(isinstance(input_, str) for input_ in inputs):
+            keys = [(self._model_name, input_) for input_ in inputs]
+            if all(key in precomputed_vectors for key in keys):
+                return [precomputed_vectors[key] for key in keys]
+
+        if backend == "int8":
+            model = quantize_model(
+                SentenceTransformerModelCache.initialize_model(
+                    self._model_name, CPU_DEVICE_TYPE, self._model_cache_dir
+                )
+            )
+        else:
+            model = self._get_embedding_model(len(inputs))
+        embeddings = model.encode(list(inputs), batch_size=batch_size)
+
+        return embeddings.tolist()
+
+    SentenceTransformerManager._embed = embed
+    logger.info(
+        f"Embedding texts with the {backend} model in batches of {batch_size} "
+        f"with {torch.get_num_threads()} threads."
+    )
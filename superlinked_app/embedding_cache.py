@@ -0,0 +1,377 @@
+import contextvars
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+import numpy as np
+import pyarrow.parquet as pq
+from loguru import logger
+from superlinked.framework.common.dag.context import ExecutionContext
+from superlinked.framework.common.data_types import Vector
+from superlinked.framework.common.space.embedding.sentence_transformer_embedding import (
+    SentenceTransformerEmbedding,
+)
+from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+    SentenceTransformerManager,
+)
+
+from superlinked_app import embedding_backend
+
+# Share of `max_entries` kept when the cache grows beyond it.
+EVICTION_TARGET_RATIO = 0.9
+
+# Whether the texts embedded in the current context are ingested, the only ones cached.
+_is_ingestion: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "is_ingestion", default=False
+)
+
+
+class EmbeddingCache:
+    """Persistent, content-addressed cache of text embeddings stored in SQLite.
+
+    The embeddings are keyed by the model ID and the SHA-256 hash of the text, and
+    stored as float32 blobs. When the cache grows beyond `max_entries`, the least
+    recently used 10% of the entries are evicted. The artifacts of precomputed
+    embeddings imported into the cache are recorded, so they are imported once.
+
+    Args:
+        path: Path to the SQLite database file. It is created if it doesn't exist.
+        max_entries: Maximum number of embeddings kept on disk.
+    """
+
+    def __init__(self, path: Path, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # The data loader and the queries embed texts from different threads.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model_id TEXT NOT NULL, "
+            "text_hash BLOB NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, "
+            "PRIMARY KEY (model_id, text_hash))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS imported_artifacts ("
+            "path TEXT PRIMARY KEY, "
+            "mtime_ns INTEGER NOT NULL, "
+            "size INTEGER NOT NULL)"
+        )
+        (self._num_entries,) = self._connection.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    def __len__(self) -> int:
+        return self._num_entries
+
+    @property
+    def hit_ratio(self) -> float:
+        num_lookups = self.hits + self.misses
+
+        return self.hits / num_lookups if num_lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "entries": self._num_entries,
+        }
+
+    def embed(
+        self,
+        model_id: str,
+        texts: Sequence[str],
+        embed_fn: Callable[[list[str]], Sequence[Sequence[float]]],
+    ) -> list[np.ndarray]:
+        """Return the embeddings of the texts, computing only the missing ones.
+
+        Args:
+            model_id: ID of the model computing the embeddings.
+            texts: Texts to embed.
+            embed_fn: Function embedding a list of texts, called once with the texts
+                missing from the cache.
+
+        Returns:
+            The float64 embedding of every text, in the order of the texts.
+        """
+
+        text_hashes = [hash_text(text) for text in texts]
+        cached_vectors = self._get_many(model_id, set(text_hashes))
+
+        missing_texts = {
+            text_hash: text
+            for text_hash, text in zip(text_hashes, texts)
+            if text_hash not in cached_vectors
+        }
+        # The data loader and the queries share the counters.
+        with self._lock:
+            self.hits += len(texts) - len(missing_texts)
+            self.misses += len(missing_texts)
+
+        if missing_texts:
+            new_vectors = [
+                np.asarray(vector, dtype=np.float32)
+                for vector in embed_fn(list(missing_texts.values()))
+            ]
+            new_cached_vectors = dict(zip(missing_texts.keys(), new_vectors))
+            self._put_many(model_id, new_cached_vectors)
+            cached_vectors.update(new_cached_vectors)
+
+        logger.debug(
+            f"Embedding cache: {len(texts) - len(missing_texts)}/{len(texts)} hits "
+            f"for '{model_id}' (overall hit ratio {self.hit_ratio:.2%})."
+        )
+
+        return [
+            cached_vectors[text_hash].astype(np.float64) for text_hash in text_hashes
+        ]
+
+    def add(
+        self, model_id: str, text_hashes: Sequence[bytes], vectors: np.ndarray
+    ) -> None:
+        """Store embeddings computed elsewhere, e.g., by `tools/precompute_embeddings.py`."""
+
+        self._put_many(
+            model_id, dict(zip(text_hashes, vectors.astype(np.float32, copy=False)))
+        )
+
+    def is_imported(self, artifact_path: Path) -> bool:
+        """Whether the artifact was imported, unchanged since, by `set_imported`."""
+
+        path, mtime_ns, size = get_artifact_identity(artifact_path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT mtime_ns, size FROM imported_artifacts WHERE path = ?", (path,)
+            ).fetchone()
+
+        return row == (mtime_ns, size)
+
+    def set_imported(self, artifact_path: Path) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO imported_artifacts VALUES (?, ?, ?)",
+                get_artifact_identity(artifact_path),
+            )
+            self._connection.commit()
+
+    def _get_many(
+        self, model_id: str, text_hashes: set[bytes]
+    ) -> dict[bytes, np.ndarray]:
+        if not text_hashes:
+            return {}
+
+        text_hashes_list = list(text_hashes)
+        vectors = {}
+        with self._lock:
+            # Stay below SQLite's default limit of 999 query parameters.
+            for start in range(0, len(text_hashes_list), 900):
+                batch = text_hashes_list[start : start + 900]
+                rows = self._connection.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model_id = ? AND text_hash IN ({', '.join('?' * len(batch))})",
+                    [model_id, *batch],
+                ).fetchall()
+                vectors.update(
+                    (text_hash, np.frombuffer(vector, dtype=np.float32))
+                    for text_hash, vector in rows
+                )
+
+            if vectors:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model_id = ? AND text_hash = ?",
+                    [(now, model_id, text_hash) for text_hash in vectors],
+                )
+                self._connection.commit()
+
+        return vectors
+
+    def _put_many(self, model_id: str, vectors: dict[bytes, np.ndarray]) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                [
+                    (model_id, text_hash, vector.tobytes(), now)
+                    for text_hash, vector in vectors.items()
+                ],
+            )
+            # Overestimates the count when texts are stored again, `_evict` recounts.
+            self._num_entries += len(vectors)
+            if self._num_entries > self.max_entries:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        (self._num_entries,) = self._connection.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+        if self._num_entries <= self.max_entries:
+            return
+
+        # Evict below the limit to amortize the eviction cost over many inserts.
+        num_evicted = self._num_entries - int(self.max_entries * EVICTION_TARGET_RATIO)
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (num_evicted,),
+        )
+        self._num_entries -= num_evicted
+        logger.info(f"Evicted {num_evicted} embeddings from the embedding cache.")
+
+
+def hash_text(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def get_artifact_identity(artifact_path: Path) -> tuple[str, int, int]:
+    """Identify a version of a file by its absolute path, modification time and size."""
+
+    stat = artifact_path.stat()
+
+    return str(artifact_path.resolve()), stat.st_mtime_ns, stat.st_size
+
+
+def load_precomputed_embeddings(
+    cache: EmbeddingCache, artifact_path: Path, model_id: str
+) -> None:
+    """Add the embeddings written by `tools/precompute_embeddings.py` to the cache.
+
+    The data loader then finds the embeddings of every precomputed product in the
+    cache instead of running the model. An artifact already imported, and unchanged
+    since, is skipped, so the servers sharing the cache start without importing it
+    again.
+
+    Args:
+        cache: The embedding cache.
+        artifact_path: Path to the Parquet file of the precomputed embeddings.
+        model_id: ID of the model embedding the texts of the server, see
+            `embedding_backend.get_model_id()`.
+
+    Raises:
+        ValueError: If the artifact was computed by another model or backend, as the
+            server wouldn't find its embeddings, or if it holds more embeddings than
+            the cache keeps, as it would evict the ones it loaded first.
+    """
+
+    parquet_file = pq.ParquetFile(artifact_path)
+    artifact_model_id = parquet_file.schema_arrow.metadata[b"model_id"].decode()
+    if artifact_model_id != model_id:
+        raise ValueError(
+            f"'{artifact_path}' holds embeddings of '{artifact_model_id}', but the "
+            f"server embeds the texts with '{model_id}'. Precompute them again with "
+            "the same model and EMBEDDING_BACKEND."
+        )
+    if cache.is_imported(artifact_path):
+        logger.info(
+            f"Skipped the precomputed embeddings of '{artifact_path}', already in the "
+            "embedding cache."
+        )
+        return
+
+    hashes = pq.read_table(artifact_path, columns=["title_hash", "description_hash"])
+    num_artifact_embeddings = sum(
+        len(column) - column.null_count for column in hashes.columns
+    )
+    capacity = int(cache.max_entries * EVICTION_TARGET_RATIO)
+    if num_artifact_embeddings > capacity:
+        raise ValueError(
+            f"'{artifact_path}' holds {num_artifact_embeddings} embeddings, more than "
+            f"the {capacity} kept by the embedding cache. Increase "
+            "EMBEDDING_CACHE_MAX_ENTRIES."
+        )
+
+    num_embeddings = 0
+    for batch in parquet_file.iter_batches():
+        for field in ["title", "description"]:
+            text_hashes = batch.column(f"{field}_hash")
+            embeddings = batch.column(f"{field}_embedding")
+            is_valid = text_hashes.is_valid()
+            text_hashes = text_hashes.filter(is_valid)
+            embeddings = embeddings.filter(is_valid)
+            if len(embeddings) == 0:
+                continue
+
+            vectors = embeddings.values.to_numpy().reshape(len(embeddings), -1)
+            cache.add(model_id, text_hashes.to_pylist(), vectors)
+            num_embeddings += len(embeddings)
+
+    cache.set_imported(artifact_path)
+    logger.info(
+        f"Loaded {num_embeddings} precomputed embeddings from '{artifact_path}'."
+    )
+
+
+@contextmanager
+def ingestion() -> Iterator[None]:
+    """Read the text embeddings computed within this context through the cache.
+
+    The texts embedded by the spaces are cached only when ingested, and the ones
+    embedded up front for the ingested items, e.g., by `shared_forward_pass()`, must be
+    embedded in this context. The query texts aren't cached, so they don't wait for
+    SQLite or evict the embeddings of the products.
+    """
+
+    token = _is_ingestion.set(True)
+    try:
+        yield
+    finally:
+        _is_ingestion.reset(token)
+
+
+def install(cache: EmbeddingCache) -> None:
+    """Make every SentenceTransformers based space read its ingested text embeddings through the cache.
+
+    Superlinked has no hook to customize how the `TextSimilaritySpace` embeddings are
+    computed, so this wraps the model manager shared by all of them, and the embedding
+    of the spaces, to tell the ingestion from the queries by its execution context.
+    """
+
+    embed = SentenceTransformerManager._embed
+    embed_multiple = SentenceTransformerEmbedding.embed_multiple
+
+    def embed_multiple_in_context(
+        self: SentenceTransformerEmbedding,
+        inputs: Sequence[str],
+        context: ExecutionContext,
+    ) -> list[Vector]:
+        if context.is_query_context:
+            return embed_multiple(self, inputs, context)
+        with ingestion():
+            return embed_multiple(self, inputs, context)
+
+    def cached_embed(
+        self: SentenceTransformerManager, inputs: Sequence
+    ) -> list[list[float]] | list[np.ndarray]:
+        if not _is_ingestion.get() or not all(
+            isinstance(input_, str) for input_ in inputs
+        ):
+            return embed(self, inputs)
+
+        return cache.embed(
+            embedding_backend.get_model_id(self._model_name),
+            inputs,
+            lambda texts: embed(self, texts),
+        )
+
+    SentenceTransformerManager._embed = cached_embed
+    SentenceTransformerEmbedding.embed_multiple = embed_multiple_in_context
+    logger.info(
+        f"Using the embedding cache from '{cache.path}' with {len(cache)} embeddings."
+    )
@@ -0,0 +1,287 @@
+import numbers
+from collections.abc import Hashable, Sequence
+from functools import reduce
+from typing import Any, cast
+
+import numpy as np
+from superlinked.framework.common.interface.comparison_operand import (
+    ComparisonOperation,
+)
+from superlinked.framework.common.interface.comparison_operation_type import (
+    ComparisonOperationType,
+)
+from superlinked.framework.common.storage.field.field import Field
+
+# Code of the rows without a value.
+MISSING_CODE = 0
+
+
+def to_bitmap(positions: np.ndarray, num_bytes: int) -> np.ndarray:
+    """Return a bitmap, packed little-endian in bytes, with the bits of the positions set."""
+
+    is_set = np.zeros(num_bytes * 8, dtype=bool)
+    is_set[positions] = True
+
+    return np.packbits(is_set, bitorder="little")
+
+
+def to_hashable(value: Any) -> Hashable:
+    return tuple(value) if isinstance(value, list | tuple) else value
+
+
+def to_sequence(value: Any) -> Sequence[Any]:
+    # Same as `ComparisonOperation._get_other_as_sequence()`.
+    return (
+        value if isinstance(value, Sequence) and not isinstance(value, str) else [value]
+    )
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class FieldIndex:
+    """Index of the values of a field, by the position of their row.
+
+    Every value is dictionary encoded, every string value and every element of a list
+    value has a bitmap of the rows having it, and the numbers are kept sorted.
+
+    Args:
+        capacity: Number of rows, a multiple of 8.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.codes = np.full(capacity, MISSING_CODE, dtype=np.int32)
+        self.numbers = np.full(capacity, np.nan)
+        self.values: list[Hashable] = [None]
+        self.code_by_value: dict[Hashable, int] = {None: MISSING_CODE}
+        # Bitmaps by ("value", string) and ("element", list element).
+        self.bitmaps: dict[tuple[str, Hashable], np.ndarray] = {}
+        # A CONTAINS filter on a string means a substring search instead.
+        self.has_strings = False
+        self.has_non_numbers = False
+        self.is_hashable = True
+
+        self._sorted_numbers: tuple[np.ndarray, np.ndarray] | None = None
+
+    def resize(self, capacity: int) -> None:
+        num_rows = len(self.codes)
+        self.codes = np.resize(self.codes, capacity)
+        self.codes[num_rows:] = MISSING_CODE
+        self.numbers = np.resize(self.numbers, capacity)
+        self.numbers[num_rows:] = np.nan
+        for key, bitmap in self.bitmaps.items():
+            self.bitmaps[key] = np.concatenate(
+                [bitmap, np.zeros((capacity - num_rows) // 8, dtype=np.uint8)]
+            )
+
+    def set_value(self, position: int, value: Any) -> None:
+        old_value = self.values[self.codes[position]]
+        for key in self._get_bitmap_keys(old_value):
+            self.bitmaps[key][position >> 3] &= ~np.uint8(1 << (position & 7))
+
+        value = to_hashable(value)
+        try:
+            code = self.code_by_value.setdefault(value, len(self.values))
+        except TypeError:
+            self.is_hashable = False
+            return
+        if code == len(self.values):
+            self.values.append(value)
+        self.codes[position] = code
+        for key in self._get_bitmap_keys(value):
+            if key not in self.bitmaps:
+                self.bitmaps[key] = np.zeros(len(self.codes) // 8, dtype=np.uint8)
+            self.bitmaps[key][position >> 3] |= np.uint8(1 << (position & 7))
+
+        self.numbers[position] = value if is_number(value) else np.nan
+        self.has_strings |= isinstance(value, str)
+        self.has_non_numbers |= value is not None and not is_number(value)
+        self._sorted_numbers = None
+
+    def get_bitmap(
+        self, op: ComparisonOperationType, other: Any, rows: np.ndarray
+    ) -> np.ndarray | None:
+        """Return the bitmap of the rows passing the comparison, None if it's unsupported.
+
+        Args:
+            op: The comparison.
+            other: The value compared to.
+            rows: Bitmap of the existing rows.
+        """
+
+        if not self.is_hashable:
+            return None
+
+        match op:
+            case ComparisonOperationType.EQUAL:
+                return self._get_equal_bitmap(other, rows)
+            case ComparisonOperationType.NOT_EQUAL:
+                return rows & ~self._get_equal_bitmap(other, rows)
+            case ComparisonOperationType.IN:
+                return self._get_in_bitmap(other, rows)
+            case ComparisonOperationType.NOT_IN:
+                return rows & ~self._get_in_bitmap(other, rows)
+            case ComparisonOperationType.CONTAINS if not self.has_strings:
+                return self._get_contains_bitmap(
+                    other, np.bitwise_or, np.zeros_like(rows)
+                )
+            case ComparisonOperationType.NOT_CONTAINS if not self.has_strings:
+                return self._get_has_value_bitmap(rows) & ~self._get_contains_bitmap(
+                    other, np.bitwise_or, np.zeros_like(rows)
+                )
+            case ComparisonOperationType.CONTAINS_ALL if not self.has_strings:
+                return (rows & ~self._get_has_value_bitmap(rows)) | (
+                    self._get_contains_bitmap(other, np.bitwise_and, rows)
+                )
+            case (
+                ComparisonOperationType.GREATER_THAN
+                | ComparisonOperationType.LESS_THAN
+                | ComparisonOperationType.GREATER_EQUAL
+                | ComparisonOperationType.LESS_EQUAL
+            ) if not self.has_non_numbers and is_number(other):
+                return self._get_range_bitmap(op, other, rows)
+
+        return None
+
+    def _get_equal_bitmap(self, other: Any, rows: np.ndarray) -> np.ndarray:
+        other = to_hashable(other)
+        if isinstance(other, str):
+            return self.bitmaps.get(("value", other), np.zeros_like(rows))
+        if (code := self.code_by_value.get(other)) is None:
+            return np.zeros_like(rows)
+
+        return rows & np.packbits(self.codes == code, bitorder="little")
+
+    def _get_in_bitmap(self, other: Any, rows: np.ndarray) -> np.ndarray:
+        return reduce(
+            np.bitwise_or,
+            [self._get_equal_bitmap(value, rows) for value in to_sequence(other)],
+            np.zeros_like(rows),
+        )
+
+    def _get_has_value_bitmap(self, rows: np.ndarray) -> np.ndarray:
+        return rows & np.packbits(self.codes != MISSING_CODE, bitorder="little")
+
+    def _get_contains_bitmap(
+        self, other: Any, combine: np.ufunc, initial: np.ndarray
+    ) -> np.ndarray:
+        return reduce(
+            combine,
+            [
+                self.bitmaps.get(
+                    ("element", to_hashable(element)), np.zeros_like(initial)
+                )
+                for element in to_sequence(other)
+            ],
+            initial,
+        )
+
+    def _get_range_bitmap(
+        self, op: ComparisonOperationType, other: float, rows: np.ndarray
+    ) -> np.ndarray:
+        if self._sorted_numbers is None:
+            positions = np.flatnonzero(~np.isnan(self.numbers))
+            order = np.argsort(self.numbers[positions], kind="stable")
+            self._sorted_numbers = (self.numbers[positions][order], positions[order])
+        numbers, positions = self._sorted_numbers
+
+        match op:
+            case ComparisonOperationType.GREATER_THAN:
+                positions = positions[np.searchsorted(numbers, other, "right") :]
+            case ComparisonOperationType.GREATER_EQUAL:
+                positions = positions[np.searchsorted(numbers, other, "left") :]
+            case ComparisonOperationType.LESS_THAN:
+                positions = positions[: np.searchsorted(numbers, other, "left")]
+            case ComparisonOperationType.LESS_EQUAL:
+                positions = positions[: np.searchsorted(numbers, other, "right")]
+
+        return rows & to_bitmap(positions, len(rows))
+
+    @staticmethod
+    def _get_bitmap_keys(value: Hashable) -> list[tuple[str, Hashable]]:
+        if isinstance(value, str):
+            return [("value", value)]
+        if isinstance(value, tuple):
+            return [("element", element) for element in set(value)]
+
+        return []
+
+
+class FilterIndex:
+    """Bitmap indices of the filterable fields of the rows of a vector database.
+
+    The rows are identified by their position. The filters of a query are turned into
+    bitmap intersections and unions, instead of being evaluated row by row. The ones
+    the index doesn't support, e.g., a substring search, are returned to be evaluated
+    row by row on the remaining candidates.
+
+    Args:
+        field_names: Names of the indexed fields.
+    """
+
+    def __init__(self, field_names: Sequence[str]) -> None:
+        self.capacity = 1024
+        self.fields = {name: FieldIndex(self.capacity) for name in field_names}
+        self.rows = np.zeros(self.capacity // 8, dtype=np.uint8)
+
+    def update(self, values_by_position: dict[int, dict[str, Any] | None]) -> None:
+        """Index the field values of the rows, removing the rows without values."""
+
+        if (
+            values_by_position
+            and (max_position := max(values_by_position)) >= self.capacity
+        ):
+            capacity = self.capacity
+            while capacity <= max_position:
+                capacity *= 2
+            for field in self.fields.values():
+                field.resize(capacity)
+            self.rows = np.concatenate(
+                [self.rows, np.zeros((capacity - self.capacity) // 8, dtype=np.uint8)]
+            )
+            self.capacity = capacity
+
+        for position, values in values_by_position.items():
+            bit = np.uint8(1 << (position & 7))
+            if values is None:
+                self.rows[position >> 3] &= ~bit
+            else:
+                self.rows[position >> 3] |= bit
+            for name, field in self.fields.items():
+                field.set_value(position, None if values is None else values.get(name))
+
+    def get_mask(
+        self, filters: Sequence[ComparisonOperation[Field]], num_rows: int
+    ) -> tuple[np.ndarray, list[ComparisonOperation[Field]]]:
+        """Return the rows passing the filters, and the filters left to evaluate.
+
+        Args:
+            filters: The filters, ANDed except for the ones of an OR group.
+            num_rows: Length of the returned boolean mask.
+        """
+
+        bitmap = self.rows.copy()
+        remaining_filters = []
+        for group_key, group in ComparisonOperation._group_filters_by_group_key(
+            filters
+        ).items():
+            bitmaps = [self._get_bitmap(filter_) for filter_ in group]
+            if any(group_bitmap is None for group_bitmap in bitmaps):
+                remaining_filters.extend(group)
+            elif group_key is None:
+                bitmap &= reduce(np.bitwise_and, bitmaps)
+            else:
+                bitmap &= reduce(np.bitwise_or, bitmaps)
+
+        # The rows past the capacity are padded with zeros.
+        mask = np.unpackbits(bitmap, count=num_rows, bitorder="little").astype(bool)
+
+        return mask, remaining_filters
+
+    def _get_bitmap(self, filter_: ComparisonOperation[Field]) -> np.ndarray | None:
+        field = self.fields.get(cast(Field, filter_._operand).name)
+        if field is None:
+            return None
+
+        return field.get_bitmap(filter_._op, filter_._other, self.rows)
@@ -0,0 +1,155 @@
+import hashlib
+import sqlite3
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+# (Fingerprint of the embedded columns, fingerprint of the other columns) of a row.
+Fingerprint = tuple[bytes, bytes]
+
+
+class RowFingerprints:
+    """Fingerprints of the loaded rows by id, stored in SQLite.
+
+    A row is fingerprinted by two SHA-256 hashes: one of its columns embedded by a
+    model, e.g., the title and the description, and one of its other columns, e.g.,
+    the price. Comparing them tells whether a row is new, unchanged, or changed with or
+    without its embedded texts.
+
+    The fingerprints describe the rows written to a vector database, so they are bound
+    to its id before a load: if they were stored for another database, e.g., a deleted
+    one or a snapshot written with other settings, they are cleared, otherwise the rows
+    loaded before would be skipped.
+
+    Args:
+        path: Path to the SQLite database file. It is created if it doesn't exist.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Id of the vector database the fingerprints describe, None until bound.
+        self.database_id: str | None = None
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "row_id TEXT PRIMARY KEY, "
+            "embedded_hash BLOB NOT NULL, "
+            "other_hash BLOB NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (num_rows,) = self._connection.execute(
+                "SELECT COUNT(*) FROM fingerprints"
+            ).fetchone()
+
+        return num_rows
+
+    def bind(self, database_id: str) -> None:
+        """Bind the fingerprints to a vector database, clearing the ones of another."""
+
+        with self._lock:
+            stored = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'database_id'"
+            ).fetchone()
+            num_cleared = 0
+            if stored is None or stored[0] != database_id:
+                num_cleared = self._connection.execute(
+                    "DELETE FROM fingerprints"
+                ).rowcount
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('database_id', ?)",
+                    (database_id,),
+                )
+                self._connection.commit()
+            self.database_id = database_id
+        if num_cleared:
+            logger.warning(
+                f"Cleared the {num_cleared} fingerprints at '{self.path}', stored for "
+                "another vector database: all the rows will be loaded again."
+            )
+
+    def get_many(self, row_ids: Sequence[str]) -> dict[str, Fingerprint]:
+        fingerprints = {}
+        with self._lock:
+            # Stay below SQLite's default limit of 999 query parameters.
+            for start in range(0, len(row_ids), 900):
+                batch = list(row_ids[start : start + 900])
+                rows = self._connection.execute(
+                    "SELECT row_id, embedded_hash, other_hash FROM fingerprints "
+                    f"WHERE row_id IN ({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                fingerprints.update(
+                    (row_id, (embedded_hash, other_hash))
+                    for row_id, embedded_hash, other_hash in rows
+                )
+
+        return fingerprints
+
+    def put_many(self, fingerprints: dict[str, Fingerprint]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?)",
+                [
+                    (row_id, embedded_hash, other_hash)
+                    for row_id, (embedded_hash, other_hash) in fingerprints.items()
+                ],
+            )
+            self._connection.commit()
+
+
+def fingerprint_rows(df: pd.DataFrame, columns: Sequence[str]) -> list[bytes]:
+    """Hash the values of the columns of every row.
+
+    The rows are hashed through their JSON representation, which is the same for the
+    Arrow-backed columns read from Parquet and the object columns read from JSON lines.
+    The numbers are hashed as floats, as `pd.read_json()` infers integers from whole
+    floats.
+    """
+
+    if not columns:
+        return [b""] * len(df)
+    values = pd.DataFrame(
+        {
+            column: (
+                df[column].astype("float64")
+                if pd.api.types.is_numeric_dtype(df[column])
+                else df[column]
+            )
+            for column in columns
+        }
+    )
+    lines = values.to_json(orient="records", lines=True).splitlines()
+
+    return [hashlib.sha256(line.encode("utf-8")).digest() for line in lines]
+
+
+def get_fingerprints(
+    df: pd.DataFrame, id_column: str, embedded_columns: Sequence[str]
+) -> dict[str, Fingerprint]:
+    other_columns = [
+        column
+        for column in df.columns
+        if column != id_column and column not in embedded_columns
+    ]
+
+    return dict(
+        zip(
+            df[id_column].astype(str),
+            zip(
+                fingerprint_rows(df, embedded_columns),
+                fingerprint_rows(df, other_columns),
+            ),
+        )
+    )
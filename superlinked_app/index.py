@@ -1,6 +1,25 @@
 from superlinked import framework as sl
 
-from superlinked_app import constants
+from superlinked_app import (
+    constants,
+    embedding_backend,
+    embedding_cache,
+    query_embedding_cache,
+)
+from superlinked_app.config import settings
+
+embedding_backend.configure(
+    settings.EMBEDDING_BACKEND,
+    settings.EMBEDDING_BATCH_SIZE,
+    settings.EMBEDDING_NUM_THREADS,
+)
+if settings.EMBEDDING_CACHE_ENABLED:
+    text_embedding_cache = embedding_cache.EmbeddingCache(
+        settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES
+    )
+    embedding_cache.install(text_embedding_cache)
+else:
+    text_embedding_cache = None
 
 
 class ProductSchema(sl.Schema):
@@ -23,11 +42,31 @@ category_space = sl.CategoricalSimilaritySpace(
     negative_filter=-1,
 )
 title_space = sl.TextSimilaritySpace(
-    text=product.title, model="Alibaba-NLP/gte-large-en-v1.5"
+    text=product.title, model=constants.TEXT_EMBEDDING_MODEL_ID
 )
 description_space = sl.TextSimilaritySpace(
-    text=product.description, model="Alibaba-NLP/gte-large-en-v1.5"
+    text=product.description, model=constants.TEXT_EMBEDDING_MODEL_ID
 )
+# Query embedding caches by space name, exposing their hit/miss stats.
+query_embedding_caches: dict[str, query_embedding_cache.QueryEmbeddingCache] = {}
+if settings.QUERY_EMBEDDING_CACHE_ENABLED:
+    text_spaces = {"title": title_space, "description": description_space}
+    for name, space in text_spaces.items():
+        shared_store = None
+        if settings.QUERY_EMBEDDING_CACHE_SHARED_DIR is not None:
+            shared_store = query_embedding_cache.SharedVectorStore(
+                settings.QUERY_EMBEDDING_CACHE_SHARED_DIR / f"{name}_space.f32",
+                embedding_backend.get_model_id(constants.TEXT_EMBEDDING_MODEL_ID),
+                space.transformation_config.embedding_config.length,
+                settings.QUERY_EMBEDDING_CACHE_SHARED_CAPACITY,
+            )
+        query_embedding_caches[name] = query_embedding_cache.QueryEmbeddingCache(
+            settings.QUERY_EMBEDDING_CACHE_MAX_SIZE, shared_store
+        )
+    query_embedding_cache.install(
+        {text_spaces[name]: cache for name, cache in query_embedding_caches.items()}
+    )
+
 review_rating_maximizer_space = sl.NumberSpace(
     number=product.review_rating, min_value=-1.0, max_value=5.0, mode=sl.Mode.MAXIMUM
 )
@@ -0,0 +1,344 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager, nullcontext
+from typing import Any
+
+from fastapi import FastAPI, Response
+from loguru import logger
+from opentelemetry import trace
+from superlinked.framework.common.dag.context import ExecutionContext
+from superlinked.framework.common.data_types import Vector
+from superlinked.framework.common.nlq.open_ai import OpenAIClient, OpenAIClientConfig
+from superlinked.framework.common.space.embedding.sentence_transformer_embedding import (
+    SentenceTransformerEmbedding,
+)
+from superlinked.framework.common.storage_manager.storage_manager import (
+    StorageManager,
+)
+from superlinked.framework.dsl.app.rest.rest_app import RestApp
+from superlinked.framework.dsl.executor.rest.rest_handler import RestHandler
+from superlinked.framework.dsl.query.nlq_param_evaluator import NLQParamEvaluator
+from superlinked.framework.dsl.query.query_descriptor import QueryDescriptor
+from superlinked.framework.dsl.query.query_mixin import QueryMixin
+from superlinked.framework.dsl.query.result import Result
+from superlinked.server.middleware import lifespan_event
+
+from superlinked_app import vector_index
+from superlinked_app.batch_search import BatchSearcher
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS_S = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = tuple(float(4**i) for i in range(11))
+# Query label of the stages run outside of a query endpoint, e.g., by the data loader.
+NO_QUERY = "none"
+
+_query_name: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "query_name", default=NO_QUERY
+)
+
+
+class Histogram:
+    """Prometheus histogram, with a series per combination of label values.
+
+    Args:
+        name: Name of the metric.
+        documentation: Help text of the metric.
+        label_names: Names of the labels of the series.
+        buckets: Upper bounds of the buckets, sorted. The `+Inf` one is implicit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+
+        self._lock = threading.Lock()
+        # Non-cumulative bucket counts and sum of the values, by label values.
+        self._bucket_counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts = self._bucket_counts.get(label_values)
+            if bucket_counts is None:
+                bucket_counts = self._bucket_counts[label_values] = [0] * (
+                    len(self.buckets) + 1
+                )
+                self._sums[label_values] = 0.0
+            bucket_counts[bucket] += 1
+            self._sums[label_values] += value
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                ",".join(label_values): {
+                    "count": sum(bucket_counts),
+                    "mean": self._sums[label_values] / sum(bucket_counts),
+                }
+                for label_values, bucket_counts in self._bucket_counts.items()
+            }
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for label_values, bucket_counts in sorted(self._bucket_counts.items()):
+                labels = format_labels(zip(self.label_names, label_values))
+                count = 0
+                for upper_bound, bucket_count in zip(
+                    [*map(repr, self.buckets), "+Inf"], bucket_counts
+                ):
+                    count += bucket_count
+                    bucket_labels = format_labels(
+                        [*zip(self.label_names, label_values), ("le", upper_bound)]
+                    )
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+                lines.append(f"{self.name}_sum{labels} {self._sums[label_values]!r}")
+                lines.append(f"{self.name}_count{labels} {count}")
+
+        return lines
+
+
+def format_labels(labels: Iterator[tuple[str, str]] | Sequence[tuple[str, str]]) -> str:
+    escaped_labels = [
+        (name, value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels
+    ]
+
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped_labels) + "}"
+
+
+class SearchMetrics:
+    """Latencies and sizes of the stages of the search path, in the Prometheus format.
+
+    Every query is split in stages: the natural query parsing, including the OpenAI
+    call when the rules and the cache don't resolve it, the embedding of its texts,
+    and the vector search, whether in memory or a round trip to MongoDB. Their
+    latencies are labelled by query name. The numbers of texts embedded at once and of
+    products passing the filters of the in-memory searches are recorded too, and the
+    hit ratios of the caches are read from their `stats()` when the metrics are
+    rendered.
+
+    Args:
+        tracing_enabled: Whether to also record every stage as an OpenTelemetry span,
+            exported by the tracer provider the server runs with.
+    """
+
+    def __init__(self, tracing_enabled: bool) -> None:
+        self.tracing_enabled = tracing_enabled
+        self.stage_seconds = Histogram(
+            "product_search_stage_seconds",
+            "Latency of the stages of the search path, in seconds.",
+            ["stage", "query"],
+            LATENCY_BUCKETS_S,
+        )
+        self.embedding_batch_size = Histogram(
+            "product_search_embedding_batch_size",
+            "Number of texts embedded at once, for queries or for ingestion.",
+            ["context"],
+            SIZE_BUCKETS,
+        )
+        self.search_candidates = Histogram(
+            "product_search_candidates",
+            "Number of products passing the filters of an in-memory vector search.",
+            ["query"],
+            SIZE_BUCKETS,
+        )
+
+        self._caches: dict[str, Callable[[], dict[str, Any]]] = {}
+        self._tracer = trace.get_tracer(__name__) if tracing_enabled else None
+
+    def add_cache(self, name: str, stats: Callable[[], dict[str, Any]]) -> None:
+        """Export the hits and misses of a cache, as returned by its `stats()`."""
+
+        self._caches[name] = stats
+
+    @contextmanager
+    def time_stage(self, stage: str, **attributes: Any) -> Iterator[None]:
+        query_name = _query_name.get()
+        span = (
+            nullcontext()
+            if self._tracer is None
+            else self._tracer.start_as_current_span(
+                stage, attributes={"query": query_name, **attributes}
+            )
+        )
+        start_time = time.perf_counter()
+        try:
+            with span:
+                yield
+        finally:
+            self.stage_seconds.observe(
+                time.perf_counter() - start_time, stage, query_name
+            )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "stage_seconds": self.stage_seconds.stats(),
+            "embedding_batch_size": self.embedding_batch_size.stats(),
+            "search_candidates": self.search_candidates.stats(),
+            "caches": {name: stats() for name, stats in self._caches.items()},
+        }
+
+    def render(self) -> str:
+        lines = [
+            *self.stage_seconds.render(),
+            *self.embedding_batch_size.render(),
+            *self.search_candidates.render(),
+        ]
+        cache_lookups = {}
+        for name, get_stats in self._caches.items():
+            stats = get_stats()
+            cache_lookups[name] = (stats["hits"], stats["misses"])
+        for metric, metric_type, documentation, get_value in [
+            (
+                "product_search_cache_hits_total",
+                "counter",
+                "Lookups of the caches finding their entry.",
+                lambda hits, _: hits,
+            ),
+            (
+                "product_search_cache_misses_total",
+                "counter",
+                "Lookups of the caches missing their entry.",
+                lambda _, misses: misses,
+            ),
+            (
+                "product_search_cache_hit_ratio",
+                "gauge",
+                "Ratio of the lookups of the caches finding their entry.",
+                lambda hits, misses: hits / (hits + misses) if hits + misses else 0.0,
+            ),
+        ]:
+            lines.append(f"# HELP {metric} {documentation}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for name, (hits, misses) in cache_lookups.items():
+                labels = format_labels([("cache", name)])
+                lines.append(f"{metric}{labels} {get_value(hits, misses)!r}")
+
+        return "\n".join(lines) + "\n"
+
+
+def install(metrics: SearchMetrics) -> None:
+    """Time the stages of the search path and serve the metrics at `/metrics`.
+
+    The methods running the stages are wrapped, so they must be installed after the
+    caches and the natural query fast path, to measure the stages as the queries run
+    them. Nothing is wrapped unless this is called, so disabled metrics cost nothing.
+    """
+
+    query_handler = RestHandler._query_handler
+    evaluate_param_infos = NLQParamEvaluator.evaluate_param_infos
+    query_openai = OpenAIClient.query
+    embed_multiple = SentenceTransformerEmbedding.embed_multiple
+    knn_search = StorageManager.knn_search
+    batch_search = BatchSearcher.search
+
+    def timed_query_handler(
+        self: RestHandler, query_descriptor: dict, path: str
+    ) -> Result:
+        # The path of the query endpoint ends with the query name.
+        token = _query_name.set(path.rsplit("/", 1)[-1])
+        try:
+            with metrics.time_stage("query"):
+                return query_handler(self, query_descriptor, path)
+        finally:
+            _query_name.reset(token)
+
+    def named_batch_search(
+        self: BatchSearcher,
+        app: QueryMixin,
+        query_descriptor: QueryDescriptor,
+        params_list: Sequence[dict[str, Any]],
+        query_name: str | None = None,
+    ) -> list[Result]:
+        # The queries of the batch run in copies of this context, so they're labelled.
+        token = _query_name.set(query_name or NO_QUERY)
+        try:
+            return batch_search(self, app, query_descriptor, params_list, query_name)
+        finally:
+            _query_name.reset(token)
+
+    def timed_evaluate_param_infos(
+        self: NLQParamEvaluator,
+        natural_query: str,
+        client_config: OpenAIClientConfig,
+        system_prompt: str | None = None,
+    ) -> dict[str, Any]:
+        with metrics.time_stage("nl_parsing"):
+            return evaluate_param_infos(
+                self, natural_query, client_config, system_prompt
+            )
+
+    def timed_query_openai(self: OpenAIClient, *args: Any, **kwargs: Any) -> dict:
+        with metrics.time_stage("openai"):
+            return query_openai(self, *args, **kwargs)
+
+    def timed_embed_multiple(
+        self: SentenceTransformerEmbedding,
+        inputs: Sequence[str],
+        context: ExecutionContext,
+    ) -> list[Vector]:
+        embedding_context = "query" if context.is_query_context else "ingestion"
+        metrics.embedding_batch_size.observe(len(inputs), embedding_context)
+        with metrics.time_stage("embedding", batch_size=len(inputs)):
+            return embed_multiple(self, inputs, context)
+
+    def timed_knn_search(self: StorageManager, *args: Any, **kwargs: Any) -> Any:
+        with metrics.time_stage("vector_search"):
+            return knn_search(self, *args, **kwargs)
+
+    def observe_num_candidates(num_candidates: int) -> None:
+        metrics.search_candidates.observe(num_candidates, _query_name.get())
+
+    RestHandler._query_handler = timed_query_handler
+    NLQParamEvaluator.evaluate_param_infos = timed_evaluate_param_infos
+    OpenAIClient.query = timed_query_openai
+    SentenceTransformerEmbedding.embed_multiple = timed_embed_multiple
+    StorageManager.knn_search = timed_knn_search
+    BatchSearcher.search = named_batch_search
+    vector_index.num_candidates_observer = observe_num_candidates
+
+    register_routes = lifespan_event._register_routes
+
+    def get_metrics() -> Response:
+        return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+    def register_routes_with_metrics(app: FastAPI, rest_app: RestApp) -> None:
+        register_routes(app, rest_app)
+        app.add_api_route(path=METRICS_PATH, endpoint=get_metrics, methods=["GET"])
+        logger.info(f"Registered the metrics endpoint '{METRICS_PATH}'.")
+
+    lifespan_event._register_routes = register_routes_with_metrics
+    logger.info(
+        "Recording the metrics of the search path"
+        + (" and their OpenTelemetry spans." if metrics.tracing_enabled else ".")
+    )
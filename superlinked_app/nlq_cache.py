@@ -0,0 +1,190 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+from loguru import logger
+from pydantic import BaseModel
+from superlinked.framework.dsl.query.nlq_param_evaluator import (
+    NLQParamEvaluator,
+    QuerySuggestionsModel,
+)
+
+
+def normalize_natural_query(natural_query: str) -> str:
+    return " ".join(natural_query.casefold().split())
+
+
+class NaturalQueryCache:
+    """LRU cache with a time to live of the parameters extracted from natural queries.
+
+    The parameters are keyed by the LLM model ID, the prompt describing the query and
+    its already set parameters, and the normalized natural query. When `path` is set,
+    the parameters are also persisted in SQLite, so they survive server restarts.
+
+    Args:
+        max_size: Maximum number of parameter sets kept in memory.
+        ttl_seconds: Number of seconds after which the parameters are extracted again.
+        path: Optional path to the SQLite database file persisting the cache.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, path: Path | None) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._connection = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS natural_queries ("
+                "key TEXT PRIMARY KEY, "
+                "params TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        num_lookups = self.hits + self.misses
+
+        return self.hits / num_lookups if num_lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "entries": len(self._entries),
+        }
+
+    def get_or_extract(
+        self,
+        model_id: str,
+        prompt: str,
+        natural_query: str,
+        extract: Callable[[], dict[str, Any]],
+    ) -> dict[str, Any]:
+        """Return the cached parameters of the natural query, or extract and cache them.
+
+        Args:
+            model_id: ID of the LLM extracting the parameters.
+            prompt: Prompt describing the parameters to extract.
+            natural_query: Natural query of the user.
+            extract: Function extracting the parameters with the LLM.
+        """
+
+        key = hashlib.sha256(
+            "\0".join(
+                [model_id, prompt, normalize_natural_query(natural_query)]
+            ).encode("utf-8")
+        ).hexdigest()
+
+        params = self._get(key)
+        is_hit = params is not None
+        if is_hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+            params = extract()
+            self._put(key, params)
+        logger.debug(
+            f"Natural query cache {'hit' if is_hit else 'miss'} "
+            f"for '{natural_query}' (overall hit ratio {self.hit_ratio:.2%})."
+        )
+
+        return copy.deepcopy(params)
+
+    def _get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                created_at, params = self._entries[key]
+                if now - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+
+                    return params
+                del self._entries[key]
+
+            if self._connection is None:
+                return None
+
+            row = self._connection.execute(
+                "SELECT params, created_at FROM natural_queries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl_seconds:
+                return None
+            params = json.loads(row[0])
+            self._put_in_memory(key, row[1], params)
+
+            return params
+
+    def _put(self, key: str, params: dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._put_in_memory(key, now, params)
+            if self._connection is not None:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO natural_queries VALUES (?, ?, ?)",
+                    (key, json.dumps(params), now),
+                )
+                self._connection.execute(
+                    "DELETE FROM natural_queries WHERE created_at < ?",
+                    (now - self.ttl_seconds,),
+                )
+                self._connection.commit()
+
+    def _put_in_memory(
+        self, key: str, created_at: float, params: dict[str, Any]
+    ) -> None:
+        self._entries[key] = (created_at, params)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def install(cache: NaturalQueryCache) -> None:
+    """Make every `.with_natural_query()` clause read its parameters through the cache.
+
+    Superlinked has no hook around the OpenAI call extracting the parameters, so this
+    wraps the method of the evaluator calling it.
+    """
+
+    execute_query = NLQParamEvaluator._execute_query
+
+    def cached_execute_query(
+        self: NLQParamEvaluator,
+        query: str,
+        instructor_prompt: str,
+        model_class: type[BaseModel],
+        client_config: Any,
+    ) -> dict[str, Any]:
+        if model_class is QuerySuggestionsModel:
+            return execute_query(
+                self, query, instructor_prompt, model_class, client_config
+            )
+
+        return cache.get_or_extract(
+            client_config.model,
+            instructor_prompt,
+            query,
+            lambda: execute_query(
+                self, query, instructor_prompt, model_class, client_config
+            ),
+        )
+
+    NLQParamEvaluator._execute_query = cached_execute_query
+    logger.info("Caching the parameters extracted from natural queries.")
@@ -0,0 +1,359 @@
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any, get_origin
+
+from loguru import logger
+from superlinked.framework.common.interface.comparison_operation_type import (
+    ComparisonOperationType,
+)
+from superlinked.framework.common.util.generic_class_util import GenericClassUtil
+from superlinked.framework.dsl.query.nlq_param_evaluator import NLQParamEvaluator
+from superlinked.framework.dsl.query.query_param_information import ParamInfo
+
+NUMBER_PATTERN = r"(\d+(?:,\d{3})*(?:\.\d+)?)"
+UPPER_BOUND_PATTERN = (
+    r"(?:lower|less|smaller|cheaper|under|below|at most|no more|up to|max(?:imum)?)"
+)
+LOWER_BOUND_PATTERN = (
+    r"(?:bigger|higher|greater|more|above|over|at least|no less|min(?:imum)?|better)"
+)
+UPPER_BOUND_SUFFIX_PATTERN = r"(?:less|lower|below|under|cheaper)"
+LOWER_BOUND_SUFFIX_PATTERN = r"(?:more|higher|above|over|up|better)"
+UPPER_BOUND_OPS = [
+    ComparisonOperationType.LESS_EQUAL,
+    ComparisonOperationType.LESS_THAN,
+]
+LOWER_BOUND_OPS = [
+    ComparisonOperationType.GREATER_EQUAL,
+    ComparisonOperationType.GREATER_THAN,
+]
+
+# Words referring to a numeric field and the units of its values, keyed by a word of the field name.
+FIELD_KEYWORDS = {
+    "price": (r"prices?|priced|costs?|costing", r"\$|dollars?|usd"),
+    "rating": (r"(?:reviews? )?ratings?|rated|stars?", r"stars?"),
+}
+# Phrases asking to rank by a numeric space, keyed by a word of its weight param name.
+SPACE_PREFERENCES = {
+    "price": r"cheapest|cheap|affordable|inexpensive|budget|lowest prices?",
+    "rating": r"(?:best|top|highest|highly)[ -]rated|best reviewed",
+}
+ASIN_PATTERN = r"(?i)\b(?:B0[0-9A-Z]{8}|\d{9}[\dX])\b"
+# Words that don't carry any meaning on their own.
+FILLER_WORDS = set(
+    "a about all an and any are for find from get give have has i in is it items me "
+    "need of on or please search show some that the their them to want with which "
+    "whose".split()
+)
+# Words signaling constraints the rules don't understand.
+UNSUPPORTED_WORDS = set(
+    "between best but cheaper except excluding exactly least like lowest highest "
+    "most no not over similar than top under without worst".split()
+)
+
+
+@dataclass
+class Extraction:
+    """Parameters extracted from a natural query, with the share of its words understood."""
+
+    params: dict[str, Any] = field(default_factory=dict)
+    confidence: float = 1.0
+
+
+def get_field_keyword(field_name: str, keywords: dict[str, Any]) -> str | None:
+    return next((word for word in field_name.split("_") if word in keywords), None)
+
+
+def is_list_field(param_info: ParamInfo) -> bool:
+    field_type = GenericClassUtil.get_single_generic_type(param_info.schema_field)
+
+    return get_origin(field_type) is list or field_type is list
+
+
+class NaturalQueryFastPath:
+    """Extract the parameters of common natural queries with rules instead of an LLM.
+
+    The rules are driven by the parameters of the query: the options of the
+    categorical filters (e.g., `constants.TYPES` and `constants.CATEGORIES`), the
+    schema fields of the numeric filters, and the spaces of the weights. Whatever the
+    rules don't explain is used as the text of the similarity clauses. The confidence
+    is the share of the meaningful words the rules consumed: the text left for the
+    similarity clauses counts as understood only when no hard filter was inferred, as
+    it may qualify the filter, and never when it contains words like "not", "top" or
+    numbers. An option followed by a noun, e.g., "book" in "book light", modifies it,
+    so it isn't used as a filter.
+
+    Args:
+        min_confidence: Minimum share of the words of a query that the rules must
+            understand, otherwise the query is sent to OpenAI.
+    """
+
+    def __init__(self, min_confidence: float) -> None:
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        num_queries = self.hits + self.misses
+
+        return self.hits / num_queries if num_queries else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hit_ratio}
+
+    def evaluate(
+        self, natural_query: str, param_infos: Sequence[ParamInfo]
+    ) -> dict[str, Any] | None:
+        """Return the parameters of the natural query, or None if the rules aren't confident enough."""
+
+        extraction = self.extract(natural_query, param_infos)
+        if extraction.confidence < self.min_confidence:
+            self.misses += 1
+            logger.debug(
+                f"Natural query fast path miss for '{natural_query}' "
+                f"(confidence {extraction.confidence:.2f})."
+            )
+
+            return None
+
+        self.hits += 1
+        logger.debug(
+            f"Natural query fast path hit for '{natural_query}': {extraction.params}."
+        )
+
+        return extraction.params
+
+    def extract(
+        self, natural_query: str, param_infos: Sequence[ParamInfo]
+    ) -> Extraction:
+        text = " ".join(natural_query.casefold().split())
+        unset_param_infos = [
+            param_info
+            for param_info in param_infos
+            if param_info.value is None or param_info.is_default
+        ]
+        params: dict[str, Any] = {}
+        spans: list[tuple[int, int]] = []
+        # Whether a filter, or the item of a similar items query, was inferred.
+        has_hard_filter = False
+
+        def consume(pattern: str) -> re.Match | None:
+            for match in re.finditer(pattern, text):
+                if not any(
+                    start < match.end() and match.start() < end for start, end in spans
+                ):
+                    spans.append(match.span())
+
+                    return match
+
+            return None
+
+        # Similar items
+        looks_like_value = next(
+            (
+                param_info
+                for param_info in unset_param_infos
+                if not param_info.is_weight
+                and param_info.space is None
+                and param_info.op is None
+                and param_info.schema_field is not None
+            ),
+            None,
+        )
+        if looks_like_value is not None and (match := consume(ASIN_PATTERN)):
+            params[looks_like_value.name] = match.group().upper()
+            has_hard_filter = True
+            consume(r"\bsimilar\b")
+            consume(rf"\blike (?={match.group()})")
+            # The item vector only affects the spaces with a weight.
+            for param_info in unset_param_infos:
+                if param_info.is_weight and (
+                    param_info.space is None or param_info.schema_field is None
+                ):
+                    params[param_info.name] = 1.0
+
+        # Numeric filters
+        for param_info in unset_param_infos:
+            if param_info.schema_field is None or (
+                param_info.op not in UPPER_BOUND_OPS + LOWER_BOUND_OPS
+            ):
+                continue
+            keyword = get_field_keyword(param_info.schema_field.name, FIELD_KEYWORDS)
+            if keyword is None:
+                continue
+            words, units = FIELD_KEYWORDS[keyword]
+            is_upper_bound = param_info.op in UPPER_BOUND_OPS
+            bound = UPPER_BOUND_PATTERN if is_upper_bound else LOWER_BOUND_PATTERN
+            suffix = (
+                UPPER_BOUND_SUFFIX_PATTERN
+                if is_upper_bound
+                else LOWER_BOUND_SUFFIX_PATTERN
+            )
+            number = rf"(?:\$\s?)?{NUMBER_PATTERN}"
+            patterns = [
+                # "a price lower than 100", "rating of at least 4"
+                (
+                    rf"\b(?:{words})(?: (?:is|of|that is|which is|should be))? {bound}"
+                    rf"(?: (?:than|then|to))? {number}(?: ?(?:{units})\b)?"
+                ),
+                # "under $100", "above 4 stars"
+                (
+                    rf"\b{bound}(?: (?:than|then))? "
+                    rf"(?:\${NUMBER_PATTERN}|{NUMBER_PATTERN} ?(?:{units})\b)"
+                ),
+                # "rated 4 stars or more", "100 dollars or less"
+                rf"(?:\b(?:{words}) )?{number} ?(?:{units}) (?:or|and) {suffix}\b",
+            ]
+            if not is_upper_bound:
+                # "rated 4+ stars"
+                patterns.append(
+                    rf"(?:\b(?:{words}) )?{NUMBER_PATTERN} ?\+ ?(?:{units})\b"
+                )
+            for pattern in patterns:
+                if match := consume(pattern):
+                    numbers = [value for value in match.groups() if value is not None]
+                    params[param_info.name] = float(numbers[0].replace(",", ""))
+                    has_hard_filter = True
+                    break
+
+        # Space weights of the numeric spaces
+        for param_info in unset_param_infos:
+            if not param_info.is_weight or param_info.schema_field is not None:
+                continue
+            keyword = get_field_keyword(param_info.name, SPACE_PREFERENCES)
+            if keyword is not None and consume(
+                rf"\b(?:{SPACE_PREFERENCES[keyword]})\b"
+            ):
+                params[param_info.name] = 1.0
+
+        # Categorical filters, after the other rules consumed their words
+        candidates = []
+        for order, param_info in enumerate(unset_param_infos):
+            if param_info.op == ComparisonOperationType.EQUAL and param_info.options:
+                for option in param_info.options:
+                    pattern = rf"\b{re.escape(str(option).casefold())}s?\b"
+                    for match in re.finditer(pattern, text):
+                        candidates.append((match, order, param_info, option))
+        # The longest matches first, e.g., "children's books" over "books".
+        candidates.sort(key=lambda item: (-len(item[0].group()), item[1]))
+        for match, _, param_info, option in candidates:
+            if (
+                param_info.name in params
+                or any(
+                    start < match.end() and match.start() < end for start, end in spans
+                )
+                or self._modifies_next_word(text, match.end(), spans)
+            ):
+                continue
+            spans.append(match.span())
+            has_hard_filter = True
+            params[param_info.name] = [option] if is_list_field(param_info) else option
+
+        # Similarity clauses on the remaining text
+        remaining_text = text
+        for start, end in sorted(spans, reverse=True):
+            remaining_text = remaining_text[:start] + " , " + remaining_text[end:]
+        meaningful_words = [
+            match
+            for match in re.finditer(r"[\w'$+-]+", text)
+            if match.group() not in FILLER_WORDS
+        ]
+        num_understood_words = sum(
+            any(start <= match.start() < end for start, end in spans)
+            or not (
+                has_hard_filter
+                or match.group() in UNSUPPORTED_WORDS
+                or bool(re.search(r"\d", match.group()))
+                or bool(re.fullmatch(ASIN_PATTERN, match.group()))
+            )
+            for match in meaningful_words
+        )
+        confidence = (
+            num_understood_words / len(meaningful_words) if meaningful_words else 0.0
+        )
+
+        description = self._get_description(remaining_text)
+        if description:
+            similar_spaces = set()
+            for param_info in unset_param_infos:
+                if param_info.space is None or param_info.op is not None:
+                    continue
+                if not param_info.is_weight:
+                    params[param_info.name] = description
+                    similar_spaces.add(param_info.space)
+                elif param_info.schema_field is not None:
+                    params[param_info.name] = 1.0
+            for param_info in unset_param_infos:
+                if (
+                    param_info.is_weight
+                    and param_info.schema_field is None
+                    and param_info.space in similar_spaces
+                ):
+                    params[param_info.name] = 1.0
+
+        # Let OpenAI deal with the queries the rules don't understand at all.
+        return Extraction(params, confidence if params else 0.0)
+
+    def _modifies_next_word(
+        self, text: str, end: int, spans: Sequence[tuple[int, int]]
+    ) -> bool:
+        """Return whether the word ending at `end` is followed by a noun it modifies."""
+
+        next_word = re.match(r" ([\w'-]+)", text[end:])
+        if next_word is None:
+            return False
+        word = next_word.group(1)
+
+        return not (
+            word in FILLER_WORDS
+            or word in UNSUPPORTED_WORDS
+            or bool(re.search(r"\d", word))
+            or any(start <= end + 1 < stop for start, stop in spans)
+        )
+
+    def _get_description(self, remaining_text: str) -> str | None:
+        """Return the longest meaningful piece of the text left by the rules."""
+
+        pieces = []
+        for piece in remaining_text.split(","):
+            words = re.findall(r"[\w'-]+", piece)
+            while words and words[0] in FILLER_WORDS:
+                words.pop(0)
+            while words and words[-1] in FILLER_WORDS:
+                words.pop()
+            if words:
+                pieces.append(" ".join(words))
+
+        return " ".join(pieces) or None
+
+
+def install(fast_path: NaturalQueryFastPath) -> None:
+    """Try the rules before sending a natural query to OpenAI.
+
+    Superlinked has no hook around the natural query evaluation, so this wraps the
+    evaluator of the `.with_natural_query()` clauses. Queries with a custom system
+    prompt always go to OpenAI, as the rules can't follow it.
+    """
+
+    evaluate_param_infos = NLQParamEvaluator.evaluate_param_infos
+
+    def evaluate_param_infos_with_fast_path(
+        self: NLQParamEvaluator,
+        natural_query: str,
+        client_config: Any,
+        system_prompt: str | None = None,
+    ) -> dict[str, Any]:
+        if system_prompt is None and not self._all_params_have_value_set():
+            params = fast_path.evaluate(natural_query, self._param_infos)
+            if params is not None:
+                return params
+
+        return evaluate_param_infos(self, natural_query, client_config, system_prompt)
+
+    NLQParamEvaluator.evaluate_param_infos = evaluate_param_infos_with_fast_path
+    logger.info(
+        "Extracting the parameters of common natural queries without OpenAI "
+        f"(minimum confidence {fast_path.min_confidence})."
+    )
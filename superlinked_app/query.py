@@ -1,6 +1,6 @@
 from superlinked import framework as sl
 
-from superlinked_app import constants, index
+from superlinked_app import constants, index, nlq_cache, nlq_fast_path
 from superlinked_app.config import settings
 
 assert (
@@ -12,6 +12,24 @@ openai_config = sl.OpenAIClientConfig(
     api_key=settings.OPENAI_API_KEY.get_secret_value(), model=settings.OPENAI_MODEL_ID
 )
 
+if settings.NLQ_CACHE_ENABLED:
+    natural_query_cache = nlq_cache.NaturalQueryCache(
+        settings.NLQ_CACHE_MAX_SIZE,
+        settings.NLQ_CACHE_TTL_SECONDS,
+        settings.NLQ_CACHE_PATH,
+    )
+    nlq_cache.install(natural_query_cache)
+else:
+    natural_query_cache = None
+
+if settings.NLQ_FAST_PATH_ENABLED:
+    natural_query_fast_path = nlq_fast_path.NaturalQueryFastPath(
+        settings.NLQ_FAST_PATH_MIN_CONFIDENCE
+    )
+    nlq_fast_path.install(natural_query_fast_path)
+else:
+    natural_query_fast_path = None
+
 
 title_similar_param = sl.Param(
     "query_title",
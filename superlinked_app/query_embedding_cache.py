@@ -0,0 +1,248 @@
+import fcntl
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from superlinked import framework as sl
+from superlinked.framework.common.dag.context import ExecutionContext
+from superlinked.framework.common.data_types import Vector
+from superlinked.framework.common.space.embedding.sentence_transformer_embedding import (
+    SentenceTransformerEmbedding,
+)
+
+KEY_SIZE = 16
+MAX_PROBES = 8
+HEADER_SIZE = 64
+MAGIC = b"SLQVEC01"
+
+
+class SharedVectorStore:
+    """Hash table of vectors in a memory-mapped file, shared by all the processes opening it.
+
+    Every slot holds the hashed key of its vector before and after it. Writers lock the
+    file, clear the leading key, write the vector and then both keys, so readers don't
+    need the lock: they only trust a slot whose two keys match the key they look for.
+    Keys are linearly probed over `MAX_PROBES` slots, after which the first slot is
+    overwritten.
+
+    Args:
+        path: Path to the file, created sparse if it doesn't exist. It's recreated when
+            its dimension, capacity or model ID differ.
+        model_id: ID of the model computing the vectors.
+        dimension: Dimension of the vectors.
+        capacity: Number of vector slots of the file.
+    """
+
+    def __init__(
+        self, path: Path, model_id: str, dimension: int, capacity: int
+    ) -> None:
+        self.path = path
+        self.dimension = dimension
+        self.capacity = capacity
+
+        self._slot_dtype = np.dtype(
+            [
+                ("head", f"V{KEY_SIZE}"),
+                ("vector", "<f4", (dimension,)),
+                ("tail", f"V{KEY_SIZE}"),
+            ]
+        )
+        header = (
+            MAGIC
+            + np.array([dimension, capacity], dtype="<u4").tobytes()
+            + hashlib.sha256(model_id.encode("utf-8")).digest()
+        ).ljust(HEADER_SIZE, b"\0")
+        file_size = HEADER_SIZE + capacity * self._slot_dtype.itemsize
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch(exist_ok=True)
+        # Kept open for the lifetime of the store to lock it.
+        self._file = open(path, "r+b")
+        with self._locked():
+            if self._file.read(HEADER_SIZE) != header:
+                logger.info(f"Creating the shared query vector store '{path}'.")
+                self._file.truncate(0)
+                self._file.write(header)
+                self._file.truncate(file_size)
+                self._file.flush()
+        self._slots = np.memmap(
+            path,
+            dtype=self._slot_dtype,
+            mode="r+",
+            offset=HEADER_SIZE,
+            shape=(capacity,),
+        )
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        key = np.void(key[:KEY_SIZE])
+        for index in self._get_indices(key):
+            slot = self._slots[index]
+            if slot["head"] != key:
+                continue
+            vector = slot["vector"].copy()
+            if slot["head"] == key and slot["tail"] == key:
+                return vector
+
+        return None
+
+    def put(self, key: bytes, vector: np.ndarray) -> None:
+        key = np.void(key[:KEY_SIZE])
+        empty_key = np.void(bytes(KEY_SIZE))
+        indices = self._get_indices(key)
+        with self._locked():
+            index = next(
+                (i for i in indices if self._slots[i]["head"] in (key, empty_key)),
+                indices[0],
+            )
+            self._slots[index]["head"] = empty_key
+            self._slots[index]["vector"] = vector
+            self._slots[index]["tail"] = key
+            self._slots[index]["head"] = key
+
+    def _get_indices(self, key: np.void) -> list[int]:
+        start = int.from_bytes(key.tobytes()[:8], "little") % self.capacity
+
+        return [(start + i) % self.capacity for i in range(MAX_PROBES)]
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+
+class QueryEmbeddingCache:
+    """LRU cache of the query vectors of a text similarity space.
+
+    Superlinked embeds the text of every `.similar()` clause at query time. This keeps
+    the latest query vectors of the space in memory and, when a shared store is given,
+    also reads and writes them through it, so that the other processes serving the
+    same queries don't embed them again.
+
+    Args:
+        max_size: Maximum number of query vectors kept in memory.
+        shared_store: Optional store sharing the query vectors across processes.
+    """
+
+    def __init__(
+        self, max_size: int, shared_store: SharedVectorStore | None = None
+    ) -> None:
+        self.max_size = max_size
+        self.shared_store = shared_store
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors: OrderedDict[str, Vector] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    @property
+    def hit_ratio(self) -> float:
+        num_lookups = self.hits + self.shared_hits + self.misses
+
+        return (self.hits + self.shared_hits) / num_lookups if num_lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "entries": len(self._vectors),
+        }
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        embed_fn: Callable[[Sequence[str]], list[Vector]],
+    ) -> list[Vector]:
+        """Return the vectors of the texts, embedding only the ones not cached yet.
+
+        Args:
+            texts: Query texts.
+            embed_fn: Function embedding a list of texts.
+        """
+
+        vectors: dict[str, Vector] = {}
+        with self._lock:
+            for text in texts:
+                if text in self._vectors:
+                    self._vectors.move_to_end(text)
+                    vectors[text] = self._vectors[text]
+                    self.hits += 1
+
+        missing_texts = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if self.shared_store is not None:
+            for text in missing_texts:
+                value = self.shared_store.get(self._get_key(text))
+                if value is not None:
+                    vectors[text] = Vector(value.astype(np.float64))
+                    self.shared_hits += 1
+            missing_texts = [text for text in missing_texts if text not in vectors]
+
+        if missing_texts:
+            self.misses += len(missing_texts)
+            new_vectors = embed_fn(missing_texts)
+            vectors.update(zip(missing_texts, new_vectors))
+            if self.shared_store is not None:
+                for text, vector in zip(missing_texts, new_vectors):
+                    self.shared_store.put(self._get_key(text), vector.value)
+
+        with self._lock:
+            for text in texts:
+                self._vectors[text] = vectors[text]
+                self._vectors.move_to_end(text)
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+        logger.debug(
+            f"Query embedding cache: {len(texts) - len(missing_texts)}/{len(texts)} "
+            f"hits (overall hit ratio {self.hit_ratio:.2%})."
+        )
+
+        return [vectors[text] for text in texts]
+
+    @staticmethod
+    def _get_key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def install(caches: dict[sl.TextSimilaritySpace, QueryEmbeddingCache]) -> None:
+    """Make the text similarity spaces embed their query texts through their cache.
+
+    Superlinked creates the embedding of every query node from the embedding config
+    of its space, so the embeddings are matched to their space by that config object.
+    Ingestion is left untouched, as it goes through the persistent embedding cache.
+    The `cache_size` of the spaces isn't set to 0 instead, as it's part of the IDs of
+    their nodes, which name the vector fields in the database.
+    """
+
+    cache_by_config_id = {
+        id(space.transformation_config.embedding_config): cache
+        for space, cache in caches.items()
+    }
+    embed_multiple = SentenceTransformerEmbedding.embed_multiple
+
+    def embed_multiple_with_cache(
+        self: SentenceTransformerEmbedding,
+        inputs: Sequence[str],
+        context: ExecutionContext,
+    ) -> list[Vector]:
+        cache = cache_by_config_id.get(id(self._config))
+        if cache is None or not context.is_query_context:
+            return embed_multiple(self, inputs, context)
+
+        # Skips the built-in LRU cache of the embedding, which the cache replaces.
+        return cache.embed(inputs, self.manager.embed_text)
+
+    SentenceTransformerEmbedding.embed_multiple = embed_multiple_with_cache
+    logger.info(f"Caching the query vectors of {len(caches)} text similarity spaces.")
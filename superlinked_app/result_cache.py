@@ -0,0 +1,220 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from collections.abc import Sequence
+from functools import partial
+from typing import Any
+
+from loguru import logger
+from superlinked.framework.dsl.executor.query.query_executor import QueryExecutor
+from superlinked.framework.dsl.query.query_clause import (
+    NLQClause,
+    NLQSystemPromptClause,
+)
+from superlinked.framework.dsl.query.query_descriptor import QueryDescriptor
+from superlinked.framework.dsl.query.query_param_value_setter import (
+    QueryParamValueSetter,
+)
+from superlinked.framework.dsl.query.result import Result
+from superlinked.framework.online.source.online_source import OnlineSource
+
+
+def get_resolved_params(query_descriptor: QueryDescriptor) -> dict[str, Any]:
+    """Return the values of the parameters of a query, once extracted from its natural query.
+
+    The natural query itself is left out, so that differently phrased queries
+    resolving to the same parameters share their results.
+    """
+
+    params = query_descriptor.calculate_value_by_param_name()
+    for clause_type in [NLQClause, NLQSystemPromptClause]:
+        if (clause := query_descriptor.get_clause_by_type(clause_type)) is not None:
+            params.pop(clause.get_param(clause.value_param).name, None)
+
+    return params
+
+
+class ResultCache:
+    """LRU cache of the results of the queries, invalidated by every write to the index.
+
+    The results are keyed by the query name and all its resolved parameters: the
+    weights, filters, similarity texts and limit, whether set by the request or
+    extracted from its natural query. The size of the cache is bounded by the total
+    number of result entries it holds, so a few queries with a large limit can't use
+    more memory than many small ones.
+
+    Args:
+        max_rows: Maximum number of result entries over all the cached results.
+    """
+
+    def __init__(self, max_rows: int) -> None:
+        self.max_rows = max_rows
+        self.version = 0
+        self.hits: defaultdict[str, int] = defaultdict(int)
+        self.misses: defaultdict[str, int] = defaultdict(int)
+
+        self._lock = threading.Lock()
+        self._results: OrderedDict[str, Result] = OrderedDict()
+        self._num_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def hit_ratio(self, query_name: str | None = None) -> float:
+        """Return the hit ratio of a query, or of all the queries if `query_name` is None."""
+
+        query_names = (
+            self.hits.keys() | self.misses.keys()
+            if query_name is None
+            else {query_name}
+        )
+        hits = sum(self.hits.get(name, 0) for name in query_names)
+        num_lookups = hits + sum(self.misses.get(name, 0) for name in query_names)
+
+        return hits / num_lookups if num_lookups else 0.0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "entries": len(self._results),
+            "rows": self._num_rows,
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "hit_ratio": self.hit_ratio(),
+            "queries": {
+                name: {
+                    "hits": self.hits[name],
+                    "misses": self.misses[name],
+                    "hit_ratio": self.hit_ratio(name),
+                }
+                for name in sorted(self.hits.keys() | self.misses.keys())
+            },
+        }
+
+    def invalidate(self) -> None:
+        """Bump the index version, dropping all the cached results."""
+
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+            self._num_rows = 0
+
+    def get_key(self, query_name: str, params: dict[str, Any]) -> str:
+        return hashlib.sha256(
+            json.dumps([query_name, params], sort_keys=True, default=str).encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+    def get(self, query_name: str, key: str) -> Result | None:
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses[query_name] += 1
+            else:
+                self.hits[query_name] += 1
+                self._results.move_to_end(key)
+        logger.debug(
+            f"Result cache {'miss' if result is None else 'hit'} for '{query_name}' "
+            f"(hit ratio {self.hit_ratio(query_name):.2%})."
+        )
+
+        return result
+
+    def put(self, key: str, result: Result, version: int) -> None:
+        """Cache the result of a query started at the given index version.
+
+        The result is dropped if the index was written since, as it may be stale.
+        """
+
+        num_rows = max(len(result.entries), 1)
+        with self._lock:
+            if version != self.version or num_rows > self.max_rows:
+                return
+            if key in self._results:
+                self._num_rows -= max(len(self._results.pop(key).entries), 1)
+            self._results[key] = result
+            self._num_rows += num_rows
+            while self._num_rows > self.max_rows:
+                _, evicted_result = self._results.popitem(last=False)
+                self._num_rows -= max(len(evicted_result.entries), 1)
+
+
+def invalidate_on_put(cache: ResultCache, sources: Sequence[OnlineSource]) -> None:
+    """Invalidate the cache whenever data is put into one of the sources.
+
+    The version is bumped both before and after the write, so a query running
+    concurrently with it never caches its result.
+    """
+
+    for source in sources:
+        put = source.put
+
+        def put_and_invalidate(data: Any, put=put) -> None:
+            cache.invalidate()
+            try:
+                put(data)
+            finally:
+                cache.invalidate()
+
+        source.put = put_and_invalidate
+
+
+def install(cache: ResultCache, queries: dict[str, QueryDescriptor]) -> None:
+    """Answer the given queries from the cache when their resolved parameters repeat.
+
+    Superlinked has no hook between resolving the parameters of a query and
+    searching the vector database, so this replaces the query method of the query
+    executor, which the REST query endpoints go through. Like the method it replaces,
+    it checks that the executor has the index of the query and logs the searches.
+
+    Args:
+        cache: The result cache.
+        queries: The cached queries by name.
+    """
+
+    query_name_by_id = {
+        id(query_descriptor): query_name
+        for query_name, query_descriptor in queries.items()
+    }
+    query = QueryExecutor.query
+
+    def query_with_cache(self: QueryExecutor, **params: Any) -> Result:
+        query_name = query_name_by_id.get(id(self._query_descriptor))
+        if query_name is None:
+            return query(self, **params)
+
+        # Name-mangled private method of QueryExecutor.
+        self._QueryExecutor__check_executor_has_index()
+        version = cache.version
+        query_descriptor = QueryParamValueSetter.set_values(
+            self._query_descriptor, params
+        )
+        key = cache.get_key(query_name, get_resolved_params(query_descriptor))
+        if (cached_result := cache.get(query_name, key)) is not None:
+            return Result(
+                cached_result.entries, query_descriptor, cached_result.search_vector
+            )
+
+        knn_search_params = self._produce_knn_search_params(query_descriptor)
+        entities = self._knn_search(knn_search_params, query_descriptor)
+        self._logger.info(
+            "executed query",
+            n_results=len(entities),
+            limit=knn_search_params.limit,
+            radius=knn_search_params.radius,
+            pii_knn_params=params,
+            pii_query_vector=partial(str, knn_search_params.vector),
+        )
+        result = Result(
+            self._map_entities_to_result_entries(query_descriptor.schema, entities),
+            query_descriptor,
+            knn_search_params.vector,
+        )
+        cache.put(key, result, version)
+
+        return result
+
+    QueryExecutor.query = query_with_cache
+    logger.info(f"Caching the results of {len(queries)} queries.")
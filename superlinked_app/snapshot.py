@@ -0,0 +1,162 @@
+import json
+import mmap
+import shutil
+import threading
+from collections.abc import Iterator, Mapping, MutableMapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import inject
+import numpy as np
+from loguru import logger
+from superlinked.framework.storage.in_memory.json_codec import (
+    JsonDecoder,
+    JsonEncoder,
+)
+from superlinked.server.service.data_loader import DataLoader
+from superlinked.server.service.persistence_service import PersistenceService
+
+FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = "manifest.json"
+ROW_IDS_FILE_NAME = "row_ids.json"
+ROWS_FILE_NAME = "rows.jsonl"
+ROW_OFFSETS_FILE_NAME = "row_offsets.npy"
+
+
+class SnapshotRows(MutableMapping[str, dict[str, Any]]):
+    """Rows of an in-memory vector database, read from the files of a snapshot.
+
+    The rows of the snapshot are JSON lines in a memory-mapped file, decoded whenever
+    they are read, so they stay in the page cache, shared by the processes opening the
+    same snapshot, instead of the heap. The rows written since are kept in the heap, on
+    top of the ones of the snapshot.
+
+    Args:
+        path: Folder of the snapshot.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with open(path / ROW_IDS_FILE_NAME, encoding="utf-8") as file:
+            self.row_ids: list[str] = json.load(file)
+        self.position_by_row_id = {
+            row_id: position for position, row_id in enumerate(self.row_ids)
+        }
+
+        # An empty file can't be memory-mapped.
+        self._data: mmap.mmap | bytes = b""
+        if (path / ROWS_FILE_NAME).stat().st_size:
+            with open(path / ROWS_FILE_NAME, "rb") as file:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = np.load(path / ROW_OFFSETS_FILE_NAME, mmap_mode="r")
+        self._rows: dict[str, dict[str, Any]] = {}
+        # Rows of the snapshot replaced or deleted since.
+        self._hidden_row_ids: set[str] = set()
+
+    def __getitem__(self, row_id: str) -> dict[str, Any]:
+        if (row := self._rows.get(row_id)) is not None:
+            return row
+        position = self.position_by_row_id.get(row_id)
+        if position is None or row_id in self._hidden_row_ids:
+            raise KeyError(row_id)
+
+        return json.loads(
+            self._data[self._offsets[position] : self._offsets[position + 1]],
+            cls=JsonDecoder,
+        )
+
+    def __setitem__(self, row_id: str, row: dict[str, Any]) -> None:
+        self._rows[row_id] = row
+        if row_id in self.position_by_row_id:
+            self._hidden_row_ids.add(row_id)
+
+    def __delitem__(self, row_id: str) -> None:
+        if row_id not in self:
+            raise KeyError(row_id)
+        self._rows.pop(row_id, None)
+        if row_id in self.position_by_row_id:
+            self._hidden_row_ids.add(row_id)
+
+    def __contains__(self, row_id: object) -> bool:
+        return row_id in self._rows or (
+            row_id in self.position_by_row_id and row_id not in self._hidden_row_ids
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        for row_id in self.row_ids:
+            if row_id not in self._hidden_row_ids:
+                yield row_id
+        yield from self._rows
+
+    def __len__(self) -> int:
+        return len(self.row_ids) - len(self._hidden_row_ids) + len(self._rows)
+
+
+def write_rows(
+    path: Path, row_ids: Sequence[str], rows: Mapping[str, dict[str, Any]]
+) -> None:
+    """Write the rows to the snapshot folder, in the order of their ids."""
+
+    offsets = np.zeros(len(row_ids) + 1, dtype=np.int64)
+    with open(path / ROWS_FILE_NAME, "wb") as file:
+        for position, row_id in enumerate(row_ids):
+            line = json.dumps(rows.get(row_id, {}), cls=JsonEncoder).encode("utf-8")
+            file.write(line + b"\n")
+            offsets[position + 1] = offsets[position] + len(line) + 1
+    np.save(path / ROW_OFFSETS_FILE_NAME, offsets)
+    with open(path / ROW_IDS_FILE_NAME, "w", encoding="utf-8") as file:
+        json.dump(list(row_ids), file)
+
+
+def write_manifest(path: Path, manifest: dict[str, Any]) -> None:
+    with open(path / MANIFEST_FILE_NAME, "w", encoding="utf-8") as file:
+        json.dump({"format_version": FORMAT_VERSION, **manifest}, file)
+
+
+def read_manifest(path: Path) -> dict[str, Any] | None:
+    """Return the manifest of the snapshot, None if there's no readable snapshot."""
+
+    try:
+        with open(path / MANIFEST_FILE_NAME, encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    return manifest if manifest.get("format_version") == FORMAT_VERSION else None
+
+
+def replace(source: Path, destination: Path) -> None:
+    """Replace the snapshot folder by a newly written one.
+
+    The files of the previous snapshot are deleted, but stay readable by the processes
+    having memory-mapped them.
+    """
+
+    previous = destination.with_name(f"{destination.name}.previous")
+    shutil.rmtree(previous, ignore_errors=True)
+    if destination.exists():
+        destination.rename(previous)
+    source.rename(destination)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def install() -> None:
+    """Persist the vector databases of the server once a data load finishes.
+
+    The Superlinked server persists them only on shutdown, so this wraps the callback of
+    the data load tasks. They are persisted in a thread, as the callback runs in the
+    event loop of the server.
+    """
+
+    task_done_callback = DataLoader._task_done_callback
+
+    def task_done_callback_with_persist(self: DataLoader, task: Any) -> None:
+        task_done_callback(self, task)
+        if task.cancelled() or task.exception() is not None:
+            return
+        persistence_service: PersistenceService = inject.instance(PersistenceService)
+        threading.Thread(
+            target=persistence_service.persist, name="persist-after-data-load"
+        ).start()
+
+    DataLoader._task_done_callback = task_done_callback_with_persist
+    logger.info("Persisting the vector database after every data load.")
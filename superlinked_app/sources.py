@@ -0,0 +1,129 @@
+from collections.abc import Sequence
+
+import pandas as pd
+import superlinked.framework as sl
+from loguru import logger
+
+from superlinked_app import embedding_backend, embedding_cache, incremental_load
+
+
+class ChunkedDataLoaderSource(sl.DataLoaderSource):
+    """Data loader source ingesting the loaded data frames in chunks of `chunk_size` rows.
+
+    The Superlinked server chunks only the readers returned by `pd.read_json()` and
+    `pd.read_csv()`, so without this a Parquet file would be ingested in one go.
+
+    The texts of the `shared_embedding_columns` of every chunk are embedded in a single
+    forward pass of `shared_embedding_model`, instead of one pass per space.
+
+    With `fingerprints`, the rows are loaded incrementally: the rows unchanged since
+    they were loaded are skipped, and the rows whose `shared_embedding_columns` are
+    unchanged get their text vectors from the embedding cache. The fingerprints must be
+    bound to the vector database first, see `RowFingerprints.bind()`.
+    """
+
+    def __init__(
+        self,
+        schema: sl.Schema,
+        data_loader_config: sl.DataLoaderConfig,
+        parser: sl.DataFrameParser,
+        chunk_size: int,
+        shared_embedding_model: str | None = None,
+        shared_embedding_columns: Sequence[str] = (),
+        fingerprints: incremental_load.RowFingerprints | None = None,
+        id_column: str = "id",
+    ) -> None:
+        super().__init__(schema, data_loader_config=data_loader_config, parser=parser)
+        self.chunk_size = chunk_size
+        self.shared_embedding_model = shared_embedding_model
+        self.shared_embedding_columns = list(shared_embedding_columns)
+        self.fingerprints = fingerprints
+        self.id_column = id_column
+        self.num_inserted = 0
+        self.num_updated = 0
+        self.num_updated_without_embedding = 0
+        self.num_skipped = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "inserted": self.num_inserted,
+            "updated": self.num_updated,
+            "updated_without_embedding": self.num_updated_without_embedding,
+            "skipped": self.num_skipped,
+        }
+
+    def put(self, data: pd.DataFrame | Sequence[pd.DataFrame]) -> None:
+        if self.fingerprints is not None and self.fingerprints.database_id is None:
+            raise ValueError(
+                "The fingerprints of the incremental load aren't bound to the vector "
+                "database, so they may skip rows it doesn't have."
+            )
+        stats_before = self.stats()
+        data_frames = [data] if isinstance(data, pd.DataFrame) else data
+        for df in data_frames:
+            for start in range(0, len(df), self.chunk_size):
+                chunk = df.iloc[start : start + self.chunk_size]
+                if self.fingerprints is None:
+                    self._put_chunk(chunk)
+                else:
+                    self._put_changed_rows(chunk, self.fingerprints)
+
+        if self.fingerprints is not None:
+            counts = {
+                name: count - stats_before[name] for name, count in self.stats().items()
+            }
+            logger.info(
+                f"Loaded incrementally: {counts['inserted']} rows inserted, "
+                f"{counts['updated']} updated "
+                f"({counts['updated_without_embedding']} without embedding their "
+                f"texts), {counts['skipped']} unchanged rows skipped."
+            )
+
+    def _put_changed_rows(
+        self, chunk: pd.DataFrame, fingerprints: incremental_load.RowFingerprints
+    ) -> None:
+        new_fingerprints = incremental_load.get_fingerprints(
+            chunk, self.id_column, self.shared_embedding_columns
+        )
+        old_fingerprints = fingerprints.get_many(list(new_fingerprints))
+        # The last row of an id wins, as when it's written.
+        changed_ids = {
+            row_id
+            for row_id, fingerprint in new_fingerprints.items()
+            if old_fingerprints.get(row_id) != fingerprint
+        }
+        changed_rows = chunk[chunk[self.id_column].astype(str).isin(changed_ids)]
+        self._put_chunk(changed_rows)
+        fingerprints.put_many(
+            {row_id: new_fingerprints[row_id] for row_id in changed_ids}
+        )
+
+        num_inserted = len(changed_ids - old_fingerprints.keys())
+        self.num_inserted += num_inserted
+        self.num_updated += len(changed_ids) - num_inserted
+        # Their texts are unchanged, so they are embedded by the embedding cache.
+        self.num_updated_without_embedding += sum(
+            old_fingerprints[row_id][0] == new_fingerprints[row_id][0]
+            for row_id in changed_ids & old_fingerprints.keys()
+        )
+        self.num_skipped += len(chunk) - len(changed_rows)
+
+    def _put_chunk(self, chunk: pd.DataFrame) -> None:
+        if chunk.empty:
+            return
+        if self.shared_embedding_model is None:
+            super().put([chunk])
+            return
+
+        with (
+            embedding_cache.ingestion(),
+            embedding_backend.shared_forward_pass(
+                self.shared_embedding_model,
+                get_texts(chunk, self.shared_embedding_columns),
+            ),
+        ):
+            super().put([chunk])
+
+
+def get_texts(df: pd.DataFrame, columns: Sequence[str]) -> list[str]:
+    return pd.concat([df[column] for column in columns]).dropna().tolist()
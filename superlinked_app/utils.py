@@ -1,10 +1,19 @@
 import gzip
+import io
+import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TextIO, TypeVar
 
 import requests
 import zstandard
 from loguru import logger
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 def download_file(url: str, output_path: Path) -> bool:
     try:
@@ -51,3 +60,79 @@ def decompress_gz(input_path: Path, output_path: Path) -> None:
     with gzip.open(input_path, "rb") as gz_file:
         with open(output_path, "wb") as output_file:
             output_file.write(gz_file.read())
+
+
+@contextmanager
+def open_text(input_path: Path) -> Iterator[TextIO]:
+    """Open a text file, decompressing it on the fly if it ends with `.gz` or `.zst`.
+
+    Args:
+        input_path: Path to the plain, gzip or zstandard compressed text file.
+
+    Yields:
+        Text stream over the decompressed content, without writing it to disk.
+    """
+
+    if input_path.suffix == ".gz":
+        with gzip.open(input_path, "rt", encoding="utf-8") as text_file:
+            yield text_file
+    elif input_path.suffix == ".zst":
+        with open(input_path, "rb") as compressed:
+            dctx = zstandard.ZstdDecompressor()
+            with dctx.stream_reader(compressed, read_across_frames=True) as reader:
+                yield io.TextIOWrapper(reader, encoding="utf-8")
+    else:
+        with open(input_path, "r", encoding="utf-8") as text_file:
+            yield text_file
+
+
+def iter_json_records(input_path: Path) -> Iterator[dict[str, Any]]:
+    """Stream the records of a JSON lines file, which can be `.gz` or `.zst` compressed.
+
+    Only one line is held in memory at a time, so the uncompressed file is never materialised.
+
+    Args:
+        input_path: Path to the JSON lines file.
+
+    Yields:
+        The parsed JSON record of every non-empty line.
+    """
+
+    with open_text(input_path) as text_file:
+        for line in text_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parallel_map(
+    func: Callable[[T], R], items: Iterable[T], num_workers: int
+) -> Iterator[R]:
+    """Map a function over the items in a process pool, yielding the results in order.
+
+    Unlike `ProcessPoolExecutor.map`, the items are consumed lazily, with at most two
+    items per worker in flight, so a large stream of items is never fully loaded in memory.
+
+    Args:
+        func: Picklable function applied to every item.
+        items: Items to process.
+        num_workers: Number of worker processes. If 1, the items are processed in the
+            current process.
+
+    Yields:
+        The result of every item, in the order of the items.
+    """
+
+    if num_workers == 1:
+        yield from map(func, items)
+
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending: deque[Future[R]] = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * num_workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
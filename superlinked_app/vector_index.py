@@ -0,0 +1,1103 @@
+import json
+import math
+import pickle
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Any, Literal, TypeVar, cast
+
+import numpy as np
+from loguru import logger
+from superlinked.framework.common.data_types import Vector
+from superlinked.framework.common.interface.comparison_operand import (
+    ComparisonOperation,
+)
+from superlinked.framework.common.storage.entity.entity_data import EntityData
+from superlinked.framework.common.storage.field.field import Field
+from superlinked.framework.common.storage.field.field_data import FieldData
+from superlinked.framework.common.storage.index_config import IndexConfig
+from superlinked.framework.common.storage.query.vdb_knn_search_params import (
+    VDBKNNSearchParams,
+)
+from superlinked.framework.common.storage.result_entity_data import ResultEntityData
+from superlinked.framework.common.storage.search import Search
+from superlinked.framework.dsl.storage.vector_database import VectorDatabase
+from superlinked.framework.storage.common.vdb_settings import VDBSettings
+from superlinked.framework.storage.in_memory.in_memory_search import (
+    UNLIMITED_SEARCH_RESULTS,
+    InMemorySearch,
+)
+from superlinked.framework.storage.in_memory.in_memory_vdb import InMemoryVDB
+from superlinked.framework.storage.in_memory.object_serializer import ObjectSerializer
+
+from superlinked_app import incremental_load, snapshot
+from superlinked_app.filter_index import FilterIndex
+
+KMEANS_NUM_ITERATIONS = 10
+# Number of vectors sampled per cluster to train the clusters.
+KMEANS_SAMPLE_SIZE_PER_LIST = 32
+# Number of vectors assigned to their cluster at once, bounding the memory used.
+ASSIGNMENT_CHUNK_SIZE = 16_384
+# Number of float16 or int8 vectors converted to float32 at once to be scored.
+SCORING_CHUNK_SIZE = 1024
+INT8_MAX = 127
+DTYPE_BY_PRECISION = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# If set, e.g., by `metrics.install()`, called with the number of rows passing the
+# filters of every search.
+num_candidates_observer: Callable[[int], None] | None = None
+
+T = TypeVar("T")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return vectors / np.maximum(norms, np.finfo(np.float32).eps)
+
+
+def get_top_scores(
+    positions: np.ndarray, scores: np.ndarray, limit: int, radius: float | None
+) -> list[tuple[int, float]]:
+    """Return the `limit` best scoring positions and their scores, best first."""
+
+    if radius:
+        is_close = scores >= 1 - radius
+        positions, scores = positions[is_close], scores[is_close]
+    if limit != UNLIMITED_SEARCH_RESULTS and len(scores) > limit:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        positions, scores = positions[top], scores[top]
+    order = np.argsort(-scores, kind="stable")
+
+    return [
+        (int(position), float(score))
+        for position, score in zip(positions[order], scores[order])
+    ]
+
+
+class FlatIndex:
+    """Vectors searched exactly by inner product.
+
+    The vectors are kept in a contiguous matrix, by the position of their row. As
+    Superlinked concatenates the normalized vectors of the spaces of an index, and
+    weights the spaces in the query vector, a batch of queries is scored over all the
+    spaces with a single matrix product, and the best scoring rows of every query are
+    selected by a partial sort.
+
+    To fit larger catalogues in memory, the matrix can be kept in float16, or in int8
+    scaled per dimension, making the scores approximate. The `limit * rescore_factor`
+    best scoring rows of a query are then rescored with their float32 vectors, kept in
+    a temporary memory-mapped file of which only the rows of these candidates are read.
+
+    The writes modify the arrays in place, e.g., requantizing the int8 matrix when its
+    scales widen, so the searches, running without a lock, are run again under the
+    lock of the writes if one overlapped them.
+
+    Args:
+        precision: Type of the matrix, 'float32', 'float16' or 'int8'.
+        rescore_factor: Number of candidates rescored per result, with a 'float16' or
+            'int8' precision. If 0, the approximate scores are returned.
+    """
+
+    def __init__(
+        self,
+        precision: Literal["float32", "float16", "int8"] = "float32",
+        rescore_factor: int = 0,
+    ) -> None:
+        self.precision = precision
+        self.rescore_factor = rescore_factor if precision != "float32" else 0
+
+        self._vectors = np.empty((0, 0), dtype=DTYPE_BY_PRECISION[precision])
+        # With an int8 precision, the value of a code of 1 in every dimension.
+        self._scales = np.empty(0, dtype=np.float32)
+        self._exact_vectors: np.ndarray | None = None
+        self._is_valid = np.empty(0, dtype=bool)
+        # Number of positions in use, from the first one to the last one with a vector.
+        self._num_positions = 0
+        self._write_lock = threading.Lock()
+        # Incremented before and after every write, so it's odd during a write.
+        self._version = 0
+
+    def __len__(self) -> int:
+        return int(self._is_valid.sum())
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the index, without the memory-mapped float32 vectors."""
+
+        return self._vectors.nbytes + self._scales.nbytes + self._is_valid.nbytes
+
+    @property
+    def row_nbytes(self) -> int:
+        """Memory used by the vector of a row in the index."""
+
+        return self._vectors.itemsize * self._vectors.shape[1]
+
+    def get_vector(self, position: int) -> np.ndarray | None:
+        """Return the vector of the row, None if it doesn't have one."""
+
+        return self._read(partial(self._get_vector, position))
+
+    def update(self, vectors_by_position: dict[int, np.ndarray | None]) -> None:
+        """Add or replace the vectors of the rows, removing the rows without one."""
+
+        with self._writing():
+            self._set_vectors(vectors_by_position)
+
+    def save(self, path: Path) -> None:
+        """Write the index to a folder, in NumPy files that `load()` memory-maps."""
+
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", self._vectors[: self._num_positions])
+        np.save(path / "is_valid.npy", self._is_valid[: self._num_positions])
+        np.save(path / "scales.npy", self._scales)
+        if self._exact_vectors is not None:
+            np.save(
+                path / "exact_vectors.npy", self._exact_vectors[: self._num_positions]
+            )
+
+    def load(self, path: Path) -> None:
+        """Replace the vectors by the ones written to a folder by `save()`.
+
+        The vectors are memory-mapped copy-on-write: they are read from the page cache,
+        shared by the processes loading the same files, until they are written.
+        """
+
+        with self._writing():
+            self._vectors = np.load(path / "vectors.npy", mmap_mode="c")
+            self._is_valid = np.load(path / "is_valid.npy")
+            self._scales = np.load(path / "scales.npy")
+            self._num_positions = len(self._is_valid)
+            if self.rescore_factor:
+                self._exact_vectors = np.load(path / "exact_vectors.npy", mmap_mode="c")
+
+    def search_exact(
+        self,
+        query: np.ndarray,
+        limit: int,
+        radius: float | None = None,
+        positions: np.ndarray | None = None,
+    ) -> list[tuple[int, float]]:
+        """Return the positions and scores of the `limit` best scoring rows, best first.
+
+        Args:
+            query: The query vector.
+            limit: Number of results, -1 for all the rows.
+            radius: If set, only the rows scoring at least `1 - radius` are returned.
+            positions: If set, only these rows are scored; the ones without a vector are
+                skipped.
+        """
+
+        return self.search_exact_batch(query[np.newaxis], limit, radius, positions)[0]
+
+    def search_exact_batch(
+        self,
+        queries: np.ndarray,
+        limit: int,
+        radius: float | None = None,
+        positions: np.ndarray | None = None,
+    ) -> list[list[tuple[int, float]]]:
+        """Return the results of `search_exact()` for every query, in order.
+
+        Args:
+            queries: The query vectors, one per row.
+            limit: Number of results per query, -1 for all the rows.
+            radius: If set, only the rows scoring at least `1 - radius` are returned.
+            positions: If set, only these rows are scored; the ones without a vector are
+                skipped.
+        """
+
+        return self._read(
+            partial(self._search_exact_batch, queries, limit, radius, positions)
+        )
+
+    def _get_vector(self, position: int) -> np.ndarray | None:
+        if position >= self._num_positions or not self._is_valid[position]:
+            return None
+        if self._exact_vectors is not None:
+            return np.array(self._exact_vectors[position])
+
+        return self._decode(self._vectors[position : position + 1])[0]
+
+    def _search_exact_batch(
+        self,
+        queries: np.ndarray,
+        limit: int,
+        radius: float | None,
+        positions: np.ndarray | None,
+    ) -> list[list[tuple[int, float]]]:
+        vectors, is_valid = (
+            self._vectors[: self._num_positions],
+            self._is_valid[: self._num_positions],
+        )
+        queries = queries.astype(np.float32)
+        if positions is None:
+            positions = np.flatnonzero(is_valid)
+        else:
+            positions = positions[positions < len(is_valid)]
+            positions = positions[is_valid[positions]]
+            vectors = vectors[positions]
+        if len(positions) == 0:
+            return [[] for _ in queries]
+        scores = self._score(queries, vectors)
+        if len(positions) < len(vectors):
+            scores = scores[:, positions]
+
+        if not self.rescore_factor:
+            return [
+                get_top_scores(positions, query_scores, limit, radius)
+                for query_scores in scores
+            ]
+        num_candidates = (
+            limit if limit == UNLIMITED_SEARCH_RESULTS else limit * self.rescore_factor
+        )
+        return [
+            self._rescore(
+                query,
+                get_top_scores(positions, query_scores, num_candidates, None),
+                limit,
+                radius,
+            )
+            for query, query_scores in zip(queries, scores)
+        ]
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        with self._write_lock:
+            self._version += 1
+            try:
+                yield
+            finally:
+                self._version += 1
+
+    def _read(self, read: Callable[[], T]) -> T:
+        """Return the result of the read, run again under the write lock if a write overlapped it."""
+
+        version = self._version
+        if version % 2 == 0:
+            result = read()
+            if self._version == version:
+                return result
+
+        with self._write_lock:
+            return read()
+
+    def _score(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        if self.precision == "int8":
+            queries = queries * self._scales
+        if vectors.dtype == np.float32:
+            return queries @ vectors.T
+
+        # NumPy has no fast float16 or int8 matrix product, so the vectors are converted
+        # chunk by chunk, into a buffer staying in the CPU cache.
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        buffer = np.empty((SCORING_CHUNK_SIZE, vectors.shape[1]), dtype=np.float32)
+        for start in range(0, len(vectors), SCORING_CHUNK_SIZE):
+            chunk = buffer[: len(vectors[start : start + SCORING_CHUNK_SIZE])]
+            chunk[:] = vectors[start : start + len(chunk)]
+            scores[:, start : start + len(chunk)] = queries @ chunk.T
+
+        return scores
+
+    def _rescore(
+        self,
+        query: np.ndarray,
+        sorted_positions: list[tuple[int, float]],
+        limit: int,
+        radius: float | None,
+    ) -> list[tuple[int, float]]:
+        if not sorted_positions:
+            return []
+        # Sorted, so the rows are read in the order of the file.
+        positions = np.sort([position for position, _ in sorted_positions])
+        exact_vectors = cast(np.ndarray, self._exact_vectors)
+
+        return get_top_scores(
+            positions, exact_vectors[positions] @ query, limit, radius
+        )
+
+    def _decode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.precision == "int8":
+            return vectors.astype(np.float32) * self._scales
+
+        return vectors.astype(np.float32)
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        match self.precision:
+            case "float16":
+                return vectors.astype(np.float16)
+            case "int8":
+                self._fit_scales(np.abs(vectors).max(axis=0) / INT8_MAX)
+                codes = np.round(vectors / self._scales)
+                return np.clip(codes, -INT8_MAX, INT8_MAX).astype(np.int8)
+
+        return vectors
+
+    def _fit_scales(self, scales: np.ndarray) -> None:
+        if not (scales > self._scales).any():
+            return
+        scales = np.maximum(scales, self._scales)
+        # The stored codes are requantized to the wider scales of their dimensions.
+        ratios = self._scales / scales
+        for start in range(0, self._num_positions, SCORING_CHUNK_SIZE):
+            chunk = self._vectors[start : start + SCORING_CHUNK_SIZE]
+            chunk[:] = np.round(chunk * ratios).astype(np.int8)
+        self._scales = scales.astype(np.float32)
+
+    def _set_vectors(
+        self, vectors_by_position: dict[int, np.ndarray | None]
+    ) -> np.ndarray:
+        removed_positions = [
+            position
+            for position, vector in vectors_by_position.items()
+            if vector is None and position < len(self._is_valid)
+        ]
+        self._is_valid[removed_positions] = False
+
+        vectors_by_position = {
+            position: vector
+            for position, vector in vectors_by_position.items()
+            if vector is not None
+        }
+        if not vectors_by_position:
+            return np.empty(0, dtype=np.int64)
+        positions = np.fromiter(vectors_by_position, dtype=np.int64)
+        vectors = np.stack(list(vectors_by_position.values())).astype(np.float32)
+        self._reserve(int(positions.max()), vectors.shape[1])
+        self._vectors[positions] = self._encode(vectors)
+        if self._exact_vectors is not None:
+            self._exact_vectors[positions] = vectors
+        self._is_valid[positions] = True
+        self._num_positions = max(self._num_positions, int(positions.max()) + 1)
+
+        return positions
+
+    def _reserve(self, position: int, dimension: int) -> None:
+        if position < len(self._vectors):
+            return
+        capacity = max(2 * len(self._vectors), 1024)
+        while capacity <= position:
+            capacity *= 2
+        vectors = np.zeros((capacity, dimension), dtype=self._vectors.dtype)
+        if len(self._vectors):
+            vectors[: len(self._vectors)] = self._vectors
+        else:
+            self._scales = np.full(dimension, np.finfo(np.float32).tiny, np.float32)
+        self._vectors = vectors
+        self._is_valid = np.concatenate(
+            [self._is_valid, np.zeros(capacity - len(self._is_valid), dtype=bool)]
+        )
+        if self.rescore_factor:
+            # The mapping outlives the file, which is deleted when closed.
+            with tempfile.TemporaryFile() as file:
+                exact_vectors = np.memmap(
+                    file, dtype=np.float32, mode="w+", shape=(capacity, dimension)
+                )
+            if self._exact_vectors is not None:
+                exact_vectors[: len(self._exact_vectors)] = self._exact_vectors
+            self._exact_vectors = exact_vectors
+
+
+class IVFIndex(FlatIndex):
+    """Inverted file index of vectors, searched by inner product.
+
+    The vectors are clustered by spherical k-means. A query scores the vectors of its
+    `num_probes` closest clusters, and then of the next `num_probes` ones until `limit`
+    vectors pass its filters, so selective filters don't return fewer results than the
+    exact search. The clusters are retrained whenever the number of vectors doubles; in
+    between, new vectors are added to their closest cluster.
+
+    Args:
+        num_lists: Number of clusters. If None, 4 * sqrt(number of vectors).
+        num_probes: Number of clusters scored at once, trading latency for recall.
+        precision: Type of the matrix of the vectors, see `FlatIndex`.
+        rescore_factor: Number of candidates rescored per result, see `FlatIndex`.
+    """
+
+    def __init__(
+        self,
+        num_lists: int | None,
+        num_probes: int,
+        precision: Literal["float32", "float16", "int8"] = "float32",
+        rescore_factor: int = 0,
+    ) -> None:
+        super().__init__(precision, rescore_factor)
+        self.num_lists = num_lists
+        self.num_probes = num_probes
+
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._centroids = np.empty((0, 0), dtype=np.float32)
+        self._num_trained_rows = 0
+        # Positions of the vectors of every cluster, as offsets into the positions.
+        self._lists = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+        # Positions updated since the last build, None if there were none.
+        self._changed_positions: list[np.ndarray] | None = None
+
+    def get_scan_size(self) -> float:
+        """Return the expected number of vectors scored by an unfiltered search."""
+
+        num_lists = max(len(self._centroids), 1)
+
+        return len(self) * min(self.num_probes, num_lists) / num_lists
+
+    def update(self, vectors_by_position: dict[int, np.ndarray | None]) -> None:
+        """Add or replace the vectors of the rows, removing the rows without one.
+
+        The clusters are updated by the next `build()`.
+        """
+
+        with self._writing():
+            if self._changed_positions is None:
+                self._changed_positions = []
+            self._changed_positions.append(self._set_vectors(vectors_by_position))
+
+    def build(self) -> None:
+        """Cluster the vectors updated since the last build."""
+
+        if self._changed_positions is None:
+            return
+        with self._writing():
+            changed_positions = np.concatenate(self._changed_positions)
+            self._changed_positions = None
+
+            num_rows = len(self)
+            if num_rows and num_rows >= 2 * self._num_trained_rows:
+                self._train()
+            elif len(changed_positions) and len(self._centroids):
+                self._assignments[changed_positions] = self._assign(changed_positions)
+            self._build_lists()
+
+    def save(self, path: Path) -> None:
+        self.build()
+        super().save(path)
+        np.save(path / "centroids.npy", self._centroids)
+        np.save(path / "assignments.npy", self._assignments[: self._num_positions])
+        np.save(path / "num_trained_rows.npy", self._num_trained_rows)
+
+    def load(self, path: Path) -> None:
+        super().load(path)
+        with self._writing():
+            self._centroids = np.load(path / "centroids.npy")
+            self._assignments = np.load(path / "assignments.npy")
+            self._num_trained_rows = int(np.load(path / "num_trained_rows.npy"))
+            self._changed_positions = None
+            self._build_lists()
+
+    def search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        radius: float | None = None,
+        is_allowed: Callable[[np.ndarray], np.ndarray] | None = None,
+    ) -> list[tuple[int, float]]:
+        """Return the positions and scores of the `limit` best scoring rows, best first.
+
+        Args:
+            query: The query vector.
+            limit: Number of results.
+            radius: If set, only the rows scoring at least `1 - radius` are returned.
+            is_allowed: Returns whether each of the given positions passes the filters.
+        """
+
+        return self._read(partial(self._search, query, limit, radius, is_allowed))
+
+    def _search(
+        self,
+        query: np.ndarray,
+        limit: int,
+        radius: float | None,
+        is_allowed: Callable[[np.ndarray], np.ndarray] | None,
+    ) -> list[tuple[int, float]]:
+        vectors, centroids, (offsets, list_positions) = (
+            self._vectors,
+            self._centroids,
+            self._lists,
+        )
+        if len(list_positions) == 0:
+            return []
+
+        query = query.astype(np.float32)
+        num_candidates = limit * self.rescore_factor if self.rescore_factor else limit
+        list_order = np.argsort(-(centroids @ query))
+        found_positions, found_scores = [], []
+        num_found = 0
+        for start in range(0, len(list_order), self.num_probes):
+            positions = np.concatenate(
+                [
+                    list_positions[offsets[list_] : offsets[list_ + 1]]
+                    for list_ in list_order[start : start + self.num_probes]
+                ]
+            )
+            if is_allowed is not None and len(positions):
+                positions = positions[is_allowed(positions)]
+            scores = self._score(query[np.newaxis], vectors[positions])[0]
+            if radius and not self.rescore_factor:
+                is_close = scores >= 1 - radius
+                positions, scores = positions[is_close], scores[is_close]
+            found_positions.append(positions)
+            found_scores.append(scores)
+            num_found += len(positions)
+            if num_found >= num_candidates:
+                break
+
+        sorted_positions = get_top_scores(
+            np.concatenate(found_positions),
+            np.concatenate(found_scores),
+            num_candidates,
+            None,
+        )
+        if self.rescore_factor:
+            return self._rescore(query, sorted_positions, limit, radius)
+
+        return sorted_positions
+
+    def _reserve(self, position: int, dimension: int) -> None:
+        super()._reserve(position, dimension)
+        if len(self._assignments) < len(self._vectors):
+            self._assignments = np.resize(self._assignments, len(self._vectors))
+
+    def _train(self) -> None:
+        valid_positions = np.flatnonzero(self._is_valid)
+        num_lists = min(
+            self.num_lists or max(1, int(4 * math.sqrt(len(valid_positions)))),
+            len(valid_positions),
+        )
+        logger.info(
+            f"Training the IVF index on {len(valid_positions)} vectors with {num_lists} clusters."
+        )
+
+        rng = np.random.default_rng(0)
+        sample_size = min(len(valid_positions), num_lists * KMEANS_SAMPLE_SIZE_PER_LIST)
+        sample = self._decode(
+            self._vectors[
+                np.sort(rng.choice(valid_positions, size=sample_size, replace=False))
+            ]
+        )
+        centroids = normalize(
+            sample[rng.choice(len(sample), size=num_lists, replace=False)]
+        )
+        for _ in range(KMEANS_NUM_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=num_lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            # Empty clusters keep their centroid.
+            sums = centroids.copy()
+            is_filled = counts > 0
+            sums[is_filled] = np.add.reduceat(sample[order], starts[is_filled], axis=0)
+            centroids = normalize(sums)
+
+        self._centroids = centroids.astype(np.float32)
+        self._assignments[valid_positions] = self._assign(valid_positions)
+        self._num_trained_rows = len(valid_positions)
+
+    def _assign(self, positions: np.ndarray) -> np.ndarray:
+        return np.concatenate(
+            [
+                np.argmax(
+                    self._score(
+                        self._centroids,
+                        self._vectors[positions[start : start + ASSIGNMENT_CHUNK_SIZE]],
+                    ),
+                    axis=0,
+                )
+                for start in range(0, len(positions), ASSIGNMENT_CHUNK_SIZE)
+            ]
+        ).astype(np.int32)
+
+    def _build_lists(self) -> None:
+        valid_positions = np.flatnonzero(self._is_valid)
+        assignments = self._assignments[valid_positions]
+        counts = np.bincount(assignments, minlength=len(self._centroids))
+        self._lists = (
+            np.concatenate([[0], np.cumsum(counts)]),
+            valid_positions[np.argsort(assignments, kind="stable")],
+        )
+
+
+class IndexedInMemoryVDB(InMemoryVDB):
+    """In-memory vector database indexing its rows to speed up the searches.
+
+    Every row gets a position shared by the indices. The vectors of the rows are moved
+    to the vector index of their field, a contiguous matrix scored at once instead of
+    vector by vector, and rebuilt when read, without the metadata Superlinked doesn't
+    persist either. With the filter index, the filters of a query select the candidate
+    rows through bitmaps, instead of being evaluated row by row, and only the candidates
+    are scored. With the IVF index, only the vectors of the clusters closest to the
+    query are scored, unless the filters leave fewer candidates than those clusters
+    hold, in which case the candidates are scored exactly. The filter indices are built
+    on their first search, and kept up to date with the rows written since their last
+    search.
+
+    With a snapshot folder, the database is persisted to it instead of to JSON: the
+    vector indices as NumPy files, memory-mapped when restored, the rows as JSON lines,
+    decoded when read, and the filter indices pickled.
+
+    The database has a random id, persisted with its rows and restored with them, to
+    which the fingerprints of the incremental load are bound when it's restored. A
+    database starting empty, e.g., as its snapshot was written with other settings,
+    gets a new id, so the fingerprints of the rows it doesn't have are cleared.
+    """
+
+    def __init__(
+        self,
+        vdb_settings: VDBSettings,
+        vector_index: Literal["flat", "ivf"],
+        filter_index_enabled: bool,
+        num_lists: int | None,
+        num_probes: int,
+        min_rows: int,
+        precision: Literal["float32", "float16", "int8"],
+        rescore_factor: int,
+        snapshot_path: Path | None,
+        fingerprints: incremental_load.RowFingerprints | None,
+    ) -> None:
+        super().__init__(vdb_settings)
+        self.vector_index = vector_index
+        self.filter_index_enabled = filter_index_enabled
+        self.num_lists = num_lists
+        self.num_probes = num_probes
+        self.min_rows = min_rows
+        self.precision = precision
+        self.rescore_factor = rescore_factor
+        self.snapshot_path = snapshot_path
+        self.fingerprints = fingerprints
+        self.database_id = uuid.uuid4().hex
+
+        self._lock = threading.Lock()
+        self._row_ids: list[str] = []
+        self._position_by_row_id: dict[str, int] = {}
+        # Filter indices by index name, vector indices by vector field name.
+        self._filter_indices: dict[str, FilterIndex] = {}
+        self._vector_indices: dict[str, FlatIndex] = {}
+        # Rows written since the last update of every filter index.
+        self._pending_row_ids: dict[str, set[str]] = {}
+        # Numbers of writes, in total and when last persisted or restored.
+        self._num_writes = 0
+        self._num_persisted_writes = 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "rows": len(self._row_ids),
+            "vector_index_mb": sum(
+                index.nbytes for index in self._vector_indices.values()
+            )
+            / 1024**2,
+            "vector_bytes_per_row": sum(
+                index.row_nbytes for index in self._vector_indices.values()
+            ),
+        }
+
+    def write_entities(self, entity_data: Sequence[EntityData]) -> None:
+        row_ids = {self._get_row_id_from_entity_id(ed.id_) for ed in entity_data}
+        with self._lock:
+            for ed in entity_data:
+                row_id = self._get_row_id_from_entity_id(ed.id_)
+                # Copied, as the rows of a snapshot are decoded on every read.
+                row = dict(self._vdb.get(row_id) or {})
+                row.update({name: fd.value for name, fd in ed.field_data.items()})
+                self._vdb[row_id] = row
+            self._move_vectors(row_ids)
+            for pending_row_ids in self._pending_row_ids.values():
+                pending_row_ids.update(row_ids)
+            self._num_writes += 1
+
+    def close_connection(self) -> None:
+        super().close_connection()
+        self._clear_indices()
+
+    def persist(self, serializer: ObjectSerializer) -> None:
+        with self._lock:
+            if self.snapshot_path is not None:
+                if self._num_writes != self._num_persisted_writes:
+                    self._write_snapshot(self.snapshot_path)
+                    self._num_persisted_writes = self._num_writes
+                return
+
+            rows = self._vdb
+            self._vdb = self._get_rows_with_vectors()
+            try:
+                super().persist(serializer)
+            finally:
+                self._vdb = rows
+            serializer.write(
+                json.dumps({"database_id": self.database_id}), self._get_id_key()
+            )
+
+    def restore(self, serializer: ObjectSerializer) -> None:
+        if self.snapshot_path is None or not self._open_snapshot(self.snapshot_path):
+            self._restore_json(serializer)
+        if self.fingerprints is not None:
+            self.fingerprints.bind(self.database_id)
+
+    def _restore_json(self, serializer: ObjectSerializer) -> None:
+        super().restore(serializer)
+        with self._lock:
+            row_ids = set(self._vdb.keys())
+            self._move_vectors(row_ids)
+            for pending_row_ids in self._pending_row_ids.values():
+                pending_row_ids.update(row_ids)
+            # Written to the snapshot on the next persist.
+            self._num_writes += bool(row_ids)
+        if row_ids:
+            persisted = json.loads(serializer.read(self._get_id_key()))
+            self.database_id = persisted.get("database_id", self.database_id)
+
+    def _find_field_data(
+        self, row_id: str, fields: Sequence[Field]
+    ) -> dict[str, FieldData]:
+        # Decoded once, as the rows of a snapshot are decoded on every read.
+        row = self._vdb.get(row_id) or {}
+        field_data = {
+            field.name: FieldData.from_field(field, row[field.name])
+            for field in fields
+            if field.name not in self._vector_indices
+            and row.get(field.name) is not None
+        }
+        position = self._position_by_row_id.get(row_id)
+        for field in fields:
+            if (index := self._vector_indices.get(field.name)) is None:
+                continue
+            vector = None if position is None else index.get_vector(position)
+            if vector is not None:
+                field_data[field.name] = FieldData.from_field(
+                    field, Vector(vector.astype(np.float64))
+                )
+
+        return field_data
+
+    def _knn_search(
+        self,
+        index_name: str,
+        schema_name: str,
+        returned_fields: Sequence[Field],
+        vdb_knn_search_params: VDBKNNSearchParams,
+        **params: Any,
+    ) -> Sequence[ResultEntityData]:
+        index_config = self._get_index_config(index_name)
+        vector_field = vdb_knn_search_params.vector_field
+        limit = vdb_knn_search_params.limit
+        radius = vdb_knn_search_params.radius
+        filters = list(vdb_knn_search_params.filters or [])
+        Search.check_vector_field(index_config, vector_field)
+        Search.check_filters(index_config, filters)
+
+        mask = None
+        if self.filter_index_enabled and filters:
+            mask, filters = self._get_mask(index_config, filters)
+        index = self._get_vector_index(vector_field.name)
+        query = vector_field.value.value
+        candidates = None if mask is None else np.flatnonzero(mask)
+
+        if (
+            isinstance(index, IVFIndex)
+            and limit != UNLIMITED_SEARCH_RESULTS
+            and len(index) >= self.min_rows
+            # Otherwise, there are fewer candidates than the clusters to scan.
+            and (candidates is None or len(candidates) > index.get_scan_size())
+        ):
+            # The filters left to the IVF search are only checked on the rows it scans.
+            if num_candidates_observer is not None and not filters:
+                num_candidates_observer(
+                    len(self._row_ids) if candidates is None else len(candidates)
+                )
+            sorted_positions = index.search(
+                query,
+                limit,
+                radius,
+                (
+                    partial(self._is_allowed, mask=mask, filters=filters)
+                    if mask is not None or filters
+                    else None
+                ),
+            )
+        else:
+            if filters:
+                if candidates is None:
+                    candidates = np.arange(len(self._row_ids))
+                candidates = candidates[self._is_allowed(candidates, None, filters)]
+            if num_candidates_observer is not None:
+                num_candidates_observer(
+                    len(self._row_ids) if candidates is None else len(candidates)
+                )
+            sorted_positions = index.search_exact(query, limit, radius, candidates)
+
+        return [
+            self._get_result_entity_data(
+                self._row_ids[position], score, returned_fields
+            )
+            for position, score in sorted_positions
+        ]
+
+    def _is_allowed(
+        self,
+        positions: np.ndarray,
+        mask: np.ndarray | None,
+        filters: Sequence[ComparisonOperation[Field]],
+    ) -> np.ndarray:
+        if mask is None:
+            is_allowed = np.ones(len(positions), dtype=bool)
+        else:
+            # Rows written after the mask was computed aren't candidates.
+            is_allowed = np.zeros(len(positions), dtype=bool)
+            is_masked = positions < len(mask)
+            is_allowed[is_masked] = mask[positions[is_masked]]
+        if filters:
+            for i in np.flatnonzero(is_allowed):
+                is_allowed[i] = InMemorySearch._is_subset(
+                    self._vdb[self._row_ids[positions[i]]], filters
+                )
+
+        return is_allowed
+
+    def _get_mask(
+        self, index_config: IndexConfig, filters: Sequence[ComparisonOperation[Field]]
+    ) -> tuple[np.ndarray, list[ComparisonOperation[Field]]]:
+        with self._lock:
+            filter_index = self._update_filter_index(
+                index_config.index_name, index_config.indexed_field_names
+            )
+
+            return filter_index.get_mask(filters, len(self._row_ids))
+
+    def _update_filter_index(
+        self, index_name: str, field_names: Sequence[str]
+    ) -> FilterIndex:
+        """Index the rows written since the last update, all the rows on the first one."""
+
+        if index_name not in self._filter_indices:
+            self._filter_indices[index_name] = FilterIndex(field_names)
+            row_ids = set(self._vdb.keys())
+        else:
+            row_ids = self._pending_row_ids[index_name]
+        self._pending_row_ids[index_name] = set()
+
+        filter_index = self._filter_indices[index_name]
+        if row_ids:
+            filter_index.update(
+                {
+                    self._get_position(row_id): self._vdb.get(row_id)
+                    for row_id in row_ids
+                }
+            )
+
+        return filter_index
+
+    def _get_vector_index(self, field_name: str) -> FlatIndex:
+        with self._lock:
+            index = self._vector_indices.get(field_name)
+            if index is None:
+                index = self._vector_indices[field_name] = self._create_vector_index()
+            if isinstance(index, IVFIndex):
+                index.build()
+
+        return index
+
+    def _create_vector_index(self) -> FlatIndex:
+        if self.vector_index == "ivf":
+            return IVFIndex(
+                self.num_lists, self.num_probes, self.precision, self.rescore_factor
+            )
+
+        return FlatIndex(self.precision, self.rescore_factor)
+
+    def _move_vectors(self, row_ids: Iterable[str]) -> None:
+        """Move the vectors of the rows to the vector indices of their fields."""
+
+        vectors_by_field: defaultdict[str, dict[int, np.ndarray | None]] = defaultdict(
+            dict
+        )
+        for row_id in row_ids:
+            row = self._vdb[row_id]
+            position = self._get_position(row_id)
+            for name, value in list(row.items()):
+                if isinstance(value, Vector):
+                    vectors_by_field[name][position] = value.value
+                    del row[name]
+                elif value is None and name in self._vector_indices:
+                    vectors_by_field[name][position] = None
+                    del row[name]
+
+        for name, vectors in vectors_by_field.items():
+            if name not in self._vector_indices:
+                self._vector_indices[name] = self._create_vector_index()
+            self._vector_indices[name].update(vectors)
+
+    def _get_rows_with_vectors(self) -> defaultdict[str, dict[str, Any]]:
+        rows = defaultdict[str, dict[str, Any]](
+            dict, {row_id: dict(row) for row_id, row in self._vdb.items()}
+        )
+        for row_id, position in self._position_by_row_id.items():
+            for name, index in self._vector_indices.items():
+                if (vector := index.get_vector(position)) is not None:
+                    rows[row_id][name] = Vector(vector.astype(np.float64))
+
+        return rows
+
+    def _write_snapshot(self, path: Path) -> None:
+        logger.info(f"Writing a snapshot of {len(self._row_ids)} rows to '{path}'.")
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        temporary_path.mkdir(parents=True)
+
+        snapshot.write_rows(temporary_path, self._row_ids, self._vdb)
+        vector_field_names = list(self._vector_indices)
+        for i, name in enumerate(vector_field_names):
+            self._vector_indices[name].save(temporary_path / "vectors" / str(i))
+        for index_name, filter_index in self._filter_indices.items():
+            self._update_filter_index(index_name, list(filter_index.fields))
+        with open(temporary_path / "filter_indices.pkl", "wb") as file:
+            pickle.dump(self._filter_indices, file)
+        snapshot.write_manifest(
+            temporary_path,
+            {
+                **self._get_snapshot_settings(),
+                "vector_field_names": vector_field_names,
+                "database_id": self.database_id,
+            },
+        )
+        snapshot.replace(temporary_path, path)
+
+    def _open_snapshot(self, path: Path) -> bool:
+        """Restore the database from a snapshot, return False if there's none to open."""
+
+        manifest = snapshot.read_manifest(path)
+        if manifest is None:
+            return False
+        if any(
+            manifest.get(key) != value
+            for key, value in self._get_snapshot_settings().items()
+        ):
+            logger.warning(
+                f"Ignoring the snapshot at '{path}', written with different settings."
+            )
+            return False
+
+        self._clear_indices()
+        with self._lock:
+            rows = snapshot.SnapshotRows(path)
+            self._vdb = rows
+            self._row_ids = list(rows.row_ids)
+            self._position_by_row_id = dict(rows.position_by_row_id)
+            for i, name in enumerate(manifest["vector_field_names"]):
+                self._vector_indices[name] = self._create_vector_index()
+                self._vector_indices[name].load(path / "vectors" / str(i))
+            with open(path / "filter_indices.pkl", "rb") as file:
+                self._filter_indices = pickle.load(file)
+            self._pending_row_ids = {name: set() for name in self._filter_indices}
+            self._num_writes = self._num_persisted_writes = 0
+            # Snapshots written without an id are restored as another database.
+            self.database_id = manifest.get("database_id", self.database_id)
+        logger.info(f"Opened the snapshot of {len(self._row_ids)} rows at '{path}'.")
+
+        return True
+
+    def _get_snapshot_settings(self) -> dict[str, Any]:
+        """Return the settings a snapshot must have been written with to be opened."""
+
+        return {
+            "app_identifier": "_".join(self.search_index_manager._index_configs.keys()),
+            "vector_index": self.vector_index,
+            "precision": self.precision,
+            "has_exact_vectors": self.precision != "float32"
+            and self.rescore_factor > 0,
+        }
+
+    def _get_id_key(self) -> str:
+        """Return the key the id of the database is persisted to JSON under."""
+
+        app_identifier = "_".join(self.search_index_manager._index_configs.keys())
+
+        return f"{app_identifier}_database_id"
+
+    def _get_position(self, row_id: str) -> int:
+        position = self._position_by_row_id.get(row_id)
+        if position is None:
+            position = len(self._row_ids)
+            self._row_ids.append(row_id)
+            self._position_by_row_id[row_id] = position
+
+        return position
+
+    def _clear_indices(self) -> None:
+        with self._lock:
+            self._row_ids = []
+            self._position_by_row_id.clear()
+            self._filter_indices.clear()
+            self._vector_indices.clear()
+            self._pending_row_ids.clear()
+
+
+class IndexedInMemoryVectorDatabase(VectorDatabase[IndexedInMemoryVDB]):
+    """In-memory vector database searching its rows through indices.
+
+    Its exact search scores the vectors of `InMemoryVectorDatabase` in float32 matrix
+    products, and the filter index selects the rows passing the filters without checking
+    every row, with the same results. The IVF index scales to catalogues that the exact
+    search scans too slowly, at the cost of missing some of the nearest vectors, and the
+    float16 and int8 precisions to catalogues that don't fit in memory in float32.
+
+    Args:
+        vector_index: 'flat' to score all the candidate vectors, 'ivf' to score the
+            ones of the clusters closest to the query.
+        filter_index_enabled: Whether to select the candidates through bitmap indices
+            of the filtered fields.
+        num_lists: Number of clusters of the IVF index. If None, 4 * sqrt(number of rows).
+        num_probes: Number of clusters scanned at once per query. Higher values find
+            more of the nearest vectors, and make the queries slower.
+        min_rows: Below this number of rows, the vectors are searched exactly.
+        precision: Type of the vectors kept in memory, 'float32', 'float16' or 'int8'.
+        rescore_factor: With a 'float16' or 'int8' precision, the number of candidates
+            rescored with their float32 vectors per result. If 0, they aren't rescored.
+        snapshot_path: Folder the database is persisted to and restored from, as
+            memory-mapped files. If None, it's persisted to JSON by the server.
+        fingerprints: Fingerprints of the incremental load, bound to the database when
+            it's restored.
+        default_query_limit: The default limit for query results. A value of -1
+            indicates no limit, in which case the search is exact.
+    """
+
+    def __init__(
+        self,
+        vector_index: Literal["flat", "ivf"],
+        filter_index_enabled: bool,
+        num_lists: int | None,
+        num_probes: int,
+        min_rows: int,
+        precision: Literal["float32", "float16", "int8"] = "float32",
+        rescore_factor: int = 0,
+        snapshot_path: Path | None = None,
+        fingerprints: incremental_load.RowFingerprints | None = None,
+        default_query_limit: int = -1,
+    ) -> None:
+        super().__init__()
+        self.vector_index = vector_index
+        self.filter_index_enabled = filter_index_enabled
+        self.num_lists = num_lists
+        self.num_probes = num_probes
+        self.min_rows = min_rows
+        self.precision = precision
+        self.rescore_factor = rescore_factor
+        self.snapshot_path = snapshot_path
+        self.fingerprints = fingerprints
+        self.default_query_limit = default_query_limit
+
+    @property
+    def _vdb_connector(self) -> IndexedInMemoryVDB:
+        return IndexedInMemoryVDB(
+            VDBSettings(self.default_query_limit),
+            self.vector_index,
+            self.filter_index_enabled,
+            self.num_lists,
+            self.num_probes,
+            self.min_rows,
+            self.precision,
+            self.rescore_factor,
+            self.snapshot_path,
+            self.fingerprints,
+        )
@@ -0,0 +1,188 @@
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+from tools.search_client import SearchClient
+
+parser = argparse.ArgumentParser(
+    description="Compare the throughput of the batch search to single queries"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of distinct queries, built from the titles of the dataset",
+    default=256,
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    help="Number of queries per batch",
+    default=64,
+)
+parser.add_argument(
+    "--num-threads",
+    type=int,
+    help="Number of queries of a batch searched concurrently",
+    default=8,
+)
+parser.add_argument(
+    "--server-url",
+    type=str,
+    help="If set, e.g., to http://localhost:8080, also compare the endpoints of a running server",
+    default=None,
+)
+
+
+def get_params_list(dataset_path: Path, num_queries: int) -> list[dict[str, Any]]:
+    df = pd.read_parquet(dataset_path, columns=["title"])
+    texts = df["title"].dropna().drop_duplicates().head(num_queries).tolist()
+
+    return [
+        {
+            "query_title": text,
+            "query_description": text,
+            "title_weight": 1.0,
+            "description_weight": 1.0,
+            "limit": 10,
+        }
+        for text in texts
+    ]
+
+
+def run_queries(
+    dataset_path: Path,
+    params_list: list[dict[str, Any]],
+    batch_size: int | None,
+    num_threads: int,
+) -> dict[str, Any]:
+    # Every query text must go through the model, in both modes.
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "False"
+    os.environ["QUERY_EMBEDDING_CACHE_ENABLED"] = "False"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from superlinked import framework as sl
+
+    from superlinked_app import batch_search, index, query
+
+    source: sl.InMemorySource = sl.InMemorySource(
+        index.product,
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+    )
+    executor = sl.InMemoryExecutor(sources=[source], indices=[index.product_index])
+    app = executor.run()
+    source.put([pd.read_parquet(dataset_path, dtype_backend="pyarrow")])
+    # Loads the model before starting the clock.
+    app.query(query.semantic_query, query_title="warm up", title_weight=1.0)
+
+    start_time = time.perf_counter()
+    if batch_size is None:
+        results = [app.query(query.semantic_query, **params) for params in params_list]
+    else:
+        searcher = batch_search.BatchSearcher(batch_size, num_threads)
+        results = []
+        for start in range(0, len(params_list), batch_size):
+            results.extend(
+                searcher.search(
+                    app,
+                    query.semantic_query,
+                    params_list[start : start + batch_size],
+                )
+            )
+    elapsed_time = time.perf_counter() - start_time
+
+    return {
+        "queries_per_s": len(params_list) / elapsed_time,
+        "ids": [
+            [entry.entity.header.object_id for entry in result.entries]
+            for result in results
+        ],
+    }
+
+
+def post_queries(
+    server_url: str,
+    params_list: list[dict[str, Any]],
+    batch_size: int | None,
+) -> float:
+    with SearchClient(server_url, timeout_s=600.0) as client:
+        start_time = time.perf_counter()
+        if batch_size is None:
+            for params in params_list:
+                client.search("semantic_query", params)
+        else:
+            for start in range(0, len(params_list), batch_size):
+                client.batch_search(
+                    "semantic_query", params_list[start : start + batch_size]
+                )
+
+        return len(params_list) / (time.perf_counter() - start_time)
+
+
+def main(
+    dataset_path: Path,
+    num_queries: int,
+    batch_size: int,
+    num_threads: int,
+    server_url: str | None,
+) -> None:
+    params_list = get_params_list(dataset_path, num_queries)
+    logger.info(
+        f"Running {len(params_list)} semantic queries on '{dataset_path.name}'."
+    )
+
+    results = {}
+    for mode, mode_batch_size in [("single", None), ("batch", batch_size)]:
+        results[mode] = run_isolated(
+            run_queries, dataset_path, params_list, mode_batch_size, num_threads
+        )
+        logger.info(
+            f"{mode:>6}: {results[mode]['queries_per_s']:.1f} queries/s, "
+            f"peak RSS {results[mode]['peak_rss_mb']:.0f} MB"
+        )
+    num_matches = sum(
+        single_ids == batch_ids
+        for single_ids, batch_ids in zip(
+            results["single"]["ids"], results["batch"]["ids"]
+        )
+    )
+    speedup = results["batch"]["queries_per_s"] / results["single"]["queries_per_s"]
+    logger.info(
+        f"In process: {speedup:.2f}x queries/s with batches of {batch_size}, "
+        f"{num_matches}/{len(params_list)} queries with the same results."
+    )
+
+    if server_url is not None:
+        # Each mode sends different texts, so neither hits the caches of the server.
+        single_queries_per_s = post_queries(server_url, params_list[0::2], None)
+        batch_queries_per_s = post_queries(server_url, params_list[1::2], batch_size)
+        logger.info(
+            f"Server: {single_queries_per_s:.1f} queries/s with single requests, "
+            f"{batch_queries_per_s:.1f} queries/s with batch requests "
+            f"({batch_queries_per_s / single_queries_per_s:.2f}x)."
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.dataset_path,
+        args.num_queries,
+        args.batch_size,
+        args.num_threads,
+        args.server_url,
+    )
@@ -0,0 +1,152 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare the rows/s of the per item ingestion to the micro-batched and bulk ingestion"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--num-clients",
+    type=int,
+    help="Number of concurrent clients ingesting one item per request",
+    default=16,
+)
+parser.add_argument(
+    "--max-batch-sizes",
+    type=int,
+    nargs="+",
+    help="Values of INGEST_BATCH_MAX_SIZE to try",
+    default=[64, 256],
+)
+parser.add_argument(
+    "--max-latency-ms",
+    type=int,
+    help="Value of INGEST_BATCH_MAX_LATENCY_MS",
+    default=50,
+)
+
+
+def get_items(dataset_path: Path) -> list[dict[str, Any]]:
+    """Items of the dataset, as sent as JSON to the ingest endpoint."""
+
+    df = pd.read_parquet(dataset_path).rename(columns={"asin": "id"})
+    df["category"] = df["category"].map(list)
+    columns = [
+        "id",
+        "type",
+        "category",
+        "title",
+        "description",
+        "review_rating",
+        "review_count",
+        "price",
+    ]
+
+    return df[columns].to_dict("records")
+
+
+def measure_ingestion(
+    items: list[dict[str, Any]],
+    mode: str,
+    num_clients: int,
+    max_batch_size: int,
+    max_latency_ms: int,
+) -> dict[str, float]:
+    # Every product must go through the model.
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "False"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from superlinked import framework as sl
+    from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+        SentenceTransformerManager,
+    )
+
+    from superlinked_app import bulk_ingest, constants, index
+
+    source: sl.InMemorySource = sl.InMemorySource(index.product)
+    executor = sl.InMemoryExecutor(sources=[source], indices=[index.product_index])
+    executor.run()
+    # Load the model before starting the clock.
+    SentenceTransformerManager(constants.TEXT_EMBEDDING_MODEL_ID).embed_text(
+        ["warm up"]
+    )
+
+    batcher = bulk_ingest.IngestBatcher(
+        source.put,
+        max_batch_size,
+        max_latency_ms,
+        len(items),
+        shared_embedding_model=constants.TEXT_EMBEDDING_MODEL_ID,
+        shared_embedding_fields=["title", "description"],
+    )
+    start_time = time.perf_counter()
+    if mode == "per_item":
+        # The ingest endpoint of the server writes the items of its requests one by one.
+        for item in items:
+            source.put([item])
+    elif mode == "coalesced":
+        with ThreadPoolExecutor(num_clients) as clients:
+            list(clients.map(lambda item: batcher.put([item]), items))
+        batcher.join()
+    else:
+        batcher.put(items)
+        batcher.join()
+    elapsed_time = time.perf_counter() - start_time
+
+    return {**batcher.stats(), "rows_per_s": len(items) / elapsed_time}
+
+
+def main(
+    dataset_path: Path,
+    num_clients: int,
+    max_batch_sizes: list[int],
+    max_latency_ms: int,
+) -> None:
+    items = get_items(dataset_path)
+    logger.info(f"Ingesting the {len(items)} products of '{dataset_path.name}'.")
+
+    results = {
+        ("per_item", 1): run_isolated(
+            measure_ingestion, items, "per_item", num_clients, 1, max_latency_ms
+        )
+    }
+    for mode in ["coalesced", "bulk"]:
+        for max_batch_size in max_batch_sizes:
+            results[(mode, max_batch_size)] = run_isolated(
+                measure_ingestion,
+                items,
+                mode,
+                num_clients,
+                max_batch_size,
+                max_latency_ms,
+            )
+
+    per_item_rows_per_s = results[("per_item", 1)]["rows_per_s"]
+    for (mode, max_batch_size), result in results.items():
+        logger.info(
+            f"{mode:>9}, max batch size {max_batch_size:>5}: "
+            f"{result['rows_per_s']:.1f} rows/s "
+            f"(x{result['rows_per_s'] / per_item_rows_per_s:.1f}), "
+            f"mean batch size {result['mean_batch_size'] or 1:.1f}, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB."
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.num_clients, args.max_batch_sizes, args.max_latency_ms)
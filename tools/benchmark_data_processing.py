@@ -0,0 +1,188 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from superlinked_app import data_processing
+
+parser = argparse.ArgumentParser(
+    description="Check the parity and compare the throughput of the row-wise and vectorized parsers"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the raw dataset (JSON lines, optionally .gz or .zst compressed)",
+    default=Path("data") / "sample.json.gz",
+)
+parser.add_argument(
+    "--num-repeats",
+    type=int,
+    help="Number of times the dataset is concatenated to itself to measure the throughput",
+    default=100,
+)
+
+# Hand-written values covering the corner cases of every parser.
+EDGE_CASES = {
+    "category": [
+        ["Books", " Literature & Fiction ", "Poetry"],
+        [" Home & Kitchen"],
+        [],
+        ["Books", None],
+        [np.nan],
+        None,
+        np.nan,
+    ],
+    "stars": [
+        "4.5 out of 5 stars",
+        "4,2 de 5 estrellas",
+        "5 out of 5 stars",
+        "out of 5 stars",
+        "nan out of 5 stars",
+        "4.5\xa0out of 5 stars",
+        "\u20034.5 out of 5 stars",
+        "4_5 out of 5 stars",
+        "",
+        " ",
+        4.5,
+        None,
+        np.nan,
+    ],
+    "ratings": [
+        "1,116 ratings",
+        "90 valoraciones",
+        "1 rating",
+        "+3 ratings",
+        "-3 ratings",
+        "1.5 ratings",
+        "90\xa0ratings",
+        "1_116 ratings",
+        "1_116\u2009ratings",
+        ",. 6",
+        ",.6 x",
+        "ratings",
+        "",
+        None,
+        np.nan,
+    ],
+    "price": [
+        "$9.99",
+        "25,63€",
+        "$1,299.00",
+        "$2500",
+        "$10.99 - $20.99",
+        "$0.5",
+        " $ 9.99 ",
+        "1e3",
+        "7_56",
+        "\xa0$9.99\u2002",
+        "$1_299.00",
+        "inf",
+        "nan",
+        "",
+        12.0,
+        None,
+        np.nan,
+    ],
+}
+
+PARSERS: dict[str, tuple[Callable, Callable]] = {
+    "category": (data_processing.parse_category, data_processing.parse_categories),
+    "stars": (
+        data_processing.parse_review_rating,
+        data_processing.parse_review_ratings,
+    ),
+    "ratings": (
+        data_processing.parse_review_count,
+        data_processing.parse_review_counts,
+    ),
+    "price": (data_processing.parse_price, data_processing.parse_prices),
+}
+
+
+def parse_row_wise(column: str, df: pd.DataFrame) -> pd.Series:
+    row_wise_parser, _ = PARSERS[column]
+    if column == "category":
+        keep_num_categories = data_processing.sample_num_categories(df["asin"])
+
+        return pd.Series(
+            [
+                row_wise_parser(category, num_categories)
+                for category, num_categories in zip(df[column], keep_num_categories)
+            ],
+            index=df.index,
+        )
+
+    return df[column].apply(row_wise_parser)
+
+
+def parse_vectorized(column: str, df: pd.DataFrame) -> pd.Series:
+    _, vectorized_parser = PARSERS[column]
+    if column == "category":
+        return vectorized_parser(df[column], df["asin"])
+
+    return vectorized_parser(df[column])
+
+
+def check_parity(column: str, df: pd.DataFrame) -> None:
+    expected = parse_row_wise(column, df)
+    actual = parse_vectorized(column, df)
+    values = df[column]
+
+    if column == "category":
+        is_equal = expected.tolist() == actual.tolist()
+    else:
+        is_equal = expected.astype(float).equals(actual.astype(float))
+
+    if not is_equal:
+        mismatches = values[
+            [str(e) != str(a) for e, a in zip(expected.astype(str), actual.astype(str))]
+        ]
+        raise AssertionError(
+            f"The vectorized '{column}' parser differs on: {mismatches.tolist()[:10]}"
+        )
+
+
+def measure_throughput(
+    parse: Callable[[str, pd.DataFrame], pd.Series], column: str, df: pd.DataFrame
+) -> float:
+    start_time = time.perf_counter()
+    parse(column, df)
+
+    return len(df) / (time.perf_counter() - start_time)
+
+
+def main(dataset_path: Path, num_repeats: int) -> None:
+    df = pd.read_json(str(dataset_path), lines=True)
+    df = df[df["locale"] == "us"]
+
+    logger.info("Checking the parity of the vectorized parsers.")
+    for column, edge_cases in EDGE_CASES.items():
+        edge_cases_df = pd.DataFrame(
+            {
+                "asin": [f"B{idx:09d}" for idx in range(len(edge_cases))],
+                column: pd.Series(edge_cases, dtype=object),
+            }
+        )
+        check_parity(column, edge_cases_df)
+        check_parity(column, df)
+    logger.info("The vectorized parsers match the row-wise parsers.")
+
+    df = pd.concat([df] * num_repeats, ignore_index=True)
+    logger.info(f"Measuring the throughput on {len(df)} rows.")
+    for column in PARSERS:
+        row_wise = measure_throughput(parse_row_wise, column, df)
+        vectorized = measure_throughput(parse_vectorized, column, df)
+        logger.info(
+            f"{column:>8}: row-wise {row_wise:,.0f} rows/s, "
+            f"vectorized {vectorized:,.0f} rows/s ({vectorized / row_wise:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.num_repeats)
@@ -0,0 +1,61 @@
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare the load time and memory of the processed JSONL and Parquet datasets"
+)
+parser.add_argument(
+    "--dataset-paths",
+    type=Path,
+    nargs="+",
+    help="Paths to the processed JSONL datasets, each next to its Parquet counterpart",
+    default=[
+        Path("data") / "processed_300_sample.jsonl",
+        Path("data") / "processed_850_sample.jsonl",
+    ],
+)
+
+
+def load_jsonl(dataset_path: Path) -> dict[str, float]:
+    start_time = time.perf_counter()
+    # Read the same way as the data loader from superlinked_app/api.py.
+    num_rows = 0
+    for chunk in pd.read_json(dataset_path, lines=True, chunksize=100):
+        num_rows += len(chunk)
+
+    return {"load_time_s": time.perf_counter() - start_time, "num_rows": num_rows}
+
+
+def load_parquet(dataset_path: Path) -> dict[str, float]:
+    start_time = time.perf_counter()
+    df = pd.read_parquet(dataset_path, dtype_backend="pyarrow")
+
+    return {"load_time_s": time.perf_counter() - start_time, "num_rows": len(df)}
+
+
+def main(dataset_paths: list[Path]) -> None:
+    for dataset_path in dataset_paths:
+        for load in [load_jsonl, load_parquet]:
+            path = (
+                dataset_path
+                if load is load_jsonl
+                else dataset_path.with_suffix(".parquet")
+            )
+            result = run_isolated(load, path)
+            logger.info(
+                f"{path.name:>32}: {result['num_rows']} rows loaded in "
+                f"{result['load_time_s']:.3f} s, peak RSS {result['peak_rss_mb']:.1f} MB, "
+                f"file size {path.stat().st_size / 1024**2:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_paths)
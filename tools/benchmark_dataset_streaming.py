@@ -0,0 +1,106 @@
+import argparse
+import multiprocessing
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+from superlinked_app import utils
+from superlinked_app.data_processing import process_amazon_dataset
+from tools.benchmark_utils import run_isolated
+from tools.download_and_process_dataset import (
+    get_processed_dataset_path,
+    process_dataset_in_chunks,
+)
+
+parser = argparse.ArgumentParser(
+    description="Compare the decompress-to-disk and streaming dataset processing paths"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the compressed dataset (.gz or .zst)",
+    default=Path("data") / "sample.json.gz",
+)
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    help="Number of lines processed at once by the streaming path",
+    default=100_000,
+)
+parser.add_argument(
+    "--num-workers",
+    type=int,
+    help="Number of processes used by the parallel streaming path",
+    default=multiprocessing.cpu_count(),
+)
+
+
+def run_two_step(dataset_path: Path, chunk_size: int, num_workers: int) -> None:
+    """The former path: decompress the whole file to disk, then load it in memory."""
+
+    decompressed_path = dataset_path.with_suffix("")
+    if dataset_path.suffix == ".gz":
+        utils.decompress_gz(dataset_path, decompressed_path)
+    else:
+        utils.decompress_zst(dataset_path, decompressed_path)
+
+    df = pd.read_json(str(decompressed_path), lines=True)
+    processed_df = process_amazon_dataset(df)
+    processed_df.to_json(
+        get_processed_dataset_path(dataset_path, len(processed_df)),
+        orient="records",
+        lines=True,
+    )
+
+
+def run_streaming(dataset_path: Path, chunk_size: int, num_workers: int) -> None:
+    process_dataset_in_chunks(dataset_path, chunk_size)
+
+
+def run_parallel(dataset_path: Path, chunk_size: int, num_workers: int) -> None:
+    process_dataset_in_chunks(dataset_path, chunk_size, num_workers)
+
+
+PIPELINES = {
+    "two-step": run_two_step,
+    "streaming": run_streaming,
+    "parallel": run_parallel,
+}
+
+
+def measure(
+    pipeline: str, dataset_path: Path, chunk_size: int, num_workers: int
+) -> dict[str, float]:
+    start_time = time.perf_counter()
+    PIPELINES[pipeline](dataset_path, chunk_size, num_workers)
+
+    return {"wall_clock_s": time.perf_counter() - start_time}
+
+
+def main(dataset_path: Path, chunk_size: int, num_workers: int) -> None:
+    results = {}
+    for pipeline in PIPELINES:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dataset_path = Path(tmp_dir) / dataset_path.name
+            shutil.copy(dataset_path, tmp_dataset_path)
+
+            logger.info(f"Running the '{pipeline}' pipeline.")
+            results[pipeline] = run_isolated(
+                measure, pipeline, tmp_dataset_path, chunk_size, num_workers
+            )
+
+    for pipeline, result in results.items():
+        logger.info(
+            f"{pipeline:>10}: {result['wall_clock_s']:.2f} s, "
+            f"peak RSS {result['peak_rss_mb']:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.chunk_size, args.num_workers)
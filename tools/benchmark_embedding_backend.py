@@ -0,0 +1,166 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Check the recall and compare the speed of the fp32 and int8 embedding backends"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_850_sample.parquet",
+)
+parser.add_argument(
+    "--k",
+    type=int,
+    help="Number of nearest neighbors compared by the recall@k check",
+    default=10,
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    help="Number of texts passed through the model at once on the ingest path",
+    default=32,
+)
+
+BACKENDS = ["fp32", "int8"]
+
+# Representative natural language queries, embedded one by one like on the query path.
+QUERIES = [
+    "books with a price lower than 100",
+    "psychology and mindfulness",
+    "children's books about animals",
+    "wireless headphones with noise cancelling",
+    "kitchen knives set",
+    "science fiction novels about space exploration",
+    "organic green tea",
+    "yoga mat for beginners",
+    "history of the roman empire",
+    "cookbook with vegetarian recipes",
+    "phone case for iphone",
+    "self help books about productivity",
+    "camping tent for four people",
+    "gifts for a coffee lover",
+    "learning python programming",
+    "mystery thriller with a detective",
+    "baby bottles and accessories",
+    "leather wallet for men",
+    "poetry collection",
+    "travel guide to japan",
+]
+
+
+def get_texts(dataset_path: Path) -> list[str]:
+    df = pd.read_parquet(dataset_path, columns=["title", "description"])
+
+    return pd.concat([df["title"], df["description"]]).dropna().tolist()
+
+
+def embed_with_backend(
+    backend: str, dataset_path: Path, batch_size: int, output_dir: Path
+) -> dict[str, float]:
+    from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+        SentenceTransformerManager,
+    )
+
+    from superlinked_app import constants, embedding_backend
+
+    embedding_backend.configure(backend, batch_size, num_threads=None)
+    manager = SentenceTransformerManager(constants.TEXT_EMBEDDING_MODEL_ID)
+    texts = get_texts(dataset_path)
+    # Load (and quantize) the model before starting the clock.
+    manager.embed_text(["warm up"])
+
+    start_time = time.perf_counter()
+    text_vectors = [vector.value for vector in manager.embed_text(texts)]
+    ingest_time = time.perf_counter() - start_time
+
+    query_vectors = []
+    query_latencies = []
+    for query in QUERIES:
+        start_time = time.perf_counter()
+        query_vectors.append(manager.embed_text([query])[0].value)
+        query_latencies.append(time.perf_counter() - start_time)
+
+    np.save(output_dir / f"{backend}_texts.npy", np.stack(text_vectors))
+    np.save(output_dir / f"{backend}_queries.npy", np.stack(query_vectors))
+
+    return {
+        "ingest_texts_per_s": len(texts) / ingest_time,
+        "query_p50_ms": float(np.percentile(query_latencies, 50) * 1000),
+        "query_p95_ms": float(np.percentile(query_latencies, 95) * 1000),
+    }
+
+
+def get_top_k(
+    query_vectors: np.ndarray, text_vectors: np.ndarray, k: int
+) -> np.ndarray:
+    text_vectors = text_vectors / np.linalg.norm(text_vectors, axis=1, keepdims=True)
+    scores = query_vectors @ text_vectors.T
+
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def compute_recall_at_k(output_dir: Path, k: int) -> tuple[float, float]:
+    """Compare the int8 neighbors and vectors to the fp32 ones.
+
+    Returns:
+        The recall@k of the int8 neighbors and the mean cosine similarity between
+        the int8 and fp32 vectors of the same texts.
+    """
+
+    vectors = {
+        backend: {
+            kind: np.load(output_dir / f"{backend}_{kind}.npy")
+            for kind in ["texts", "queries"]
+        }
+        for backend in BACKENDS
+    }
+    expected = get_top_k(vectors["fp32"]["queries"], vectors["fp32"]["texts"], k)
+    actual = get_top_k(vectors["int8"]["queries"], vectors["int8"]["texts"], k)
+    recall = np.mean([len(set(e) & set(a)) / k for e, a in zip(expected, actual)])
+
+    fp32_texts = vectors["fp32"]["texts"]
+    int8_texts = vectors["int8"]["texts"]
+    cosine_similarities = np.sum(fp32_texts * int8_texts, axis=1) / (
+        np.linalg.norm(fp32_texts, axis=1) * np.linalg.norm(int8_texts, axis=1)
+    )
+
+    return float(recall), float(cosine_similarities.mean())
+
+
+def main(dataset_path: Path, k: int, batch_size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        for backend in BACKENDS:
+            logger.info(f"Embedding '{dataset_path.name}' with the {backend} backend.")
+            results[backend] = run_isolated(
+                embed_with_backend, backend, dataset_path, batch_size, Path(tmp_dir)
+            )
+        recall, cosine_similarity = compute_recall_at_k(Path(tmp_dir), k)
+
+    for backend, result in results.items():
+        logger.info(
+            f"{backend:>5}: ingest {result['ingest_texts_per_s']:.1f} texts/s, "
+            f"query p50 {result['query_p50_ms']:.1f} ms, "
+            f"p95 {result['query_p95_ms']:.1f} ms, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB"
+        )
+    logger.info(
+        f"int8 recall@{k} against fp32: {recall:.3f}, "
+        f"mean cosine similarity to the fp32 vectors: {cosine_similarity:.4f}"
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.k, args.batch_size)
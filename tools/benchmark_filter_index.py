@@ -0,0 +1,132 @@
+import argparse
+import time
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare the filter index to checking the filters of every product"
+)
+parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    help="Numbers of products to filter",
+    default=[10_000, 100_000],
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of queries per filter",
+    default=10,
+)
+
+TYPES = ["book", "product"]
+NUM_CATEGORIES = 50
+
+
+def generate_products(rng: np.random.Generator, size: int) -> list[dict[str, Any]]:
+    """Sample products with the filtered fields of the product schema."""
+
+    types = rng.choice(TYPES, size)
+    num_categories = rng.integers(1, 4, size)
+    categories = rng.integers(0, NUM_CATEGORIES, (size, 3))
+    ratings = np.round(rng.uniform(1, 5, size), 1)
+    prices = np.round(rng.lognormal(3, 1, size), 2)
+
+    return [
+        {
+            "type": str(types[i]),
+            "category": [f"category {c}" for c in categories[i, : num_categories[i]]],
+            "review_rating": float(ratings[i]),
+            "price": float(prices[i]),
+        }
+        for i in range(size)
+    ]
+
+
+def get_filters_by_name() -> dict[str, list[Any]]:
+    from superlinked.framework.common.storage.field.field import Field
+    from superlinked.framework.common.storage.field.field_data_type import (
+        FieldDataType,
+    )
+
+    type_ = Field(FieldDataType.STRING, "type")
+    category = Field(FieldDataType.STRING_LIST, "category")
+    rating = Field(FieldDataType.DOUBLE, "review_rating")
+    price = Field(FieldDataType.DOUBLE, "price")
+
+    return {
+        "books": [type_ == "book"],
+        "books rated above 4.5": [type_ == "book", rating > 4.5],
+        "books under $10 rated above 4.5": [type_ == "book", rating > 4.5, price < 10],
+        "books of a category under $10": [
+            type_ == "book",
+            category.contains("category 0"),
+            price < 10,
+        ],
+    }
+
+
+def run_size(size: int, num_queries: int) -> dict[str, Any]:
+    from superlinked.framework.storage.in_memory.in_memory_search import (
+        InMemorySearch,
+    )
+
+    from superlinked_app.filter_index import FilterIndex
+
+    products = generate_products(np.random.default_rng(0), size)
+    filter_index = FilterIndex(["type", "category", "review_rating", "price"])
+    start_time = time.perf_counter()
+    filter_index.update(dict(enumerate(products)))
+    results: dict[str, Any] = {"build_s": time.perf_counter() - start_time}
+
+    for name, filters in get_filters_by_name().items():
+        start_time = time.perf_counter()
+        for _ in range(num_queries):
+            is_subset = [
+                InMemorySearch._is_subset(product, filters) for product in products
+            ]
+        row_by_row_time = (time.perf_counter() - start_time) / num_queries
+
+        start_time = time.perf_counter()
+        for _ in range(num_queries):
+            mask, _ = filter_index.get_mask(filters, size)
+        indexed_time = (time.perf_counter() - start_time) / num_queries
+
+        results[name] = {
+            "selectivity": mask.mean(),
+            "row_by_row_ms": 1000 * row_by_row_time,
+            "indexed_ms": 1000 * indexed_time,
+            "is_same": bool(np.array_equal(mask, is_subset)),
+        }
+
+    return results
+
+
+def main(sizes: list[int], num_queries: int) -> None:
+    for size in sizes:
+        results = run_isolated(run_size, size, num_queries)
+        logger.info(
+            f"{size} products: filter index built in {results['build_s']:.1f} s, "
+            f"peak RSS {results['peak_rss_mb']:.0f} MB."
+        )
+        for name, result in results.items():
+            if not isinstance(result, dict):
+                continue
+            logger.info(
+                f"{name:>32} ({100 * result['selectivity']:.1f}% of products): "
+                f"{result['row_by_row_ms']:.2f} ms row by row, "
+                f"{result['indexed_ms']:.2f} ms indexed "
+                f"({result['row_by_row_ms'] / result['indexed_ms']:.0f}x), "
+                f"{'same' if result['is_same'] else 'different'} products."
+            )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.sizes, args.num_queries)
@@ -0,0 +1,143 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare reloading a changed dataset incrementally to reloading it in full"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--price-change-ratio",
+    type=float,
+    help="Ratio of the products whose price changes before reloading",
+    default=0.1,
+)
+parser.add_argument(
+    "--title-change-ratio",
+    type=float,
+    help="Ratio of the products whose title changes before reloading",
+    default=0.01,
+)
+
+
+def change_dataset(
+    df: pd.DataFrame, price_change_ratio: float, title_change_ratio: float
+) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    changed = df.copy()
+    price_rows = rng.random(len(df)) < price_change_ratio
+    changed.loc[price_rows, "price"] = changed.loc[price_rows, "price"] * 0.9
+    title_rows = rng.random(len(df)) < title_change_ratio
+    changed.loc[title_rows, "title"] = changed.loc[title_rows, "title"] + " (new)"
+
+    return changed
+
+
+def measure_reload(
+    dataset_path: Path,
+    incremental: bool,
+    price_change_ratio: float,
+    title_change_ratio: float,
+) -> dict[str, Any]:
+    directory = Path(tempfile.mkdtemp())
+    # The unchanged texts are embedded by the cache in both modes, as in the server.
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "True"
+    os.environ["EMBEDDING_CACHE_PATH"] = str(directory / "embedding_cache.sqlite3")
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from superlinked import framework as sl
+
+    from superlinked_app import constants, incremental_load, index
+    from superlinked_app.config import settings
+    from superlinked_app.sources import ChunkedDataLoaderSource
+
+    fingerprints = None
+    if incremental:
+        fingerprints = incremental_load.RowFingerprints(
+            directory / "fingerprints.sqlite3"
+        )
+        # The vector database of the benchmark starts empty.
+        fingerprints.bind("benchmark")
+    source = ChunkedDataLoaderSource(
+        index.product,
+        data_loader_config=sl.DataLoaderConfig(
+            str(dataset_path), sl.DataFormat.PARQUET
+        ),
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+        chunk_size=settings.INGESTION_CHUNK_SIZE,
+        shared_embedding_model=constants.TEXT_EMBEDDING_MODEL_ID,
+        shared_embedding_columns=["title", "description"],
+        fingerprints=fingerprints,
+        id_column="asin",
+    )
+    executor = sl.InMemoryExecutor(sources=[source], indices=[index.product_index])
+    executor.run()
+
+    df = pd.read_parquet(dataset_path, dtype_backend="pyarrow")
+    start_time = time.perf_counter()
+    source.put([df])
+    load_time = time.perf_counter() - start_time
+
+    changed = change_dataset(df, price_change_ratio, title_change_ratio)
+    stats_before = source.stats()
+    start_time = time.perf_counter()
+    source.put([changed])
+    reload_time = time.perf_counter() - start_time
+
+    return {
+        **{name: count - stats_before[name] for name, count in source.stats().items()},
+        "load_s": load_time,
+        "reload_s": reload_time,
+        "num_rows": len(df),
+    }
+
+
+def main(
+    dataset_path: Path, price_change_ratio: float, title_change_ratio: float
+) -> None:
+    for incremental in [False, True]:
+        result = run_isolated(
+            measure_reload,
+            dataset_path,
+            incremental,
+            price_change_ratio,
+            title_change_ratio,
+        )
+        if not incremental:
+            logger.info(
+                f"       full: loaded {result['num_rows']} rows in "
+                f"{result['load_s']:.2f} s, reloaded them after the changes in "
+                f"{result['reload_s']:.2f} s, peak RSS {result['peak_rss_mb']:.0f} MB."
+            )
+            continue
+
+        logger.info(
+            f"incremental: loaded {result['num_rows']} rows in "
+            f"{result['load_s']:.2f} s, reloaded them after the changes in "
+            f"{result['reload_s']:.2f} s ({result['inserted']} inserted, "
+            f"{result['updated']} updated, {result['updated_without_embedding']} "
+            f"without embedding their texts, {result['skipped']} skipped), "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB."
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.price_change_ratio, args.title_change_ratio)
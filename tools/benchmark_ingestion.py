@@ -0,0 +1,123 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Sweep the ingestion chunk size, embedding batch size and number of threads"
+)
+parser.add_argument(
+    "--dataset-paths",
+    type=Path,
+    nargs="+",
+    help="Paths to the processed Parquet datasets",
+    default=[
+        Path("data") / "processed_300_sample.parquet",
+        Path("data") / "processed_850_sample.parquet",
+    ],
+)
+parser.add_argument(
+    "--chunk-sizes",
+    type=int,
+    nargs="+",
+    help="Values of INGESTION_CHUNK_SIZE to try",
+    default=[100, 1000],
+)
+parser.add_argument(
+    "--batch-sizes",
+    type=int,
+    nargs="+",
+    help="Values of EMBEDDING_BATCH_SIZE to try",
+    default=[16, 32, 64],
+)
+parser.add_argument(
+    "--num-threads",
+    type=int,
+    nargs="+",
+    help="Values of EMBEDDING_NUM_THREADS to try",
+    default=sorted(
+        {max(multiprocessing.cpu_count() // 2, 1), multiprocessing.cpu_count()}
+    ),
+)
+
+
+def measure_ingestion(
+    dataset_path: Path, chunk_size: int, batch_size: int, num_threads: int
+) -> dict[str, float]:
+    # The settings are read when importing the app, so they are set before.
+    os.environ["INGESTION_CHUNK_SIZE"] = str(chunk_size)
+    os.environ["EMBEDDING_BATCH_SIZE"] = str(batch_size)
+    os.environ["EMBEDDING_NUM_THREADS"] = str(num_threads)
+    # Every product must go through the model.
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "False"
+
+    import pandas as pd
+    from superlinked import framework as sl
+    from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+        SentenceTransformerManager,
+    )
+
+    from superlinked_app import constants, index
+
+    source: sl.InMemorySource = sl.InMemorySource(
+        index.product,
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+    )
+    executor = sl.InMemoryExecutor(sources=[source], indices=[index.product_index])
+    executor.run()
+
+    df = pd.read_parquet(dataset_path, dtype_backend="pyarrow")
+    # Load the model before starting the clock.
+    SentenceTransformerManager(constants.TEXT_EMBEDDING_MODEL_ID).embed_text(
+        ["warm up"]
+    )
+
+    start_time = time.perf_counter()
+    # Same chunking as the data loader from superlinked_app/api.py.
+    for start in range(0, len(df), chunk_size):
+        source.put([df.iloc[start : start + chunk_size]])
+    elapsed_time = time.perf_counter() - start_time
+
+    return {"rows_per_s": len(df) / elapsed_time, "num_rows": len(df)}
+
+
+def main(
+    dataset_paths: list[Path],
+    chunk_sizes: list[int],
+    batch_sizes: list[int],
+    num_threads: list[int],
+) -> None:
+    for dataset_path in dataset_paths:
+        results = []
+        for config in itertools.product(chunk_sizes, batch_sizes, num_threads):
+            logger.info(
+                f"Ingesting '{dataset_path.name}' with chunk size, batch size, "
+                f"threads = {config}."
+            )
+            results.append(
+                (config, run_isolated(measure_ingestion, dataset_path, *config))
+            )
+
+        logger.info(f"Results for '{dataset_path.name}', fastest first:")
+        for (chunk_size, batch_size, threads), result in sorted(
+            results, key=lambda item: -item[1]["rows_per_s"]
+        ):
+            logger.info(
+                f"chunk size {chunk_size:>6}, batch size {batch_size:>4}, "
+                f"threads {threads:>3}: {result['rows_per_s']:.1f} rows/s, "
+                f"peak RSS {result['peak_rss_mb']:.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_paths, args.chunk_sizes, args.batch_sizes, args.num_threads)
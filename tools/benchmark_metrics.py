@@ -0,0 +1,70 @@
+import argparse
+import time
+from collections.abc import Callable
+
+from loguru import logger
+
+from superlinked_app import metrics
+
+parser = argparse.ArgumentParser(
+    description="Measure the overhead of the metrics and traces per stage of a query"
+)
+parser.add_argument(
+    "--num-calls",
+    type=int,
+    help="Number of calls of a stage per measurement",
+    default=100_000,
+)
+
+# Stages recorded per query: the query, its natural query parsing, the embedding of
+# its two texts and its vector search.
+STAGES_PER_QUERY = 5
+
+
+def stage() -> None:
+    pass
+
+
+def measure_overhead_us(call: Callable[[], None], num_calls: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(num_calls):
+        call()
+
+    return 1e6 * (time.perf_counter() - start_time) / num_calls
+
+
+def main(num_calls: int) -> None:
+    search_metrics = metrics.SearchMetrics(tracing_enabled=False)
+    traced_metrics = metrics.SearchMetrics(tracing_enabled=True)
+
+    def timed_stage(metrics_: metrics.SearchMetrics) -> Callable[[], None]:
+        def call() -> None:
+            with metrics_.time_stage("embedding"):
+                stage()
+
+        return call
+
+    baseline_us = measure_overhead_us(stage, num_calls)
+    for name, call in {
+        "disabled": stage,
+        "metrics": timed_stage(search_metrics),
+        "metrics and traces": timed_stage(traced_metrics),
+    }.items():
+        overhead_us = max(measure_overhead_us(call, num_calls) - baseline_us, 0.0)
+        logger.info(
+            f"{name:>18}: {overhead_us:.2f} us per stage, "
+            f"{STAGES_PER_QUERY * overhead_us:.2f} us per query."
+        )
+
+    start_time = time.perf_counter()
+    num_bytes = len(search_metrics.render())
+    logger.info(
+        f"Rendered {num_bytes} bytes of metrics in "
+        f"{1000 * (time.perf_counter() - start_time):.2f} ms."
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.num_calls)
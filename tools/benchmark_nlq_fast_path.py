@@ -0,0 +1,243 @@
+import argparse
+import math
+import os
+import time
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+parser = argparse.ArgumentParser(
+    description="Check the natural query fast path against an offline test set and measure the OpenAI calls it saves"
+)
+parser.add_argument(
+    "--stub-latency-ms",
+    type=float,
+    help="Latency of the local stub replacing the OpenAI client",
+    default=1500.0,
+)
+parser.add_argument(
+    "--repeat",
+    type=int,
+    help="Number of times every natural query is evaluated",
+    default=3,
+)
+
+# Query name, natural query and the parameters expected from the fast path, or None
+# when the query must be sent to OpenAI.
+TEST_CASES: list[tuple[str, str, dict[str, Any] | None]] = [
+    (
+        "filter_query",
+        "books with a price lower than 100 and a rating bigger than 4",
+        {
+            "filter_by_type": "book",
+            "review_rating_bigger_than": 4.0,
+            "price_smaller_than": 100.0,
+        },
+    ),
+    (
+        "filter_query",
+        "books with a price lower than 100",
+        {"filter_by_type": "book", "price_smaller_than": 100.0},
+    ),
+    ("filter_query", "psychology and mindfulness books rated 4+ stars", None),
+    (
+        "filter_query",
+        "children's books under $20 with a rating of at least 4.5",
+        {
+            "filter_by_cateogry": ["Children's Books"],
+            "review_rating_bigger_than": 4.5,
+            "price_smaller_than": 20.0,
+        },
+    ),
+    (
+        "filter_query",
+        "cheapest kitchen knives",
+        {
+            "price_minimizer_weights": 1.0,
+            "query_description": "kitchen knives",
+            "description_similar_clause_weight": 1.0,
+            "description_weight": 1.0,
+        },
+    ),
+    (
+        "filter_query",
+        "yoga mat for beginners, 4 stars or more, 50 dollars or less",
+        None,
+    ),
+    ("filter_query", "wireless headphones under $150", None),
+    ("filter_query", "Books", {"filter_by_type": "book"}),
+    ("filter_query", "organic green tea in grocery & gourmet food", None),
+    ("filter_query", "camping tent with a rating above 4.5 stars", None),
+    (
+        "semantic_query",
+        "science fiction novels about space exploration",
+        {
+            "query_description": "science fiction novels about space exploration",
+            "description_similar_clause_weight": 1.0,
+            "query_title": "science fiction novels about space exploration",
+            "title_similar_clause_weight": 1.0,
+            "title_weight": 1.0,
+            "description_weight": 1.0,
+        },
+    ),
+    (
+        "semantic_query",
+        "best rated cookbook with vegetarian recipes",
+        {
+            "review_rating_maximizer_weight": 1.0,
+            "query_description": "cookbook with vegetarian recipes",
+            "description_similar_clause_weight": 1.0,
+            "query_title": "cookbook with vegetarian recipes",
+            "title_similar_clause_weight": 1.0,
+            "title_weight": 1.0,
+            "description_weight": 1.0,
+        },
+    ),
+    (
+        "semantic_query",
+        "history of the roman empire",
+        {
+            "query_description": "history of the roman empire",
+            "description_similar_clause_weight": 1.0,
+            "query_title": "history of the roman empire",
+            "title_similar_clause_weight": 1.0,
+            "title_weight": 1.0,
+            "description_weight": 1.0,
+        },
+    ),
+    (
+        "similar_items_query",
+        "similar books to B07WP4RXHY",
+        {
+            "product_id": "B07WP4RXHY",
+            "title_weight": 1.0,
+            "description_weight": 1.0,
+            "review_rating_maximizer_weight": 1.0,
+            "price_minimizer_weights": 1.0,
+            "filter_by_type": "book",
+        },
+    ),
+    (
+        "filter_query",
+        "book light for reading in bed",
+        {
+            "query_description": "book light for reading in bed",
+            "description_similar_clause_weight": 1.0,
+            "description_weight": 1.0,
+        },
+    ),
+    (
+        "filter_query",
+        "book ends",
+        {
+            "query_description": "book ends",
+            "description_similar_clause_weight": 1.0,
+            "description_weight": 1.0,
+        },
+    ),
+    ("semantic_query", "toys for a 3 year old", None),
+    ("filter_query", "beauty products", None),
+    ("filter_query", "books that are not about politics", None),
+    ("filter_query", "top 10 books of 2020", None),
+    ("filter_query", "books between 10 and 20 dollars", None),
+    ("filter_query", "phone cases except for iphone", None),
+    ("filter_query", "the most popular gifts for a coffee lover", None),
+    (
+        "semantic_query",
+        "books with a price lower than 100 and a rating bigger than 4",
+        None,
+    ),
+    (
+        "semantic_query",
+        "similar books to B07WP4RXHY with a rating bigger than 4.5",
+        None,
+    ),
+]
+
+
+class StubOpenAIClient:
+    """Stand-in for the OpenAI client answering after a fixed latency."""
+
+    latency_s = 0.0
+
+    def __init__(self, config: Any) -> None:
+        pass
+
+    def query(
+        self, prompt: str, instructor_prompt: str, response_model: type
+    ) -> dict[str, Any]:
+        time.sleep(self.latency_s)
+
+        return {}
+
+
+def main(stub_latency_ms: float, repeat: int) -> None:
+    # Every miss of the fast path must reach the (stubbed) OpenAI client.
+    os.environ["NLQ_CACHE_ENABLED"] = "False"
+    os.environ["NLQ_FAST_PATH_ENABLED"] = "True"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from superlinked.framework.dsl.query import nlq_param_evaluator
+    from superlinked.framework.dsl.query.nlq_pydantic_model_builder import (
+        NLQPydanticModelBuilder,
+    )
+
+    from superlinked_app import query
+
+    StubOpenAIClient.latency_s = stub_latency_ms / 1000
+    nlq_param_evaluator.OpenAIClient = StubOpenAIClient
+    fast_path = query.natural_query_fast_path
+    min_confidence = fast_path.min_confidence
+
+    num_failures = 0
+    for query_name, natural_query, expected_params in TEST_CASES:
+        param_infos = getattr(query, query_name).calculate_param_infos()
+        params = fast_path.evaluate(natural_query, param_infos)
+        if params is not None:
+            # The parameters set must pass the validation of the OpenAI response too.
+            # The others, like the texts of the clauses without text, are left unset.
+            NLQPydanticModelBuilder(
+                [param_info for param_info in param_infos if param_info.name in params]
+            ).build().model_validate(params)
+        if params != expected_params:
+            num_failures += 1
+            logger.error(
+                f"{query_name} '{natural_query}': expected {expected_params}, got {params}."
+            )
+    logger.info(
+        f"Offline test set: {len(TEST_CASES) - num_failures}/{len(TEST_CASES)} passed."
+    )
+
+    latencies = {}
+    for mode in ["OpenAI only", "fast path"]:
+        # An infinite minimum confidence sends every query to OpenAI.
+        fast_path.min_confidence = math.inf if mode == "OpenAI only" else min_confidence
+        fast_path.hits = fast_path.misses = 0
+        latencies[mode] = []
+        for _ in range(repeat):
+            for query_name, natural_query, _ in TEST_CASES:
+                evaluator = nlq_param_evaluator.NLQParamEvaluator(
+                    getattr(query, query_name).calculate_param_infos()
+                )
+                start_time = time.perf_counter()
+                evaluator.evaluate_param_infos(natural_query, query.openai_config)
+                latencies[mode].append(time.perf_counter() - start_time)
+
+    for mode, mode_latencies in latencies.items():
+        logger.info(
+            f"{mode:>11}: mean {np.mean(mode_latencies) * 1000:.1f} ms, "
+            f"p50 {np.percentile(mode_latencies, 50) * 1000:.1f} ms, "
+            f"p95 {np.percentile(mode_latencies, 95) * 1000:.1f} ms"
+        )
+    saving = 1 - np.mean(latencies["fast path"]) / np.mean(latencies["OpenAI only"])
+    logger.info(
+        f"Fast path coverage: {fast_path.hit_ratio:.1%} of the queries, "
+        f"{saving:.1%} less natural query latency with a {stub_latency_ms:.0f} ms OpenAI stub."
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.stub_latency_ms, args.repeat)
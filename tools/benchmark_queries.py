@@ -0,0 +1,565 @@
+import argparse
+import asyncio
+import contextvars
+import functools
+import importlib
+import json
+import os
+import random
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import httpx
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+from tools.search_client import AsyncSearchClient
+
+parser = argparse.ArgumentParser(
+    description="Load test the queries of the Superlinked server and report their latency per stage"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset loaded by the server",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--query-mix",
+    type=str,
+    nargs="+",
+    help="Queries to replay and their weights, as <query name>=<weight>",
+    default=["semantic_query=0.5", "filter_query=0.3", "similar_items_query=0.2"],
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of measured queries",
+    default=300,
+)
+parser.add_argument(
+    "--num-warmup-queries",
+    type=int,
+    help="Number of queries sent before measuring",
+    default=20,
+)
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    help="Number of queries in flight, each sent once the previous one returned",
+    default=4,
+)
+parser.add_argument(
+    "--arrival-rate",
+    type=float,
+    help="If set, send the queries at this fixed rate per second instead, whatever their latency",
+    default=None,
+)
+parser.add_argument(
+    "--openai-latency-ms",
+    type=float,
+    help="Latency of the local stub server replacing the OpenAI API",
+    default=1000.0,
+)
+parser.add_argument(
+    "--with-caches",
+    action="store_true",
+    help="Keep the natural query, query embedding and result caches enabled",
+)
+parser.add_argument(
+    "--output-path",
+    type=Path,
+    help="Path of the JSON report",
+    default=Path("data") / "benchmark_queries.json",
+)
+parser.add_argument(
+    "--baseline-path",
+    type=Path,
+    help="JSON report of a previous run to compare the latencies to",
+    default=None,
+)
+
+# Stages of a query, timed by wrapping the functions running them in the server.
+STAGE_FUNCTIONS = {
+    "nl_parsing": (
+        "superlinked.framework.dsl.query.nlq_param_evaluator",
+        "NLQParamEvaluator",
+        "evaluate_param_infos",
+    ),
+    "openai_call": (
+        "superlinked.framework.common.nlq.open_ai",
+        "OpenAIClient",
+        "query",
+    ),
+    "embedding": (
+        "superlinked.framework.common.space.embedding.sentence_transformer_embedding",
+        "SentenceTransformerEmbedding",
+        "embed_multiple",
+    ),
+    "vector_search": (
+        "superlinked.framework.common.storage_manager.storage_manager",
+        "StorageManager",
+        "knn_search",
+    ),
+    "total": (
+        "superlinked.framework.dsl.executor.rest.rest_handler",
+        "RestHandler",
+        "_query_handler",
+    ),
+}
+PERCENTILES = [50, 95, 99]
+
+_query_name: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "query_name", default=None
+)
+
+
+class StageTimer:
+    """Time the stages of the queries run by the server, by query name.
+
+    The server runs the stages of a query synchronously within its request handler, so
+    they are attributed to the query through a context variable set by the handler.
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, dict[str, list[float]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        for stage, (module_name, class_name, method_name) in STAGE_FUNCTIONS.items():
+            cls = getattr(importlib.import_module(module_name), class_name)
+            setattr(cls, method_name, self._wrap(stage, getattr(cls, method_name)))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.durations.clear()
+
+    def _wrap(self, stage: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def timed_method(*args: Any, **kwargs: Any) -> Any:
+            token = None
+            if stage == "total":
+                # The path of the query endpoint ends with the query name.
+                token = _query_name.set(str(args[2]).rsplit("/", 1)[-1])
+            query_name = _query_name.get()
+            start_time = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start_time
+                if query_name is not None:
+                    with self._lock:
+                        self.durations[query_name][stage].append(duration)
+                if token is not None:
+                    _query_name.reset(token)
+
+        return timed_method
+
+
+def start_openai_stub(latency_ms: float) -> str:
+    """Serve the chat completions of the OpenAI API, extracting no filters.
+
+    The tool calls set the parameters the response model requires, the texts of the
+    similarity clauses, to the whole natural query, and every weight to 1, which the
+    model requires for the spaces of the weighted clauses. The filters keep their
+    defaults, as the model doesn't accept null for them.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self) -> None:
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency_ms / 1000)
+            message: dict[str, Any] = {"role": "assistant", "content": "{}"}
+            if request.get("tools"):
+                # Instructor reads the parameters from the call of its tool.
+                function = request["tools"][0]["function"]
+                parameters = function["parameters"]
+                # The messages of the retries follow the one of the natural query.
+                natural_query = next(
+                    message["content"]
+                    for message in request["messages"]
+                    if message["role"] == "user"
+                )
+                arguments = {
+                    name: 1.0 for name in parameters["properties"] if "weight" in name
+                }
+                arguments.update(
+                    dict.fromkeys(parameters.get("required", []), natural_query)
+                )
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": "call_stub",
+                            "type": "function",
+                            "function": {
+                                "name": function["name"],
+                                "arguments": json.dumps(arguments),
+                            },
+                        }
+                    ],
+                }
+            body = json.dumps(
+                {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": message,
+                            "finish_reason": "tool_calls"
+                            if request.get("tools")
+                            else "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 0,
+                        "completion_tokens": 0,
+                        "total_tokens": 0,
+                    },
+                }
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    # The OpenAI client resetting its idle connections at exit isn't an error.
+    server.handle_error = lambda *_: None  # type: ignore[method-assign]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+
+        return sock.getsockname()[1]
+
+
+def parse_query_mix(query_mix: list[str]) -> dict[str, float]:
+    weights = {}
+    for item in query_mix:
+        query_name, _, weight = item.partition("=")
+        weights[query_name] = float(weight or 1.0)
+
+    return weights
+
+
+def get_queries(
+    dataset_path: Path, weights: dict[str, float], num_queries: int
+) -> list[tuple[str, dict[str, Any]]]:
+    """Draw the queries of the mix, with parameters built from the products."""
+
+    df = pd.read_parquet(dataset_path, columns=["asin", "type", "title"]).dropna()
+    rng = random.Random(0)
+    builders: dict[str, Callable[[pd.Series], dict[str, Any]]] = {
+        "semantic_query": lambda row: {"natural_query": row["title"][:80]},
+        "filter_query": lambda row: {
+            "natural_query": (
+                f"{row['type']}s with a price lower than {rng.choice([20, 50, 100])} "
+                f"and a rating bigger than {rng.choice([3.5, 4, 4.5])}"
+            )
+        },
+        "similar_items_query": lambda row: {
+            "natural_query": f"similar {row['type']}s to {row['asin']}",
+            "product_id": row["asin"],
+        },
+    }
+
+    queries = []
+    query_names = rng.choices(list(weights), list(weights.values()), k=num_queries)
+    for query_name in query_names:
+        row = df.iloc[rng.randrange(len(df))]
+        queries.append((query_name, {**builders[query_name](row), "limit": 10}))
+
+    return queries
+
+
+async def replay_queries(
+    server_url: str,
+    queries: list[tuple[str, dict[str, Any]]],
+    concurrency: int,
+    arrival_rate: float | None,
+) -> tuple[list[tuple[str, float, bool]], float]:
+    """Send the queries, returning their name, latency and success, and the duration."""
+
+    results: list[tuple[str, float, bool]] = []
+    max_connections = concurrency if arrival_rate is None else 1000
+    async with AsyncSearchClient(
+        server_url, timeout_s=600.0, max_retries=0, max_connections=max_connections
+    ) as client:
+
+        async def send(query_name: str, params: dict[str, Any], sent_at: float) -> None:
+            success = True
+            try:
+                await client.search(query_name, params)
+            except httpx.HTTPError:
+                success = False
+            # Measured from the planned send time, so the queueing of the client counts.
+            results.append((query_name, time.perf_counter() - sent_at, success))
+
+        start_time = time.perf_counter()
+        if arrival_rate is None:
+            remaining = iter(queries)
+
+            async def worker() -> None:
+                for query_name, params in remaining:
+                    await send(query_name, params, time.perf_counter())
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        else:
+            tasks = []
+            for i, (query_name, params) in enumerate(queries):
+                sent_at = start_time + i / arrival_rate
+                await asyncio.sleep(max(sent_at - time.perf_counter(), 0))
+                tasks.append(asyncio.create_task(send(query_name, params, sent_at)))
+            await asyncio.gather(*tasks)
+
+        return results, time.perf_counter() - start_time
+
+
+def summarize(durations: list[float]) -> dict[str, float]:
+    milliseconds = 1000 * np.asarray(durations)
+
+    return {
+        "count": len(durations),
+        "mean_ms": float(milliseconds.mean()) if len(durations) else 0.0,
+        **{
+            f"p{percentile}_ms": (
+                float(np.percentile(milliseconds, percentile))
+                if len(durations)
+                else 0.0
+            )
+            for percentile in PERCENTILES
+        },
+    }
+
+
+def run_load_test(
+    dataset_path: Path,
+    weights: dict[str, float],
+    num_queries: int,
+    num_warmup_queries: int,
+    concurrency: int,
+    arrival_rate: float | None,
+    openai_latency_ms: float,
+    with_caches: bool,
+) -> dict[str, Any]:
+    port = get_free_port()
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": start_openai_stub(openai_latency_ms),
+            "PROCESSED_DATASET_PATH": str(dataset_path),
+            "SERVER_HOST": "127.0.0.1",
+            "SERVER_PORT": str(port),
+            # The products are loaded below, not restored from a previous run.
+            "PERSISTENCE_FOLDER_PATH": tempfile.mkdtemp(),
+            "IN_MEMORY_SNAPSHOT_ENABLED": "False",
+            "INCREMENTAL_LOAD_ENABLED": "False",
+            # The texts embedded by previous runs aren't reused.
+            "EMBEDDING_CACHE_PATH": str(Path(tempfile.mkdtemp()) / "cache.sqlite3"),
+        }
+    )
+    if not with_caches:
+        for name in [
+            "EMBEDDING_CACHE_ENABLED",
+            "NLQ_CACHE_ENABLED",
+            "QUERY_EMBEDDING_CACHE_ENABLED",
+            "RESULT_CACHE_ENABLED",
+        ]:
+            os.environ[name] = "False"
+
+    import uvicorn
+    from superlinked.server.app import ServerApp
+
+    # Imported before the server, so the stages are timed after the app patched them.
+    from superlinked_app import api
+
+    stage_timer = StageTimer()
+    stage_timer.install()
+    server = uvicorn.Server(
+        uvicorn.Config(ServerApp().app, host="127.0.0.1", port=port, log_config=None)
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.1)
+
+    # Same as the data loader of the server, without its asynchronous task.
+    start_time = time.perf_counter()
+    api.product_loader_source.put(
+        [pd.read_parquet(dataset_path, dtype_backend="pyarrow")]
+    )
+    load_time = time.perf_counter() - start_time
+
+    server_url = f"http://127.0.0.1:{port}"
+    queries = get_queries(dataset_path, weights, num_warmup_queries + num_queries)
+    asyncio.run(replay_queries(server_url, queries[:num_warmup_queries], 1, None))
+    stage_timer.reset()
+    results, elapsed_time = asyncio.run(
+        replay_queries(
+            server_url, queries[num_warmup_queries:], concurrency, arrival_rate
+        )
+    )
+
+    server.should_exit = True
+    thread.join()
+
+    errors = {
+        query_name: sum(
+            not success for name, _, success in results if name == query_name
+        )
+        for query_name in weights
+    }
+    if sum(errors.values()) > 0:
+        raise RuntimeError(f"Queries failed, by query name: {errors}")
+
+    report: dict[str, Any] = {
+        "load_s": load_time,
+        "qps": len(results) / elapsed_time,
+        "queries": {},
+    }
+    for query_name in weights:
+        latencies = [latency for name, latency, _ in results if name == query_name]
+        report["queries"][query_name] = {
+            **summarize(latencies),
+            "stages": {
+                stage: summarize(durations)
+                for stage, durations in stage_timer.durations[query_name].items()
+            },
+        }
+
+    return report
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def log_report(report: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    logger.info(f"{report['qps']:.1f} queries/s.")
+    for query_name, stats in report["queries"].items():
+        change = ""
+        if baseline is not None and query_name in baseline["queries"]:
+            baseline_p50 = baseline["queries"][query_name]["p50_ms"]
+            baseline_p99 = baseline["queries"][query_name]["p99_ms"]
+            change = f" (baseline p50 {baseline_p50:.1f} ms, p99 {baseline_p99:.1f} ms)"
+        logger.info(
+            f"{query_name:>19}: {stats['count']} queries, "
+            f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+            f"p99 {stats['p99_ms']:.1f} ms{change}"
+        )
+        for stage, stage_stats in stats["stages"].items():
+            calls_per_query = stage_stats["count"] / max(stats["count"], 1)
+            logger.info(
+                f"{stage:>32}: mean {stage_stats['mean_ms']:.1f} ms, "
+                f"p95 {stage_stats['p95_ms']:.1f} ms, "
+                f"{calls_per_query:.1f} calls/query"
+            )
+
+
+def main(
+    dataset_path: Path,
+    query_mix: list[str],
+    num_queries: int,
+    num_warmup_queries: int,
+    concurrency: int,
+    arrival_rate: float | None,
+    openai_latency_ms: float,
+    with_caches: bool,
+    output_path: Path,
+    baseline_path: Path | None,
+) -> None:
+    weights = parse_query_mix(query_mix)
+    load = (
+        f"at {arrival_rate} queries/s"
+        if arrival_rate is not None
+        else f"with {concurrency} concurrent queries"
+    )
+    logger.info(
+        f"Replaying {num_queries} queries of {weights} on '{dataset_path.name}' {load}."
+    )
+
+    report = run_isolated(
+        run_load_test,
+        dataset_path,
+        weights,
+        num_queries,
+        num_warmup_queries,
+        concurrency,
+        arrival_rate,
+        openai_latency_ms,
+        with_caches,
+    )
+    report = {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "git_commit": get_git_commit(),
+        "config": {
+            "dataset_path": str(dataset_path),
+            "query_mix": weights,
+            "num_queries": num_queries,
+            "concurrency": concurrency if arrival_rate is None else None,
+            "arrival_rate": arrival_rate,
+            "openai_latency_ms": openai_latency_ms,
+            "with_caches": with_caches,
+        },
+        **report,
+    }
+
+    baseline = None
+    if baseline_path is not None:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    log_report(report, baseline)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    logger.info(f"Report written to '{output_path}'.")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.dataset_path,
+        args.query_mix,
+        args.num_queries,
+        args.num_warmup_queries,
+        args.concurrency,
+        args.arrival_rate,
+        args.openai_latency_ms,
+        args.with_caches,
+        args.output_path,
+        args.baseline_path,
+    )
@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Replay a query log with and without the result cache"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--query-log",
+    type=Path,
+    help="JSONL file with a {'query_name': ..., 'params': {...}} object per line. "
+    "If not set, a log with Zipf distributed queries is generated.",
+    default=None,
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of queries of the generated log",
+    default=2000,
+)
+parser.add_argument(
+    "--zipf-exponent",
+    type=float,
+    help="Exponent of the Zipf distribution of the generated log, higher means hotter queries",
+    default=1.2,
+)
+parser.add_argument(
+    "--write-every",
+    type=int,
+    help="Ingest a product every N queries to measure the effect of the invalidation, 0 to never ingest",
+    default=0,
+)
+
+QUERY_TEXTS = [
+    "psychology and mindfulness",
+    "children's books about animals",
+    "wireless headphones with noise cancelling",
+    "kitchen knives set",
+    "science fiction novels about space exploration",
+    "organic green tea",
+    "yoga mat for beginners",
+    "history of the roman empire",
+    "cookbook with vegetarian recipes",
+    "phone case for iphone",
+    "self help books about productivity",
+    "camping tent for four people",
+    "gifts for a coffee lover",
+    "learning python programming",
+    "mystery thriller with a detective",
+    "baby bottles and accessories",
+    "leather wallet for men",
+    "poetry collection",
+    "travel guide to japan",
+]
+
+
+def generate_query_log(num_queries: int, zipf_exponent: float) -> list[dict[str, Any]]:
+    distinct_queries = []
+    for text in QUERY_TEXTS:
+        distinct_queries.append(
+            {
+                "query_name": "semantic_query",
+                "params": {
+                    "query_description": text,
+                    "query_title": text,
+                    "description_weight": 1.0,
+                    "title_weight": 1.0,
+                    "limit": 10,
+                },
+            }
+        )
+        for price in [20, 100]:
+            distinct_queries.append(
+                {
+                    "query_name": "filter_query",
+                    "params": {
+                        "query_description": text,
+                        "description_weight": 1.0,
+                        "price_smaller_than": price,
+                        "limit": 10,
+                    },
+                }
+            )
+
+    rng = np.random.default_rng(0)
+    ranks = rng.permutation(len(distinct_queries))
+    probabilities = 1 / (np.arange(1, len(distinct_queries) + 1) ** zipf_exponent)
+    indices = rng.choice(ranks, size=num_queries, p=probabilities / probabilities.sum())
+
+    return [distinct_queries[index] for index in indices]
+
+
+def replay_query_log(
+    dataset_path: Path,
+    query_log: list[dict[str, Any]],
+    write_every: int,
+    use_cache: bool,
+) -> dict[str, Any]:
+    # Only the queries sending a natural query need OpenAI.
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import pandas as pd
+    from superlinked import framework as sl
+
+    from superlinked_app import index, query, result_cache
+
+    source: sl.InMemorySource = sl.InMemorySource(
+        index.product,
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+    )
+    executor = sl.InMemoryExecutor(sources=[source], indices=[index.product_index])
+    app = executor.run()
+    df = pd.read_parquet(dataset_path, dtype_backend="pyarrow")
+    source.put([df])
+
+    queries = {
+        "filter_query": query.filter_query,
+        "semantic_query": query.semantic_query,
+        "similar_items_query": query.similar_items_query,
+    }
+    cache = None
+    if use_cache:
+        # Same setup as superlinked_app/api.py.
+        cache = result_cache.ResultCache(max_rows=100_000)
+        result_cache.install(cache, queries)
+        result_cache.invalidate_on_put(cache, [source])
+
+    # Embed the query texts before starting the clock, so both runs measure the search.
+    distinct_entries = {json.dumps(entry, sort_keys=True): entry for entry in query_log}
+    for entry in distinct_entries.values():
+        app.query(queries[entry["query_name"]], **entry["params"])
+    if cache is not None:
+        cache.invalidate()
+        cache.hits.clear()
+        cache.misses.clear()
+
+    latencies = []
+    start_time = time.perf_counter()
+    for i, entry in enumerate(query_log):
+        if write_every and i and i % write_every == 0:
+            source.put([df.iloc[[i % len(df)]]])
+        query_start_time = time.perf_counter()
+        app.query(queries[entry["query_name"]], **entry["params"])
+        latencies.append(time.perf_counter() - query_start_time)
+    elapsed_time = time.perf_counter() - start_time
+
+    return {
+        "queries_per_s": len(query_log) / elapsed_time,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "cache_stats": cache.stats() if cache is not None else None,
+    }
+
+
+def main(
+    dataset_path: Path,
+    query_log_path: Path | None,
+    num_queries: int,
+    zipf_exponent: float,
+    write_every: int,
+) -> None:
+    if query_log_path is not None:
+        with open(query_log_path) as f:
+            query_log = [json.loads(line) for line in f if line.strip()]
+    else:
+        query_log = generate_query_log(num_queries, zipf_exponent)
+    logger.info(f"Replaying {len(query_log)} queries on '{dataset_path.name}'.")
+
+    results = {}
+    for use_cache in [False, True]:
+        mode = "cache" if use_cache else "no cache"
+        results[mode] = run_isolated(
+            replay_query_log, dataset_path, query_log, write_every, use_cache
+        )
+        logger.info(
+            f"{mode:>8}: {results[mode]['queries_per_s']:.1f} queries/s, "
+            f"p50 {results[mode]['p50_ms']:.2f} ms, "
+            f"p95 {results[mode]['p95_ms']:.2f} ms, "
+            f"peak RSS {results[mode]['peak_rss_mb']:.0f} MB"
+        )
+
+    cache_stats = results["cache"]["cache_stats"]
+    for query_name, query_stats in cache_stats["queries"].items():
+        logger.info(
+            f"{query_name}: hit ratio {query_stats['hit_ratio']:.1%} "
+            f"({query_stats['hits']} hits, {query_stats['misses']} misses)"
+        )
+    speedup = results["cache"]["queries_per_s"] / results["no cache"]["queries_per_s"]
+    logger.info(
+        f"Result cache: {speedup:.2f}x queries/s, overall hit ratio "
+        f"{cache_stats['hit_ratio']:.1%}, {cache_stats['entries']} cached results, "
+        f"{cache_stats['version']} index versions."
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.dataset_path,
+        args.query_log,
+        args.num_queries,
+        args.zipf_exponent,
+        args.write_every,
+    )
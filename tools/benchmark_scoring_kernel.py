@@ -0,0 +1,178 @@
+import argparse
+import time
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare the matrix scoring of the in-memory vector database to the per-row one"
+)
+parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    help="Numbers of products to score",
+    default=[10_000, 100_000],
+)
+parser.add_argument(
+    "--text-dimension",
+    type=int,
+    help="Dimension of the title and description spaces, the one of the text model",
+    default=1024,
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of queries per mode",
+    default=64,
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    help="Number of queries scored at once in the batch mode",
+    default=64,
+)
+parser.add_argument(
+    "--k",
+    type=int,
+    help="Number of results per query",
+    default=10,
+)
+
+
+def generate_space_vectors(
+    rng: np.random.Generator, num_vectors: int, text_dimension: int
+) -> list[np.ndarray]:
+    """Sample the vectors of the spaces of `base_query`: title, description, review
+    rating and price."""
+
+    return [
+        rng.standard_normal((num_vectors, text_dimension)),
+        rng.standard_normal((num_vectors, text_dimension)),
+        rng.uniform(0, 1, (num_vectors, 1)),
+        rng.uniform(0, 1, (num_vectors, 1)),
+    ]
+
+
+def concatenate(space_vectors: list[np.ndarray], weights: np.ndarray) -> np.ndarray:
+    """Normalize the vectors of every space, and concatenate them with their weights."""
+
+    vectors = np.empty((len(space_vectors[0]), sum(v.shape[1] for v in space_vectors)))
+    offset = 0
+    for weight, space_vector in zip(weights, space_vectors):
+        space_vector /= np.linalg.norm(space_vector, axis=1, keepdims=True)
+        vectors[:, offset : offset + space_vector.shape[1]] = weight * space_vector
+        offset += space_vector.shape[1]
+
+    return vectors
+
+
+def run_size(
+    size: int, text_dimension: int, num_queries: int, batch_size: int, k: int
+) -> dict[str, Any]:
+    from superlinked.framework.common.calculation.distance_metric import (
+        DistanceMetric,
+    )
+    from superlinked.framework.common.data_types import Vector
+    from superlinked.framework.storage.in_memory.in_memory_search import (
+        InMemorySearch,
+    )
+
+    from superlinked_app.vector_index import FlatIndex
+
+    rng = np.random.default_rng(0)
+    # The spaces of a product vector are weighted equally, the ones of a query per request.
+    vectors = concatenate(
+        generate_space_vectors(rng, size, text_dimension), np.ones(4) / 2
+    )
+    queries = np.stack(
+        [
+            concatenate(
+                generate_space_vectors(rng, 1, text_dimension),
+                rng.uniform(0, 1, 4),
+            )[0]
+            for _ in range(num_queries)
+        ]
+    )
+    vectors_by_row_id = {
+        f"product:{position}": Vector(vector) for position, vector in enumerate(vectors)
+    }
+    index = FlatIndex()
+    index.update(dict(enumerate(vectors)))
+    del vectors
+
+    results: dict[str, Any] = {}
+    search = InMemorySearch()
+    start_time = time.perf_counter()
+    row_by_row_ids = []
+    for query in queries:
+        similarities = search._calculate_similarities(
+            DistanceMetric.INNER_PRODUCT, Vector(query), vectors_by_row_id
+        )
+        row_by_row_ids.append(
+            [
+                int(row_id.split(":")[1])
+                for row_id, _ in search._sort_similarities(similarities, None)[:k]
+            ]
+        )
+    results["row by row"] = num_queries / (time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    matrix_ids = [
+        [position for position, _ in index.search_exact(query, k)] for query in queries
+    ]
+    results["matrix"] = num_queries / (time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    batch_ids = [
+        [position for position, _ in found]
+        for start in range(0, num_queries, batch_size)
+        for found in index.search_exact_batch(queries[start : start + batch_size], k)
+    ]
+    results[f"matrix, batches of {batch_size}"] = num_queries / (
+        time.perf_counter() - start_time
+    )
+    results["num_matches"] = sum(
+        row_by_row == matrix == batch
+        for row_by_row, matrix, batch in zip(row_by_row_ids, matrix_ids, batch_ids)
+    )
+
+    return results
+
+
+def main(
+    sizes: list[int],
+    text_dimension: int,
+    num_queries: int,
+    batch_size: int,
+    k: int,
+) -> None:
+    for size in sizes:
+        results = run_isolated(
+            run_size, size, text_dimension, num_queries, batch_size, k
+        )
+        logger.info(
+            f"{size} products: peak RSS {results.pop('peak_rss_mb'):.0f} MB, "
+            f"{results.pop('num_matches')}/{num_queries} queries with the same top {k}."
+        )
+        row_by_row_queries_per_s = results["row by row"]
+        for mode, queries_per_s in results.items():
+            logger.info(
+                f"{mode:>22}: {queries_per_s:.1f} queries/s "
+                f"({queries_per_s / row_by_row_queries_per_s:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.sizes,
+        args.text_dimension,
+        args.num_queries,
+        args.batch_size,
+        args.k,
+    )
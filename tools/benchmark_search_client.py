@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import numpy as np
+import requests
+from loguru import logger
+
+from tools.search_client import AsyncSearchClient, SearchClient
+
+parser = argparse.ArgumentParser(
+    description="Compare the per query latency of the search clients to a new request per query"
+)
+parser.add_argument(
+    "--server-url",
+    type=str,
+    help="URL of a running Superlinked server. If not set, a local server returning canned responses measures the overhead of the clients alone",
+    default=None,
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of queries per client",
+    default=500,
+)
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    help="Number of concurrent queries of the async client",
+    default=16,
+)
+parser.add_argument(
+    "--slow-ratio",
+    type=float,
+    help="Ratio of the responses of the local server delayed by --slow-delay-ms",
+    default=0.02,
+)
+parser.add_argument(
+    "--slow-delay-ms",
+    type=float,
+    help="Delay of the slow responses of the local server",
+    default=200.0,
+)
+parser.add_argument(
+    "--hedge-after-ms",
+    type=float,
+    help="Delay after which the hedged client sends a query again",
+    default=50.0,
+)
+
+QUERY_NAME = "semantic_query"
+PARAMS = {"natural_query": "books with a rating bigger than 4", "limit": 3}
+
+
+def start_local_server(slow_ratio: float, slow_delay_ms: float) -> str:
+    body = json.dumps({"results": [{"obj": {"id": "B000000000"}}]}).encode("utf-8")
+    # Seeded, so the slow responses are the same for every client.
+    rng = random.Random(0)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # As uvicorn, otherwise the body waits for the ACK of the headers.
+        disable_nagle_algorithm = True
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers["Content-Length"]))
+            if rng.random() < slow_ratio:
+                time.sleep(slow_delay_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    # The clients resetting their idle connections when closed aren't errors.
+    server.handle_error = lambda *_: None  # type: ignore[method-assign]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def measure_latencies(search: Callable[[], Any], num_queries: int) -> np.ndarray:
+    latencies = []
+    for _ in range(num_queries):
+        start_time = time.perf_counter()
+        search()
+        latencies.append(time.perf_counter() - start_time)
+
+    return 1000 * np.array(latencies)
+
+
+def post_new_request(server_url: str) -> dict[str, Any]:
+    """Search as `tools/streamlit_app.py` did before the client, one connection each."""
+
+    response = requests.post(
+        f"{server_url}/api/v1/search/{QUERY_NAME}",
+        headers={"accept": "application/json", "Content-Type": "application/json"},
+        json=PARAMS,
+    )
+    response.raise_for_status()
+
+    return response.json()
+
+
+async def search_concurrently(
+    server_url: str, num_queries: int, concurrency: int
+) -> float:
+    async with AsyncSearchClient(server_url, max_connections=concurrency) as client:
+        start_time = time.perf_counter()
+        await client.search_many(QUERY_NAME, [PARAMS] * num_queries)
+
+        return time.perf_counter() - start_time
+
+
+def main(
+    server_url: str | None,
+    num_queries: int,
+    concurrency: int,
+    slow_ratio: float,
+    slow_delay_ms: float,
+    hedge_after_ms: float,
+) -> None:
+    if server_url is None:
+        server_url = start_local_server(slow_ratio, slow_delay_ms)
+        logger.info(
+            f"Measuring the overhead of the clients on a local server delaying "
+            f"{slow_ratio:.0%} of its responses by {slow_delay_ms:.0f} ms."
+        )
+
+    with (
+        SearchClient(server_url) as client,
+        SearchClient(server_url, hedge_after_s=hedge_after_ms / 1000) as hedged_client,
+    ):
+        results = {
+            "new request per query": measure_latencies(
+                lambda: post_new_request(server_url), num_queries
+            ),
+            "pooled client": measure_latencies(
+                lambda: client.search(QUERY_NAME, PARAMS), num_queries
+            ),
+            f"hedged after {hedge_after_ms:.0f} ms": measure_latencies(
+                lambda: hedged_client.search(QUERY_NAME, PARAMS), num_queries
+            ),
+        }
+        hedged_requests = hedged_client.stats()["hedged_requests"]
+
+    for name, latencies in results.items():
+        logger.info(
+            f"{name:>24}: mean {latencies.mean():.2f} ms, "
+            f"p50 {np.percentile(latencies, 50):.2f} ms, "
+            f"p99 {np.percentile(latencies, 99):.2f} ms per query."
+        )
+    logger.info(f"{hedged_requests} of the hedged queries were sent twice.")
+
+    elapsed_time = asyncio.run(
+        search_concurrently(server_url, num_queries, concurrency)
+    )
+    logger.info(
+        f"Async client, {concurrency} concurrent queries: "
+        f"{num_queries / elapsed_time:.0f} queries/s."
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.server_url,
+        args.num_queries,
+        args.concurrency,
+        args.slow_ratio,
+        args.slow_delay_ms,
+        args.hedge_after_ms,
+    )
@@ -0,0 +1,124 @@
+import argparse
+import os
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare ingesting with one forward pass per space and one shared forward pass"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_850_sample.parquet",
+)
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    help="Number of products ingested at once",
+    default=100,
+)
+
+
+def measure_ingestion(
+    dataset_path: Path, chunk_size: int, shared: bool
+) -> dict[str, float]:
+    # Every product must go through the model.
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "False"
+
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+    from superlinked import framework as sl
+    from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+        SentenceTransformerManager,
+    )
+    from superlinked.framework.common.space.embedding.sentence_transformer_model_cache import (
+        SentenceTransformerModelCache,
+    )
+
+    from superlinked_app import constants, embedding_backend, index
+    from superlinked_app.sources import get_texts
+
+    num_forward_passes = 0
+    encode = SentenceTransformer.encode
+
+    def counted_encode(*args, **kwargs):
+        nonlocal num_forward_passes
+        num_forward_passes += 1
+
+        return encode(*args, **kwargs)
+
+    SentenceTransformer.encode = counted_encode
+
+    source: sl.InMemorySource = sl.InMemorySource(
+        index.product,
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+    )
+    executor = sl.InMemoryExecutor(sources=[source], indices=[index.product_index])
+    executor.run()
+
+    df = pd.read_parquet(dataset_path, dtype_backend="pyarrow")
+    # Load the model before starting the clock.
+    SentenceTransformerManager(constants.TEXT_EMBEDDING_MODEL_ID).embed_text(
+        ["warm up"]
+    )
+    num_forward_passes = 0
+
+    start_time = time.perf_counter()
+    # Same chunking as ChunkedDataLoaderSource from superlinked_app/sources.py.
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start : start + chunk_size]
+        if not shared:
+            source.put([chunk])
+            continue
+
+        with embedding_backend.shared_forward_pass(
+            constants.TEXT_EMBEDDING_MODEL_ID,
+            get_texts(chunk, ["title", "description"]),
+        ):
+            source.put([chunk])
+    elapsed_time = time.perf_counter() - start_time
+
+    return {
+        "rows_per_s": len(df) / elapsed_time,
+        "num_forward_passes": num_forward_passes,
+        "num_loaded_models": SentenceTransformerModelCache.initialize_model.cache_info().currsize,
+    }
+
+
+def main(dataset_path: Path, chunk_size: int) -> None:
+    results = {}
+    for shared in [False, True]:
+        mode = "shared" if shared else "per space"
+        logger.info(f"Ingesting '{dataset_path.name}' with a {mode} forward pass.")
+        results[mode] = run_isolated(
+            measure_ingestion, dataset_path, chunk_size, shared
+        )
+
+    for mode, result in results.items():
+        logger.info(
+            f"{mode:>9}: {result['rows_per_s']:.1f} rows/s, "
+            f"{result['num_forward_passes']} forward passes, "
+            f"{result['num_loaded_models']} loaded models, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB"
+        )
+    speedup = results["shared"]["rows_per_s"] / results["per space"]["rows_per_s"]
+    memory_saving = (
+        results["per space"]["peak_rss_mb"] - results["shared"]["peak_rss_mb"]
+    )
+    logger.info(
+        f"Shared forward pass: {speedup:.2f}x ingestion speed, "
+        f"{memory_saving:.0f} MB less peak memory."
+    )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.chunk_size)
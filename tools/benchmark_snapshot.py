@@ -0,0 +1,185 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import get_peak_rss_mb, run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare restoring the in-memory vector database from its snapshot to restoring it from JSON"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--num-copies",
+    type=int,
+    help="Number of copies of the products, with distinct ids, to ingest",
+    default=100,
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of semantic queries run after restoring, built from the titles of the dataset",
+    default=20,
+)
+
+
+def get_params_list(dataset_path: Path, num_queries: int) -> list[dict[str, Any]]:
+    df = pd.read_parquet(dataset_path, columns=["title"])
+    texts = df["title"].dropna().drop_duplicates().head(num_queries).tolist()
+
+    return [{"query_title": text, "title_weight": 1.0, "limit": 10} for text in texts]
+
+
+def create_app(mode: str, snapshot_path: Path | None) -> tuple[Any, Any]:
+    # The copies share their texts, so they are embedded once.
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "True"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from superlinked import framework as sl
+
+    from superlinked_app import index
+    from superlinked_app.config import settings
+    from superlinked_app.vector_index import IndexedInMemoryVectorDatabase
+
+    source: sl.InMemorySource = sl.InMemorySource(
+        index.product,
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+    )
+    executor = sl.InteractiveExecutor(
+        sources=[source],
+        indices=[index.product_index],
+        # The reference is the in-memory database of Superlinked, restored from JSON.
+        vector_database=sl.InMemoryVectorDatabase()
+        if mode == "reference"
+        else IndexedInMemoryVectorDatabase(
+            settings.IN_MEMORY_VECTOR_INDEX,
+            settings.IN_MEMORY_FILTER_INDEX_ENABLED,
+            settings.IVF_NUM_LISTS,
+            settings.IVF_NUM_PROBES,
+            settings.IVF_MIN_ROWS,
+            settings.IN_MEMORY_VECTOR_PRECISION,
+            settings.IN_MEMORY_RESCORE_FACTOR,
+            snapshot_path,
+        ),
+    )
+
+    return source, executor.run()
+
+
+def create_serializer(path: Path) -> Any:
+    from superlinked.framework.storage.in_memory.object_serializer import (
+        ObjectSerializer,
+    )
+
+    class FileSerializer(ObjectSerializer):
+        """Serializer of the Superlinked server, without its JSON string wrapping."""
+
+        def write(self, serialized_object: str, key: str) -> None:
+            (path / f"{key}.json").write_text(serialized_object, encoding="utf-8")
+
+        def read(self, key: str) -> str:
+            return (path / f"{key}.json").read_text(encoding="utf-8")
+
+    return FileSerializer()
+
+
+def ingest_and_persist(
+    dataset_path: Path, num_copies: int, path: Path
+) -> dict[str, Any]:
+    source, app = create_app("snapshot", path / "snapshot")
+    df = pd.read_parquet(dataset_path, dtype_backend="pyarrow")
+    for copy in range(num_copies):
+        source.put([df.assign(asin=df["asin"] + f"-{copy}")])
+
+    connector = app._storage_manager._vdb_connector
+    results = {"rows": connector.stats()["rows"]}
+    for mode, snapshot_path in [("snapshot", path / "snapshot"), ("json", None)]:
+        connector.snapshot_path = snapshot_path
+        start_time = time.perf_counter()
+        connector.persist(create_serializer(path))
+        results[f"{mode}_persist_s"] = time.perf_counter() - start_time
+
+    return results
+
+
+def restore_and_query(
+    mode: str, path: Path, params_list: list[dict[str, Any]]
+) -> dict[str, Any]:
+    from superlinked_app import query
+
+    _, app = create_app(mode, path / "snapshot" if mode == "snapshot" else None)
+    # Loads the model before measuring.
+    app.query(query.semantic_query, query_title="warm up", title_weight=1.0)
+
+    rss_before_mb = get_peak_rss_mb()
+    start_time = time.perf_counter()
+    app._storage_manager._vdb_connector.restore(create_serializer(path))
+    restore_time = time.perf_counter() - start_time
+    results = [app.query(query.semantic_query, **params) for params in params_list]
+
+    return {
+        "restore_s": restore_time,
+        "rss_increase_mb": get_peak_rss_mb() - rss_before_mb,
+        # The stored objects returned with the ids are read from the restored rows.
+        "entries": [
+            [
+                (entry.entity.header.object_id, entry.stored_object)
+                for entry in result.entries
+            ]
+            for result in results
+        ],
+    }
+
+
+def main(dataset_path: Path, num_copies: int, num_queries: int) -> None:
+    params_list = get_params_list(dataset_path, num_queries)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory)
+        persisted = run_isolated(ingest_and_persist, dataset_path, num_copies, path)
+        logger.info(
+            f"{persisted['rows']} products persisted in "
+            f"{persisted['snapshot_persist_s']:.2f} s as a snapshot, "
+            f"{persisted['json_persist_s']:.2f} s as JSON."
+        )
+
+        results = {
+            mode: run_isolated(restore_and_query, mode, path, params_list)
+            for mode in ["reference", "json", "snapshot"]
+        }
+    for mode, result in results.items():
+        logger.info(
+            f"{mode:>8}: restored in {result['restore_s']:.2f} s, "
+            f"peak RSS +{result['rss_increase_mb']:.0f} MB."
+        )
+    reference_entries = results.pop("reference")["entries"]
+    if not any(reference_entries):
+        raise RuntimeError("No query returned products to compare.")
+    for mode, result in results.items():
+        num_matches = sum(
+            entries == reference
+            for entries, reference in zip(result["entries"], reference_entries)
+        )
+        logger.info(
+            f"{mode:>8}: {num_matches}/{len(params_list)} queries with the same "
+            "results as the in-memory database of Superlinked."
+        )
+        if num_matches == 0:
+            raise RuntimeError(f"The {mode} restore returns none of the results.")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(args.dataset_path, args.num_copies, args.num_queries)
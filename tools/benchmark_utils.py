@@ -0,0 +1,54 @@
+import multiprocessing
+import resource
+import sys
+from typing import Any, Callable
+
+from loguru import logger
+
+
+def get_peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    max_rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    bytes_per_unit = 1 if sys.platform == "darwin" else 1024
+
+    return max_rss * bytes_per_unit / 1024**2
+
+
+def _measure(
+    func: Callable[..., dict[str, Any] | None],
+    args: tuple,
+    results: dict[str, dict[str, Any]],
+) -> None:
+    logger.remove()
+
+    result = func(*args) or {}
+    # The peak memory of a function spawning processes is the one of its largest process.
+    result["peak_rss_mb"] = max(
+        get_peak_rss_mb(), get_peak_rss_mb(resource.RUSAGE_CHILDREN)
+    )
+    results["result"] = result
+
+
+def run_isolated(
+    func: Callable[..., dict[str, Any] | None], *args: Any
+) -> dict[str, Any]:
+    """Run a function in a fresh process to isolate its peak memory usage.
+
+    Args:
+        func: Picklable function, which can return a dictionary of measurements.
+        *args: Picklable arguments of the function.
+
+    Returns:
+        The measurements returned by the function, extended with its peak RSS in MB.
+    """
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        process = ctx.Process(target=_measure, args=(func, args, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"'{func.__name__}' failed in the isolated process.")
+
+        return dict(results["result"])
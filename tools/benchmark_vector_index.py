@@ -0,0 +1,171 @@
+import argparse
+import time
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Measure the recall@k and queries/s of the IVF index against the exact search"
+)
+parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    help="Numbers of products to index",
+    default=[10_000, 100_000, 1_000_000],
+)
+parser.add_argument(
+    "--dimension",
+    type=int,
+    help="Dimension of the synthetic product vectors",
+    default=256,
+)
+parser.add_argument(
+    "--num-probes",
+    type=int,
+    nargs="+",
+    help="Numbers of clusters scanned per query to compare",
+    default=[1, 4, 8, 16],
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of queries per configuration",
+    default=200,
+)
+parser.add_argument(
+    "--filter-selectivity",
+    type=float,
+    help="Share of the products passing the filter of the filtered queries",
+    default=0.05,
+)
+parser.add_argument(
+    "--k",
+    type=int,
+    help="Number of results per query",
+    default=10,
+)
+
+
+def generate_vectors(
+    rng: np.random.Generator, num_vectors: int, centers: np.ndarray
+) -> np.ndarray:
+    """Sample normalized vectors around topic centers, like the text embeddings of products."""
+
+    vectors = centers[rng.integers(0, len(centers), num_vectors)]
+    vectors += 0.5 * rng.standard_normal(vectors.shape, dtype=np.float32)
+
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_size(
+    size: int,
+    dimension: int,
+    num_probes_list: list[int],
+    num_queries: int,
+    filter_selectivity: float,
+    k: int,
+) -> dict[str, Any]:
+    from superlinked_app.vector_index import IVFIndex
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(size // 500, 10), dimension), dtype=np.float32)
+    vectors = generate_vectors(rng, size, centers)
+    queries = generate_vectors(rng, num_queries, centers)
+    is_allowed = rng.random(size) < filter_selectivity
+    allowed_positions = np.flatnonzero(is_allowed)
+
+    index = IVFIndex(None, num_probes_list[0])
+    start_time = time.perf_counter()
+    index.update(dict(enumerate(vectors)))
+    index.build()
+    build_time = time.perf_counter() - start_time
+
+    results: dict[str, Any] = {"build_s": build_time}
+    exact_ids = {}
+    for is_filtered in [False, True]:
+        start_time = time.perf_counter()
+        exact_ids[is_filtered] = []
+        for query in queries:
+            if is_filtered:
+                positions, scores = (
+                    allowed_positions,
+                    vectors[allowed_positions] @ query,
+                )
+            else:
+                positions, scores = np.arange(size), vectors @ query
+            top = np.argpartition(-scores, k - 1)[:k]
+            exact_ids[is_filtered].append(set(positions[top].tolist()))
+        results[("exact", is_filtered)] = {
+            "queries_per_s": num_queries / (time.perf_counter() - start_time),
+            "recall": 1.0,
+        }
+
+    for num_probes in num_probes_list:
+        index.num_probes = num_probes
+        for is_filtered in [False, True]:
+            recalls = []
+            start_time = time.perf_counter()
+            for query, ids in zip(queries, exact_ids[is_filtered]):
+                found = index.search(
+                    query,
+                    k,
+                    is_allowed=(lambda positions: is_allowed[positions])
+                    if is_filtered
+                    else None,
+                )
+                recalls.append(len(ids & {position for position, _ in found}) / k)
+            results[(f"ivf, {num_probes} probes", is_filtered)] = {
+                "queries_per_s": num_queries / (time.perf_counter() - start_time),
+                "recall": float(np.mean(recalls)),
+            }
+
+    return results
+
+
+def main(
+    sizes: list[int],
+    dimension: int,
+    num_probes_list: list[int],
+    num_queries: int,
+    filter_selectivity: float,
+    k: int,
+) -> None:
+    for size in sizes:
+        results = run_isolated(
+            run_size,
+            size,
+            dimension,
+            num_probes_list,
+            num_queries,
+            filter_selectivity,
+            k,
+        )
+        logger.info(
+            f"{size} products: IVF index built in {results['build_s']:.1f} s, "
+            f"peak RSS {results['peak_rss_mb']:.0f} MB."
+        )
+        for key, result in results.items():
+            if not isinstance(key, tuple):
+                continue
+            name, is_filtered = key
+            logger.info(
+                f"{name:>20} {'filtered' if is_filtered else 'unfiltered':>10}: "
+                f"recall@{k} {result['recall']:.3f}, {result['queries_per_s']:.1f} queries/s"
+            )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.sizes,
+        args.dimension,
+        args.num_probes,
+        args.num_queries,
+        args.filter_selectivity,
+        args.k,
+    )
@@ -0,0 +1,165 @@
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from tools.benchmark_utils import run_isolated
+
+parser = argparse.ArgumentParser(
+    description="Compare the memory, recall@k and latency of the vector precisions of the in-memory vector database"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed Parquet dataset",
+    default=Path("data") / "processed_300_sample.parquet",
+)
+parser.add_argument(
+    "--num-queries",
+    type=int,
+    help="Number of distinct queries, built from the titles of the dataset",
+    default=100,
+)
+parser.add_argument(
+    "--rescore-factor",
+    type=int,
+    help="Number of candidates rescored per result in the rescored modes",
+    default=4,
+)
+parser.add_argument(
+    "--catalogue-size",
+    type=int,
+    help="Number of products to project the memory of the vectors to",
+    default=1_000_000,
+)
+parser.add_argument(
+    "--k",
+    type=int,
+    help="Number of results per query",
+    default=10,
+)
+
+
+def get_params_list(
+    dataset_path: Path, num_queries: int, k: int
+) -> list[dict[str, Any]]:
+    df = pd.read_parquet(dataset_path, columns=["title"])
+    texts = df["title"].dropna().drop_duplicates().head(num_queries).tolist()
+
+    return [
+        {
+            "query_title": text,
+            "query_description": text,
+            "title_weight": 1.0,
+            "description_weight": 1.0,
+            "limit": k,
+        }
+        for text in texts
+    ]
+
+
+def run_queries(
+    dataset_path: Path,
+    params_list: list[dict[str, Any]],
+    precision: str,
+    rescore_factor: int,
+) -> dict[str, Any]:
+    # The query texts are embedded before starting the clock.
+    os.environ["QUERY_EMBEDDING_CACHE_ENABLED"] = "True"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    from superlinked import framework as sl
+
+    from superlinked_app import index, query
+    from superlinked_app.vector_index import IndexedInMemoryVectorDatabase
+
+    source: sl.InMemorySource = sl.InMemorySource(
+        index.product,
+        parser=sl.DataFrameParser(
+            schema=index.product, mapping={index.product.id: "asin"}
+        ),
+    )
+    executor = sl.InteractiveExecutor(
+        sources=[source],
+        indices=[index.product_index],
+        vector_database=IndexedInMemoryVectorDatabase(
+            "flat", True, None, 8, 10_000, precision, rescore_factor
+        ),
+    )
+    app = executor.run()
+    source.put([pd.read_parquet(dataset_path, dtype_backend="pyarrow")])
+    for params in params_list:
+        app.query(query.semantic_query, **params)
+
+    start_time = time.perf_counter()
+    results = [app.query(query.semantic_query, **params) for params in params_list]
+    elapsed_time = time.perf_counter() - start_time
+
+    return {
+        **app._storage_manager._vdb_connector.stats(),
+        "latency_ms": 1000 * elapsed_time / len(params_list),
+        "ids": [
+            [entry.entity.header.object_id for entry in result.entries]
+            for result in results
+        ],
+    }
+
+
+def main(
+    dataset_path: Path,
+    num_queries: int,
+    rescore_factor: int,
+    catalogue_size: int,
+    k: int,
+) -> None:
+    params_list = get_params_list(dataset_path, num_queries, k)
+    logger.info(
+        f"Running {len(params_list)} semantic queries on '{dataset_path.name}'."
+    )
+
+    results = {}
+    for precision, factor in [
+        ("float32", 0),
+        ("float16", 0),
+        ("float16", rescore_factor),
+        ("int8", 0),
+        ("int8", rescore_factor),
+    ]:
+        results[(precision, factor)] = run_isolated(
+            run_queries, dataset_path, params_list, precision, factor
+        )
+
+    exact_ids = results[("float32", 0)]["ids"]
+    for (precision, factor), result in results.items():
+        recall = np.mean(
+            [
+                len(set(ids) & set(found_ids)) / max(len(ids), 1)
+                for ids, found_ids in zip(exact_ids, result["ids"])
+            ]
+        )
+        bytes_per_product = result["vector_bytes_per_row"]
+        name = f"{precision}{f', rescored x{factor}' if factor else ''}"
+        logger.info(
+            f"{name:>20}: {bytes_per_product} bytes/product in memory "
+            f"({bytes_per_product * catalogue_size / 1024**3:.1f} GB for "
+            f"{catalogue_size} products), recall@{k} {recall:.3f}, "
+            f"{result['latency_ms']:.2f} ms/query, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB."
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    main(
+        args.dataset_path,
+        args.num_queries,
+        args.rescore_factor,
+        args.catalogue_size,
+        args.k,
+    )
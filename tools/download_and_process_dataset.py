@@ -1,13 +1,25 @@
 import argparse
+import itertools
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Any, Iterator
 
 import pandas as pd
+import pyarrow.parquet as pq
 from loguru import logger
 
 from superlinked_app import utils
-from superlinked_app.data_processing import process_amazon_dataset
+from superlinked_app.data_processing import (
+    PROCESSED_DATASET_SCHEMA,
+    process_amazon_dataset,
+    to_arrow_table,
+)
+
+DEFAULT_CHUNK_SIZE = 100_000
+# Row groups are the unit of chunked Parquet reads.
+PARQUET_ROW_GROUP_SIZE = 10_000
 
-parser = argparse.ArgumentParser(description="Download and decompress data file")
+parser = argparse.ArgumentParser(description="Download and process data file")
 parser.add_argument(
     "--data-url",
     help="URL of the file to download",
@@ -19,6 +31,38 @@ parser.add_argument(
     help="Directory to save downloaded data",
     default=Path("data"),
 )
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    help=(
+        "Number of records processed at once. If set, the dataset is streamed in chunks "
+        "to keep the memory usage fixed, otherwise it is fully loaded in memory."
+    ),
+    default=None,
+)
+parser.add_argument(
+    "--num-workers",
+    type=int,
+    help=(
+        "Number of processes used to process the chunks in parallel. "
+        f"If higher than 1, the dataset is streamed in chunks of {DEFAULT_CHUNK_SIZE} records "
+        "unless --chunk-size is set."
+    ),
+    default=1,
+)
+
+SAMPLE_SIZES = [100, 300]
+RAW_COLUMNS = [
+    "asin",
+    "locale",
+    "type",
+    "category",
+    "title",
+    "description",
+    "stars",
+    "ratings",
+    "price",
+]
 
 
 def download_dataset(url: str, output_path: Path) -> Path:
@@ -39,35 +83,137 @@ def download_dataset(url: str, output_path: Path) -> Path:
         if not successful:
             raise RuntimeError("Failed to download the requested file.")
 
-    # Decompress file
-    output_file = compressed_file_output_path.with_suffix("")
-    logger.info(f"Decompressing '{compressed_file_output_path}' to '{output_file}'.")
-    if is_sample:
-        utils.decompress_gz(compressed_file_output_path, output_file)
-    else:
-        utils.decompress_zst(compressed_file_output_path, output_file)
+    # The compressed file is decompressed on the fly while processing it.
+    return compressed_file_output_path
 
-    return output_file
 
+def get_processed_dataset_path(
+    dataset_path: Path, sample: int, suffix: str = ".jsonl"
+) -> Path:
+    dataset_name = dataset_path.name.split(".")[0]
 
-if __name__ == "__main__":
-    args = parser.parse_args()
+    return dataset_path.parent / f"processed_{sample}_{dataset_name}{suffix}"
 
-    dataset_path = download_dataset(args.data_url, args.data_dir)
 
-    logger.info("Processing dataset.")
+def process_dataset(dataset_path: Path) -> None:
     df = pd.read_json(str(dataset_path), lines=True)
     processed_df = process_amazon_dataset(df)
 
-    for sample in [100, 300, len(df)]:
+    for sample in [*SAMPLE_SIZES, len(df)]:
         sample = min(len(processed_df), sample)
         sampled_df_processed = processed_df.head(sample)
 
-        processed_dataset_path = (
-            dataset_path.parent
-            / f"processed_{sample}_{dataset_path.name.replace('.json', '.jsonl')}"
-        )
+        processed_dataset_path = get_processed_dataset_path(dataset_path, sample)
         logger.info(f"Saving processed dataset to '{processed_dataset_path}'.")
         sampled_df_processed.to_json(
             processed_dataset_path, orient="records", lines=True
         )
+
+        processed_dataset_path = processed_dataset_path.with_suffix(".parquet")
+        logger.info(f"Saving processed dataset to '{processed_dataset_path}'.")
+        pq.write_table(
+            to_arrow_table(sampled_df_processed),
+            processed_dataset_path,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+        )
+
+
+def process_records(records: list[dict[str, Any]]) -> pd.DataFrame:
+    # Skip pandas' type inference, as it depends on the values within a chunk (e.g., a
+    # chunk with only missing titles would turn them into NaNs instead of Nones).
+    chunk = pd.DataFrame(records, dtype=object)
+    chunk = chunk.reindex(columns=chunk.columns.union(RAW_COLUMNS, sort=False))
+
+    return process_amazon_dataset(chunk)
+
+
+def iter_processed_chunks(
+    dataset_path: Path, chunk_size: int, num_workers: int = 1
+) -> Iterator[pd.DataFrame]:
+    # The records are parsed while the file is decompressed, and sent in chunks.
+    records = utils.iter_json_records(dataset_path)
+    record_chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+
+    yield from utils.parallel_map(process_records, record_chunks, num_workers)
+
+
+def process_dataset_in_chunks(
+    dataset_path: Path, chunk_size: int, num_workers: int = 1
+) -> None:
+    """Process the dataset chunk by chunk and write all the samples in a single pass.
+
+    The output is identical to `process_dataset()`, but the memory usage is bounded by
+    the chunk size instead of the dataset size. As the final number of rows is known only
+    at the end, the samples are written to temporary files renamed when processing is done.
+    The chunks are processed by `num_workers` processes and written in the original order.
+    """
+
+    partial_paths = {
+        sample: dataset_path.parent
+        / f".processed_{sample or 'all'}_{dataset_path.name}"
+        for sample in [*SAMPLE_SIZES, None]
+    }
+    num_processed_rows = 0
+    with ExitStack() as stack:
+        partial_files = {
+            sample: (
+                stack.enter_context(
+                    path.with_suffix(".jsonl.part").open(
+                        "w", encoding="utf-8", newline=""
+                    )
+                ),
+                stack.enter_context(
+                    pq.ParquetWriter(
+                        path.with_suffix(".parquet.part"), PROCESSED_DATASET_SCHEMA
+                    )
+                ),
+            )
+            for sample, path in partial_paths.items()
+        }
+        for processed_chunk in iter_processed_chunks(
+            dataset_path, chunk_size, num_workers
+        ):
+            if len(processed_chunk) == 0:
+                continue
+
+            for sample, (jsonl_file, parquet_writer) in partial_files.items():
+                num_missing_rows = (
+                    len(processed_chunk)
+                    if sample is None
+                    else sample - num_processed_rows
+                )
+                if num_missing_rows > 0:
+                    sampled_chunk = processed_chunk.head(num_missing_rows)
+                    jsonl_file.write(
+                        sampled_chunk.to_json(orient="records", lines=True)
+                    )
+                    parquet_writer.write_table(
+                        to_arrow_table(sampled_chunk),
+                        row_group_size=PARQUET_ROW_GROUP_SIZE,
+                    )
+
+            num_processed_rows += len(processed_chunk)
+            logger.info(f"Processed {num_processed_rows} rows.")
+
+    for sample, partial_path in partial_paths.items():
+        sample = min(num_processed_rows, sample or num_processed_rows)
+        for suffix in [".jsonl", ".parquet"]:
+            processed_dataset_path = get_processed_dataset_path(
+                dataset_path, sample, suffix
+            )
+            logger.info(f"Saving processed dataset to '{processed_dataset_path}'.")
+            partial_path.with_suffix(f"{suffix}.part").replace(processed_dataset_path)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    dataset_path = download_dataset(args.data_url, args.data_dir)
+
+    logger.info("Processing dataset.")
+    if args.chunk_size or args.num_workers > 1:
+        process_dataset_in_chunks(
+            dataset_path, args.chunk_size or DEFAULT_CHUNK_SIZE, args.num_workers
+        )
+    else:
+        process_dataset(dataset_path)
@@ -0,0 +1,163 @@
+import argparse
+import multiprocessing
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+from superlinked.framework.common.space.embedding.sentence_transformer_manager import (
+    SentenceTransformerManager,
+)
+
+from superlinked_app import constants, embedding_backend
+from superlinked_app.embedding_cache import hash_text
+
+parser = argparse.ArgumentParser(
+    description="Precompute the title and description embeddings of a processed dataset"
+)
+parser.add_argument(
+    "--dataset-path",
+    type=Path,
+    help="Path to the processed dataset (.jsonl or .parquet)",
+    default=Path("data") / "processed_300_sample.jsonl",
+)
+parser.add_argument(
+    "--output-path",
+    type=Path,
+    help="Path to the embeddings artifact. Defaults to '<dataset name>_embeddings.parquet' next to the dataset",
+    default=None,
+)
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    help="Number of products embedded and written at once",
+    default=10_000,
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    help="Number of texts passed to the model at once",
+    default=256,
+)
+parser.add_argument(
+    "--backend",
+    choices=["fp32", "int8"],
+    help="Embedding backend, which must match EMBEDDING_BACKEND of the server",
+    default="fp32",
+)
+parser.add_argument(
+    "--num-threads",
+    type=int,
+    help="Number of CPU threads used by the model",
+    default=multiprocessing.cpu_count(),
+)
+
+EMBEDDED_FIELDS = ["title", "description"]
+
+
+def get_embeddings_path(dataset_path: Path) -> Path:
+    return dataset_path.with_name(
+        f"{dataset_path.name.split('.')[0]}_embeddings.parquet"
+    )
+
+
+def get_artifact_schema(model_id: str, num_dimensions: int) -> pa.Schema:
+    fields = [pa.field("asin", pa.string())]
+    for field in EMBEDDED_FIELDS:
+        fields.append(pa.field(f"{field}_hash", pa.binary(32)))
+        fields.append(
+            pa.field(f"{field}_embedding", pa.list_(pa.float32(), num_dimensions))
+        )
+
+    return pa.schema(fields, metadata={"model_id": model_id})
+
+
+def read_dataset(dataset_path: Path) -> pd.DataFrame:
+    if dataset_path.suffix == ".parquet":
+        return pd.read_parquet(dataset_path, columns=["asin", *EMBEDDED_FIELDS])
+
+    return pd.read_json(dataset_path, lines=True, dtype=False)[
+        ["asin", *EMBEDDED_FIELDS]
+    ]
+
+
+def embed_texts(
+    manager: SentenceTransformerManager, texts: pd.Series, batch_size: int
+) -> tuple[pa.Array, pa.Array]:
+    """Embed every distinct non-empty text once.
+
+    Returns:
+        The text hashes and embeddings aligned with `texts`, null for the missing texts.
+    """
+
+    is_valid = texts.notna().to_numpy()
+    unique_texts = pd.unique(texts[is_valid])
+    vectors = []
+    for start in range(0, len(unique_texts), batch_size):
+        batch = unique_texts[start : start + batch_size].tolist()
+        vectors.extend(vector.value for vector in manager.embed_text(batch))
+    vectors_by_text = dict(zip(unique_texts, vectors))
+
+    num_dimensions = manager.calculate_length()
+    embeddings = np.zeros((len(texts), num_dimensions), dtype=np.float32)
+    text_hashes = []
+    for row, text in enumerate(texts):
+        if is_valid[row]:
+            embeddings[row] = vectors_by_text[text]
+            text_hashes.append(hash_text(text))
+        else:
+            text_hashes.append(None)
+
+    mask = pa.array(~is_valid)
+    embeddings_array = pa.FixedSizeListArray.from_arrays(
+        pa.array(embeddings.ravel()), num_dimensions, mask=mask
+    )
+
+    return pa.array(text_hashes, type=pa.binary(32)), embeddings_array
+
+
+def precompute_embeddings(
+    dataset_path: Path, output_path: Path, chunk_size: int, batch_size: int
+) -> None:
+    model_name = constants.TEXT_EMBEDDING_MODEL_ID
+    # Same manager as the text spaces, so the vectors are identical to the ones computed by the server.
+    manager = SentenceTransformerManager(model_name)
+    model_id = embedding_backend.get_model_id(model_name)
+    schema = get_artifact_schema(model_id, manager.calculate_length())
+
+    df = read_dataset(dataset_path)
+    logger.info(f"Embedding {len(df)} products with '{model_id}'.")
+
+    start_time = time.perf_counter()
+    tmp_output_path = output_path.with_name(f"{output_path.name}.part")
+    with pq.ParquetWriter(tmp_output_path, schema) as writer:
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start : start + chunk_size]
+            columns = [pa.array(chunk["asin"], type=pa.string())]
+            for field in EMBEDDED_FIELDS:
+                columns.extend(embed_texts(manager, chunk[field], batch_size))
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+            num_embedded = min(start + chunk_size, len(df))
+            logger.info(
+                f"Embedded {num_embedded}/{len(df)} products "
+                f"({num_embedded / (time.perf_counter() - start_time):.1f} products/s)."
+            )
+    tmp_output_path.rename(output_path)
+
+    logger.info(f"Saved the embeddings to '{output_path}'.")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    embedding_backend.configure(args.backend, args.batch_size, args.num_threads)
+    precompute_embeddings(
+        args.dataset_path,
+        args.output_path or get_embeddings_path(args.dataset_path),
+        args.chunk_size,
+        args.batch_size,
+    )
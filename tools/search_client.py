@@ -0,0 +1,264 @@
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Self
+
+import httpx
+
+DEFAULT_SERVER_URL = "http://localhost:8080"
+SEARCH_PATH = "/api/v1/search"
+# The server is overloaded or restarting, so the search may succeed later.
+RETRIED_STATUS_CODES = {429, 502, 503, 504}
+
+
+class _BaseSearchClient:
+    """Settings and counters shared by the sync and async search clients.
+
+    Args:
+        server_url: URL of the Superlinked server.
+        timeout_s: Timeout of every request, in seconds.
+        max_retries: Number of times a failed search is retried.
+        backoff_s: Delay before the first retry, doubled for every next one.
+        hedge_after_s: Delay after which a search without response is sent again, the
+            first response winning. If None, the searches aren't hedged.
+        max_connections: Maximum number of connections kept open to the server.
+    """
+
+    def __init__(
+        self,
+        server_url: str = DEFAULT_SERVER_URL,
+        timeout_s: float = 30.0,
+        max_retries: int = 2,
+        backoff_s: float = 0.1,
+        hedge_after_s: float | None = None,
+        max_connections: int = 20,
+    ) -> None:
+        self.server_url = server_url
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.hedge_after_s = hedge_after_s
+        self.num_requests = 0
+        self.num_retries = 0
+        self.num_hedged_requests = 0
+
+        self._client_kwargs: dict[str, Any] = {
+            "base_url": server_url,
+            "timeout": timeout_s,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            "headers": {"accept": "application/json"},
+        }
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "requests": self.num_requests,
+            "retries": self.num_retries,
+            "hedged_requests": self.num_hedged_requests,
+        }
+
+    def _should_retry(self, error: httpx.HTTPError, attempt: int) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRIED_STATUS_CODES
+
+        return isinstance(error, httpx.TransportError)
+
+    def _get_backoff_s(self, attempt: int) -> float:
+        return self.backoff_s * 2**attempt
+
+
+class SearchClient(_BaseSearchClient):
+    """Client of the search endpoints of the Superlinked server.
+
+    The connections are kept alive in a pool shared by the threads using the client,
+    instead of opening one per search. The searches failing with a connection error, a
+    timeout or an overload status are retried with exponential backoff. The searches
+    are read-only, so they are safe to retry and to hedge, i.e., to send again when the
+    first request is slow, e.g., because it's queued behind a long search.
+
+    See `_BaseSearchClient` for the arguments.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._client = httpx.Client(**self._client_kwargs)
+        max_connections = self._client_kwargs["limits"].max_connections
+        # A hedged search waits for its requests in this pool.
+        self._hedging_pool = (
+            ThreadPoolExecutor(2 * max_connections, thread_name_prefix="search-hedging")
+            if self.hedge_after_s is not None
+            else None
+        )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._client.close()
+        if self._hedging_pool is not None:
+            self._hedging_pool.shutdown(wait=False, cancel_futures=True)
+
+    def search(self, query_name: str, params: dict[str, Any]) -> dict[str, Any]:
+        """Run a query through `/api/v1/search/<query_name>` and return its response."""
+
+        return self._post(f"{SEARCH_PATH}/{query_name}", params)
+
+    def batch_search(
+        self, query_name: str, params_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Run many queries through the batch endpoint of the query, in one request."""
+
+        return self._post(
+            f"{SEARCH_PATH}/{query_name}/batch", {"queries": params_list}
+        )["results"]
+
+    def _post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        attempt = 0
+        while True:
+            try:
+                return self._post_hedged(path, payload)
+            except httpx.HTTPError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self._get_backoff_s(attempt))
+                self.num_retries += 1
+                attempt += 1
+
+    def _post_hedged(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        if self._hedging_pool is None:
+            return self._post_once(path, payload)
+
+        futures: list[Future] = [
+            self._hedging_pool.submit(self._post_once, path, payload)
+        ]
+        done, _ = wait(futures, timeout=self.hedge_after_s)
+        if not done:
+            self.num_hedged_requests += 1
+            futures.append(self._hedging_pool.submit(self._post_once, path, payload))
+        # The first successful response wins, the other request is left to finish.
+        for future in as_completed(futures):
+            if future.exception() is None:
+                return future.result()
+
+        return futures[-1].result()
+
+    def _post_once(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        self.num_requests += 1
+        response = self._client.post(path, json=payload)
+        response.raise_for_status()
+
+        return response.json()
+
+
+class AsyncSearchClient(_BaseSearchClient):
+    """Asyncio client of the search endpoints of the Superlinked server.
+
+    Same as `SearchClient`, to fan out many searches from a single thread with
+    `search_many()`. The slower request of a hedged search is cancelled.
+
+    See `_BaseSearchClient` for the arguments.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._client = httpx.AsyncClient(**self._client_kwargs)
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def search(self, query_name: str, params: dict[str, Any]) -> dict[str, Any]:
+        """Run a query through `/api/v1/search/<query_name>` and return its response."""
+
+        return await self._post(f"{SEARCH_PATH}/{query_name}", params)
+
+    async def batch_search(
+        self, query_name: str, params_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Run many queries through the batch endpoint of the query, in one request."""
+
+        response = await self._post(
+            f"{SEARCH_PATH}/{query_name}/batch", {"queries": params_list}
+        )
+
+        return response["results"]
+
+    async def search_many(
+        self,
+        query_name: str,
+        params_list: list[dict[str, Any]],
+        max_concurrency: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Run many queries concurrently, one request per query.
+
+        Args:
+            query_name: Name of the query.
+            params_list: Parameters of every query.
+            max_concurrency: Maximum number of queries running at once. If None, the
+                size of the connection pool.
+
+        Returns:
+            The responses of the queries, in the order of their parameters.
+        """
+
+        semaphore = asyncio.Semaphore(
+            max_concurrency or self._client_kwargs["limits"].max_connections
+        )
+
+        async def search(params: dict[str, Any]) -> dict[str, Any]:
+            async with semaphore:
+                return await self.search(query_name, params)
+
+        return list(await asyncio.gather(*(search(params) for params in params_list)))
+
+    async def _post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        attempt = 0
+        while True:
+            try:
+                return await self._post_hedged(path, payload)
+            except httpx.HTTPError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self._get_backoff_s(attempt))
+                self.num_retries += 1
+                attempt += 1
+
+    async def _post_hedged(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        if self.hedge_after_s is None:
+            return await self._post_once(path, payload)
+
+        tasks = [asyncio.ensure_future(self._post_once(path, payload))]
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_after_s)
+        if not done:
+            self.num_hedged_requests += 1
+            tasks.append(asyncio.ensure_future(self._post_once(path, payload)))
+        try:
+            # The first successful response wins.
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except httpx.HTTPError:
+                    pass
+
+            return await tasks[-1]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _post_once(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        self.num_requests += 1
+        response = await self._client.post(path, json=payload)
+        response.raise_for_status()
+
+        return response.json()
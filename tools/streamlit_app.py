@@ -1,18 +1,21 @@
-import requests
+import httpx
 import streamlit as st
 
+from tools.search_client import SearchClient
 
-def make_semantic_query(query: str, limit: int = 3) -> dict | None:
-    url = "http://localhost:8080/api/v1/search/semantic_query"
-    headers = {"accept": "application/json", "Content-Type": "application/json"}
-    payload = {"natural_query": query, "limit": limit}
 
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+@st.cache_resource
+def get_search_client() -> SearchClient:
+    # Shared by the sessions and reruns of the app, keeping its connections alive.
+    return SearchClient(timeout_s=60.0)
+
 
-        return response.json()
-    except requests.exceptions.RequestException as e:
+def make_semantic_query(query: str, limit: int = 3) -> dict | None:
+    try:
+        return get_search_client().search(
+            "semantic_query", {"natural_query": query, "limit": limit}
+        )
+    except httpx.HTTPError as e:
         st.error(f"Error making request: {str(e)}")
 
         return None